@@ -1,10 +1,36 @@
 from django.contrib import admin
-from .models import Document
+from .models import Document, DocumentSection, DocumentVersion, ExtractionCacheEntry, ExtractionJob
 
 # Register your models here.
 
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'uploaded_at')
+    list_display = ('id', 'title', 'version', 'status', 'extracted_with', 'uploaded_at')
+    list_filter = ('status', 'extracted_with')
     search_fields = ('title',)
+
+
+@admin.register(ExtractionJob)
+class ExtractionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'document', 'status', 'attempts', 'run_after', 'locked_by')
+    list_filter = ('status',)
+
+
+@admin.register(ExtractionCacheEntry)
+class ExtractionCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'backend', 'version', 'size_bytes', 'hits', 'last_used_at')
+    list_filter = ('backend', 'version')
+    exclude = ('pages',)
+
+
+@admin.register(DocumentSection)
+class DocumentSectionAdmin(admin.ModelAdmin):
+    list_display = ('document', 'position', 'kind', 'heading', 'start_page', 'end_page', 'char_count')
+    list_filter = ('kind',)
+    search_fields = ('heading',)
+
+
+@admin.register(DocumentVersion)
+class DocumentVersionAdmin(admin.ModelAdmin):
+    list_display = ('document', 'version', 'page_count', 'created_at')
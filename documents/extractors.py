@@ -0,0 +1,190 @@
+"""
+Pluggable PDF text extractor backends.
+
+`pdfium` (pypdfium2) is the fast path for plain running text, `pdfplumber`
+is kept for layout-sensitive tariff tables, `pypdf2` and `pdfminer` are
+available for comparison. `choose_backend` picks per document: PDFs whose
+sampled pages carry many ruling lines (tables) go to pdfplumber,
+everything else to pdfium.
+"""
+import time
+from dataclasses import dataclass
+from importlib.metadata import PackageNotFoundError, version as package_version
+
+from django.conf import settings
+
+# Ausgewählte Backends je Dokument ('auto' = automatische Wahl)
+AUTO = 'auto'
+
+
+@dataclass
+class PageText:
+    """Text of a single PDF page together with its extraction time."""
+    number: int
+    text: str
+    seconds: float
+
+
+class ExtractorBackend:
+    """Base class: extract the text of a page range of one PDF file."""
+    name = ''
+    package = ''
+
+    def version(self) -> str:
+        try:
+            return package_version(self.package)
+        except PackageNotFoundError:
+            return 'unknown'
+
+    def page_count(self, file_path) -> int:
+        raise NotImplementedError
+
+    def iter_range(self, file_path, start, stop):
+        """
+        Yield `PageText` items for the 0-based page range [start, stop).
+
+        Implementations release the parsed state of each page before moving
+        on, so memory stays flat regardless of the document length.
+        """
+        raise NotImplementedError
+
+
+class PdfplumberBackend(ExtractorBackend):
+    name = 'pdfplumber'
+    package = 'pdfplumber'
+
+    def page_count(self, file_path):
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+
+    def iter_range(self, file_path, start, stop):
+        import pdfplumber
+        with pdfplumber.open(file_path) as pdf:
+            for index in range(start, stop):
+                started = time.perf_counter()
+                page = pdf.pages[index]
+                page_text = page.extract_text() or ""
+                # Layout-Objekte der Seite verwerfen, sonst wächst der Speicher mit jeder Seite
+                page.close()
+                yield PageText(index + 1, page_text, time.perf_counter() - started)
+
+
+class PdfiumBackend(ExtractorBackend):
+    name = 'pdfium'
+    package = 'pypdfium2'
+
+    def page_count(self, file_path):
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def iter_range(self, file_path, start, stop):
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(file_path)
+        try:
+            for index in range(start, stop):
+                started = time.perf_counter()
+                page = pdf[index]
+                textpage = page.get_textpage()
+                page_text = textpage.get_text_bounded().replace("\r\n", "\n").replace("\r", "\n")
+                textpage.close()
+                page.close()
+                yield PageText(index + 1, page_text, time.perf_counter() - started)
+        finally:
+            pdf.close()
+
+
+class PyPDF2Backend(ExtractorBackend):
+    name = 'pypdf2'
+    package = 'PyPDF2'
+
+    def page_count(self, file_path):
+        import PyPDF2
+        with open(file_path, 'rb') as f:
+            return len(PyPDF2.PdfReader(f).pages)
+
+    def iter_range(self, file_path, start, stop):
+        import PyPDF2
+        with open(file_path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            for index in range(start, stop):
+                started = time.perf_counter()
+                page_text = reader.pages[index].extract_text() or ""
+                yield PageText(index + 1, page_text, time.perf_counter() - started)
+
+
+class PdfminerBackend(ExtractorBackend):
+    name = 'pdfminer'
+    package = 'pdfminer.six'
+
+    def page_count(self, file_path):
+        return PyPDF2Backend().page_count(file_path)
+
+    def iter_range(self, file_path, start, stop):
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+
+        # Datei einmal öffnen und parsen, statt extract_text je Seite (das wäre O(n²) über den Bereich)
+        started = time.perf_counter()
+        layouts = extract_pages(file_path, page_numbers=range(start, stop))
+        for index, layout in zip(range(start, stop), layouts):
+            page_text = "".join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+            yield PageText(index + 1, page_text, time.perf_counter() - started)
+            started = time.perf_counter()
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PdfiumBackend(), PdfplumberBackend(), PyPDF2Backend(), PdfminerBackend())
+}
+
+BACKEND_CHOICES = (
+    (AUTO, 'Automatisch'),
+    ('pdfium', 'pypdfium2 (schnell)'),
+    ('pdfplumber', 'pdfplumber (Tabellen)'),
+    ('pypdf2', 'PyPDF2'),
+    ('pdfminer', 'pdfminer.six'),
+)
+
+
+def get_backend(name: str) -> ExtractorBackend:
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown extractor backend: {name}")
+
+
+def _table_score(file_path, sample_pages) -> float:
+    """Average number of vector path objects (ruling lines, cell borders) per sampled page."""
+    import pypdfium2
+    import pypdfium2.raw as pdfium_c
+
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        sampled = min(sample_pages, len(pdf))
+        paths = 0
+        for index in range(sampled):
+            page = pdf[index]
+            paths += sum(obj.type == pdfium_c.FPDF_PAGEOBJ_PATH for obj in page.get_objects())
+            page.close()
+    finally:
+        pdf.close()
+    return paths / sampled if sampled else 0.0
+
+
+def choose_backend(file_path, requested: str = AUTO) -> str:
+    """Resolve 'auto' to a concrete backend for this PDF."""
+    if requested and requested != AUTO:
+        return get_backend(requested).name
+    sample = getattr(settings, 'DOCUMENT_EXTRACTOR_SAMPLE_PAGES', 5)
+    threshold = getattr(settings, 'DOCUMENT_EXTRACTOR_TABLE_PATHS_PER_PAGE', 100)
+    try:
+        score = _table_score(file_path, sample)
+    except Exception:
+        # Von pdfium nicht lesbar: dem toleranteren pdfplumber überlassen
+        return PdfplumberBackend.name
+    return PdfplumberBackend.name if score >= threshold else PdfiumBackend.name
@@ -0,0 +1,160 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from documents.extractors import choose_backend
+from documents.services.cache import lookup, store
+from documents.services.ocr import ocr_empty_pages
+from documents.services.search import index_contract
+from documents.utils import extract_pdf_pages, extraction_workers
+from users.models import UserContract
+
+
+def _extract(file_path, backend):
+    # Läuft im Worker-Prozess, ohne Datenbankzugriff
+    return extract_pdf_pages(file_path, workers=1, backend=backend)
+
+
+class Command(BaseCommand):
+    help = "Füllt UserContract.text_content in id-sortierten Batches nach (fortsetzbar)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Verträge pro Batch (ein kurzer Schreibvorgang je Batch)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Prozesse für die Extraktion (0 = DOCUMENT_EXTRACTION_PROCESSES)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='backfill_contract_text.checkpoint.json',
+            help='Datei, in der die zuletzt verarbeitete ID gespeichert wird'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Checkpoint ignorieren und bei der kleinsten ID beginnen'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Auch Verträge mit vorhandenem Text neu extrahieren'
+        )
+
+    def _load_checkpoint(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f).get('last_id', 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _save_checkpoint(self, path, last_id):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'last_id': last_id}, f)
+        os.replace(tmp, path)
+
+    def _extract_batch(self, pool, contracts):
+        """Return {contract id: text}; cache hits skip the worker pool."""
+        texts, futures = {}, {}
+        for contract in contracts:
+            path = contract.pdf_file.path
+            if not os.path.exists(path):
+                self.stdout.write(f"⚠️ Datei fehlt: Vertrag {contract.pk} ({contract.pdf_file.name})")
+                continue
+            backend = choose_backend(path)
+            pages = lookup(contract.content_hash, backend)
+            if pages is not None:
+                texts[contract.pk] = "".join(p.text for p in pages)
+            else:
+                futures[contract.pk] = (contract, backend, pool.submit(_extract, path, backend))
+
+        for pk, (contract, backend, future) in futures.items():
+            try:
+                pages = future.result()
+            except Exception as e:
+                self.stdout.write(f"⚠️ Vertrag {pk}: {e}")
+                continue
+            # Gescannte Verträge: Seiten ohne Text per OCR
+            pages, _ = ocr_empty_pages(contract.pdf_file.path, pages)
+            store(contract.content_hash, pages, backend)
+            texts[pk] = "".join(p.text for p in pages)
+        return texts
+
+    def _write_batch(self, contracts, texts):
+        """Write texts in one short transaction, skipping contracts replaced meanwhile."""
+        with transaction.atomic():
+            current = dict(
+                UserContract.objects.select_for_update()
+                .filter(pk__in=texts)
+                .values_list('pk', 'content_hash')
+            )
+            changed = []
+            for contract in contracts:
+                # Inzwischen neu hochgeladene PDFs nicht mit altem Text überschreiben
+                if contract.pk in texts and current.get(contract.pk) == contract.content_hash:
+                    contract.text_content = texts[contract.pk]
+                    changed.append(contract)
+            UserContract.objects.bulk_update(changed, ['text_content'])
+
+        # bulk_update löst keine Signale aus: Suchindex selbst nachziehen
+        for contract in changed:
+            index_contract(contract)
+        return len(changed)
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        last_id = 0 if options['restart'] else self._load_checkpoint(checkpoint)
+        if last_id:
+            self.stdout.write(f"↪ Fortsetzen nach Vertrag {last_id}")
+
+        queryset = UserContract.objects.exclude(pdf_file='').only('pk', 'pdf_file', 'content_hash')
+        if not options['force']:
+            queryset = queryset.filter(text_content='')
+
+        workers = options['workers'] or extraction_workers()
+        # Keine offenen DB-Verbindungen in die Worker-Prozesse vererben
+        connections.close_all()
+
+        written = seen = 0
+        started = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                while True:
+                    batch = list(queryset.filter(pk__gt=last_id).order_by('pk')[:options['batch_size']])
+                    if not batch:
+                        break
+
+                    batch_started = time.perf_counter()
+                    texts = self._extract_batch(pool, batch)
+                    count = self._write_batch(batch, texts)
+                    last_id = batch[-1].pk
+                    self._save_checkpoint(checkpoint, last_id)
+
+                    written += count
+                    seen += len(batch)
+                    elapsed = time.perf_counter() - batch_started
+                    self.stdout.write(
+                        f"📄 bis ID {last_id}: {count}/{len(batch)} geschrieben "
+                        f"({len(batch) / elapsed:.1f} Dok./s, gesamt {seen / (time.perf_counter() - started):.1f} Dok./s)"
+                    )
+        except KeyboardInterrupt:
+            self.stdout.write(f"Unterbrochen, Fortsetzen mit demselben Aufruf (Checkpoint: ID {last_id})")
+            return
+
+        # Vollständig durchgelaufen: der nächste Lauf prüft wieder alle leeren Verträge
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(
+            f"✅ {written} von {seen} Verträgen gefüllt in {time.perf_counter() - started:.1f}s."
+        )
@@ -0,0 +1,73 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from documents.models import Document
+from documents.serializers import DocumentSerializer
+from documents.views import DocumentViewSet
+
+
+class _FullListViewSet(DocumentViewSet):
+    # Verhalten vor der schlanken Liste: alle Felder, kein defer, keine Pagination
+    pagination_class = None
+
+    def get_queryset(self):
+        return Document.objects.all()
+
+    def get_serializer_class(self):
+        return DocumentSerializer
+
+
+class Command(BaseCommand):
+    help = "Vergleicht Antwortgröße und Latenz von GET /documents/ mit und ohne schlanke Liste"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=3000, help='Anzahl synthetischer Dokumente')
+        parser.add_argument('--text-chars', type=int, default=40000, help='Textlänge je Dokument')
+        parser.add_argument('--repeat', type=int, default=5, help='Messungen je Variante')
+
+    def _measure(self, view, repeat):
+        factory = APIRequestFactory()
+        timings, size = [], 0
+        for _ in range(repeat):
+            request = factory.get('/documents/')
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append(time.perf_counter() - started)
+            size = len(response.content)
+        return statistics.median(timings), size
+
+    def handle(self, *args, **options):
+        count, chars = options['documents'], options['text_chars']
+        text = ("Leistungen ambulant und stationär gemäß Tarif GesundheitVARIO. " * (chars // 60 + 1))[:chars]
+
+        # Synthetische Daten nur innerhalb einer Transaktion, die am Ende zurückgerollt wird
+        with transaction.atomic():
+            Document.objects.bulk_create(
+                [
+                    Document(
+                        title=f"Benchmark {i}", file=f"documents/benchmark-{i}.pdf",
+                        extracted_text=text, text_length=len(text), page_count=chars // 3000 + 1,
+                        status=Document.STATUS_DONE,
+                    )
+                    for i in range(count)
+                ],
+                batch_size=500,
+            )
+
+            # Der Request-Host des APIRequestFactory ist 'testserver'
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                results = {
+                    'vorher (voller Text)': self._measure(_FullListViewSet.as_view({'get': 'list'}), options['repeat']),
+                    'nachher (schlank, Seite 1)': self._measure(DocumentViewSet.as_view({'get': 'list'}), options['repeat']),
+                }
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"📊 {count} Dokumente à {chars} Zeichen")
+        for label, (seconds, size) in results.items():
+            self.stdout.write(f"   {label:<28} {seconds * 1000:9.1f} ms  {size / 1024:11.1f} KB")
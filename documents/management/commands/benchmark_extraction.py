@@ -0,0 +1,73 @@
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.extractors import AUTO, BACKEND_CHOICES
+from documents.utils import extract_pdf_pages
+
+
+class Command(BaseCommand):
+    help = "Misst die Dauer der PDF-Textextraktion seriell und seitenparallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='PDF-Dateien oder Ordner (Standard: MEDIA_ROOT, also contracts/)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            default=[1, 2, os.cpu_count() or 1],
+            help='Zu vergleichende Prozesszahlen'
+        )
+        parser.add_argument(
+            '--backend',
+            choices=[name for name, _ in BACKEND_CHOICES],
+            default=AUTO,
+            help='Extraktor-Backend (Standard: automatische Wahl)'
+        )
+        parser.add_argument(
+            '--slowest',
+            type=int,
+            default=3,
+            help='Anzahl der langsamsten Seiten, die je Datei angezeigt werden'
+        )
+
+    def _pdf_files(self, paths):
+        for path in map(Path, paths or [settings.MEDIA_ROOT]):
+            if path.is_dir():
+                yield from sorted(path.rglob('*.pdf'))
+            else:
+                yield path
+
+    def handle(self, *args, **options):
+        workers = sorted(set(options['workers']))
+        totals = {w: 0.0 for w in workers}
+
+        for pdf in self._pdf_files(options['paths']):
+            self.stdout.write(f"📄 {pdf.name}")
+            baseline = None
+            for w in workers:
+                started = time.perf_counter()
+                pages = extract_pdf_pages(str(pdf), workers=w, backend=options['backend'])
+                elapsed = time.perf_counter() - started
+                totals[w] += elapsed
+                baseline = baseline or elapsed
+                self.stdout.write(
+                    f"   {w:>2} Prozess(e): {elapsed:7.2f}s "
+                    f"({len(pages)} Seiten, Speedup {baseline / elapsed:4.2f}x)"
+                )
+
+            slowest = sorted(pages, key=lambda p: p.seconds, reverse=True)[:options['slowest']]
+            timings = ", ".join(f"S.{p.number}: {p.seconds * 1000:.0f}ms" for p in slowest)
+            self.stdout.write(f"   Langsamste Seiten: {timings}")
+
+        base_total = totals[workers[0]]
+        for w in workers:
+            speedup = base_total / totals[w] if totals[w] else 0
+            self.stdout.write(f"Gesamt {w:>2} Prozess(e): {totals[w]:7.2f}s (Speedup {speedup:4.2f}x)")
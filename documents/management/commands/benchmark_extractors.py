@@ -0,0 +1,68 @@
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.extractors import BACKENDS, choose_backend
+from documents.utils import extract_pdf_pages
+
+WORD_RE = re.compile(r"\w+")
+
+
+def word_overlap(reference: str, candidate: str) -> float:
+    """Share of common words (multiset, order-insensitive) between two texts."""
+    ref, cand = Counter(WORD_RE.findall(reference.lower())), Counter(WORD_RE.findall(candidate.lower()))
+    union = sum((ref | cand).values())
+    return sum((ref & cand).values()) / union if union else 1.0
+
+
+class Command(BaseCommand):
+    help = "Vergleicht Geschwindigkeit und Textqualität der Extraktor-Backends (Referenz: pdfplumber)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='PDF-Dateien oder Ordner (Standard: MEDIA_ROOT, also contracts/)'
+        )
+        parser.add_argument(
+            '--backends',
+            nargs='+',
+            choices=list(BACKENDS),
+            default=list(BACKENDS),
+            help='Zu vergleichende Backends'
+        )
+
+    def _pdf_files(self, paths):
+        for path in map(Path, paths or [settings.MEDIA_ROOT]):
+            if path.is_dir():
+                yield from sorted(path.rglob('*.pdf'))
+            else:
+                yield path
+
+    def handle(self, *args, **options):
+        backends = options['backends']
+        totals = {name: 0.0 for name in backends}
+
+        for pdf in self._pdf_files(options['paths']):
+            self.stdout.write(f"📄 {pdf.name} (automatische Wahl: {choose_backend(str(pdf))})")
+            texts, timings = {}, {}
+            for name in ['pdfplumber'] + [b for b in backends if b != 'pdfplumber']:
+                started = time.perf_counter()
+                pages = extract_pdf_pages(str(pdf), workers=1, backend=name)
+                timings[name] = time.perf_counter() - started
+                texts[name] = "\n".join(page.text for page in pages)
+
+            for name in backends:
+                totals[name] += timings[name]
+                self.stdout.write(
+                    f"   {name:<11} {timings[name]:7.2f}s  "
+                    f"Speedup {timings['pdfplumber'] / timings[name]:5.1f}x  "
+                    f"Wortübereinstimmung {word_overlap(texts['pdfplumber'], texts[name]):6.1%}"
+                )
+
+        for name in backends:
+            self.stdout.write(f"Gesamt {name:<11} {totals[name]:7.2f}s")
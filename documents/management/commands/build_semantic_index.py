@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.services.semantic import SemanticIndex
+
+
+class Command(BaseCommand):
+    help = "Aktualisiert den semantischen Suchindex (nur neue oder geänderte Dokumente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Index komplett neu aufbauen'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = SemanticIndex().build(rebuild=options['rebuild'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"✅ {stats['documents']} Dokument(e) eingebettet ({stats['chunks']} Abschnitte), "
+            f"{stats['removed']} entfernt, {stats['rows']} Zeilen im Index – {elapsed:.1f}s"
+        )
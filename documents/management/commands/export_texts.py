@@ -0,0 +1,63 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.services.export import ITERATOR_CHUNK_SIZE, SOURCES, gzip_stream, iter_ndjson
+
+
+class Command(BaseCommand):
+    help = "Exportiert alle extrahierten Texte (Dokumente, Verträge) zeilenweise als NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Zieldatei (- = Standardausgabe)'
+        )
+        parser.add_argument(
+            '--source',
+            choices=SOURCES,
+            help='Nur Dokumente oder nur Verträge exportieren'
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Ausgabe gzip-komprimieren'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=ITERATOR_CHUNK_SIZE,
+            help='Zeilen pro Datenbank-Fetch'
+        )
+
+    def handle(self, *args, **options):
+        sources = [options['source']] if options['source'] else SOURCES
+        lines = 0
+
+        def counted(stream):
+            nonlocal lines
+            for line in stream:
+                lines += 1
+                yield line
+
+        stream = counted(iter_ndjson(sources, options['chunk_size']))
+        if options['gzip']:
+            stream = gzip_stream(stream)
+
+        started = time.perf_counter()
+        to_stdout = options['output'] == '-'
+        out = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        try:
+            for chunk in stream:
+                out.write(chunk)
+        finally:
+            if to_stdout:
+                out.flush()
+            else:
+                out.close()
+
+        # Bei Ausgabe auf stdout die Meldung nach stderr, damit die Datei sauber bleibt
+        report = self.stderr if to_stdout else self.stdout
+        report.write(f"✅ {lines} Einträge exportiert in {time.perf_counter() - started:.1f}s.")
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from documents.extractors import BACKENDS
+from documents.models import ExtractionCacheEntry
+from documents.services.cache import evict, invalidate_stale, stats
+
+
+class Command(BaseCommand):
+    help = "Statistik und Pflege des Extraktions-Caches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--invalidate-stale',
+            action='store_true',
+            help='Einträge älterer Extraktor-Versionen löschen'
+        )
+        parser.add_argument(
+            '--evict',
+            action='store_true',
+            help='Größenlimit sofort durchsetzen (LRU)'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Gesamten Cache leeren'
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = ExtractionCacheEntry.objects.all().delete()
+            self.stdout.write(f"🧹 {deleted} Einträge gelöscht.")
+        if options['invalidate_stale']:
+            deleted = invalidate_stale()
+            current = ", ".join(f"{name} {backend.version()}" for name, backend in BACKENDS.items())
+            self.stdout.write(f"🧹 {deleted} veraltete Einträge gelöscht (aktuell: {current}).")
+        if options['evict']:
+            self.stdout.write(f"🧹 {evict()} Einträge verdrängt.")
+
+        s = stats()
+        self.stdout.write(
+            f"📦 {s['entries']} Einträge, {s['size_bytes'] / 1024 / 1024:.1f} MB | "
+            f"Treffer {s['hits']}, Fehlschläge {s['misses']} (Trefferquote {s['hit_rate']:.0%}), "
+            f"Verdrängt {s['evictions']}"
+        )
@@ -0,0 +1,133 @@
+import os
+import shutil
+import time
+from collections import Counter
+from itertools import chain
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents.models import Document, DocumentVersion, UploadSession
+from documents.services.uploads import upload_dir
+from users.models import UserContract
+
+# (Model, Dateifeld) aller Verweise auf Dateien unter MEDIA_ROOT
+FILE_FIELDS = (
+    (Document, 'file'),
+    (DocumentVersion, 'file'),
+    (UserContract, 'pdf_file'),
+)
+
+
+class Command(BaseCommand):
+    help = "Löscht oder verschiebt Dateien unter MEDIA_ROOT, auf die keine Zeile mehr verweist"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Nur anzeigen, was gelöscht würde'
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Verwaiste Dateien in dieses Verzeichnis verschieben statt löschen'
+        )
+        parser.add_argument(
+            '--min-age-hours',
+            type=float,
+            default=24,
+            help='Jüngere Dateien nie anfassen (Uploads, deren Zeile noch nicht geschrieben ist)'
+        )
+
+    def _referenced(self, root):
+        """All file paths referenced from the database, read in one streaming pass."""
+        paths = set()
+        for model, field in FILE_FIELDS:
+            names = model.objects.exclude(**{field: ''}).values_list(field, flat=True)
+            for name in names.iterator(chunk_size=2000):
+                paths.add(os.path.normpath(os.path.join(root, name)))
+        return paths
+
+    def _still_referenced(self, relative):
+        # Zeile kann nach dem Einlesen von `referenced` entstanden sein (Dedup-Treffer eines neuen Uploads)
+        name = relative.replace(os.sep, '/')
+        return any(model.objects.filter(**{field: name}).exists() for model, field in FILE_FIELDS)
+
+    def _walk(self, root, skip):
+        stack = [root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or entry.path in skip:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+
+    def _orphaned_session_files(self):
+        # Reste abgebrochener Chunk-Uploads, deren Sitzung schon gelöscht ist
+        directory = upload_dir()
+        if not directory.is_dir():
+            return
+        sessions = {str(pk) for pk in UploadSession.objects.values_list('pk', flat=True).iterator()}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and entry.name.removesuffix('.part') not in sessions:
+                    yield entry
+
+    def _remove(self, entry, relative, options):
+        if options['dry_run']:
+            return
+        if options['quarantine']:
+            target = os.path.join(options['quarantine'], relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(entry.path, target)
+        else:
+            os.remove(entry.path)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        root = os.path.realpath(settings.MEDIA_ROOT)
+        quarantine = options['quarantine'] and os.path.realpath(options['quarantine'])
+        options['quarantine'] = quarantine
+        cutoff = time.time() - options['min_age_hours'] * 3600
+
+        referenced = self._referenced(root)
+        self.stdout.write(f"📄 {len(referenced)} referenzierte Datei(en) in der Datenbank")
+
+        # Quarantäne und Chunk-Uploads (falls unter MEDIA_ROOT) nicht als Medien behandeln
+        skip = {quarantine, os.path.realpath(upload_dir())}
+        media = self._walk(root, skip) if os.path.isdir(root) else ()
+        candidates = chain(
+            ((entry, os.path.relpath(entry.path, root)) for entry in media),
+            ((entry, os.path.join('upload_sessions', entry.name)) for entry in self._orphaned_session_files()),
+        )
+
+        removed, reclaimed, recent, per_dir = 0, 0, 0, Counter()
+        for entry, relative in candidates:
+            if entry.path in referenced:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                recent += 1
+                continue
+            if self._still_referenced(relative):
+                continue
+            self._remove(entry, relative, options)
+            removed += 1
+            reclaimed += stat.st_size
+            per_dir[relative.split(os.sep, 1)[0] if os.sep in relative else os.path.basename(root)] += stat.st_size
+            if options['verbosity'] > 1:
+                self.stdout.write(f"🧹 {relative} ({stat.st_size} Bytes)")
+
+        for directory, size in per_dir.most_common():
+            self.stdout.write(f"📦 {directory}/: {size / (1024 * 1024):.1f} MB")
+        if recent:
+            self.stdout.write(f"↪ {recent} verwaiste Datei(en) jünger als {options['min_age_hours']:g} h übersprungen")
+
+        action = 'würden gelöscht' if options['dry_run'] else ('verschoben' if quarantine else 'gelöscht')
+        self.stdout.write(
+            f"✅ {removed} verwaiste Datei(en) {action}, {reclaimed / (1024 * 1024):.1f} MB "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.extractors import AUTO, BACKEND_CHOICES
+from documents.services.ingest import extract_concurrently, ingest, iter_paths
+from documents.services.queue import schedule_extractions
+from documents.utils import extraction_workers
+from users.models import InsuranceCompany, Tariff
+
+
+class Command(BaseCommand):
+    help = "Importiert viele PDFs (Ordner, Dateien oder ZIP-Archive) als Dokumente und extrahiert sie parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Ordner, PDF-Dateien oder ZIP-Archive')
+        parser.add_argument('--company', help='Name der Versicherung, der die Dokumente zugeordnet werden')
+        parser.add_argument('--tariff', help='Name des Tarifs (innerhalb der Versicherung)')
+        parser.add_argument(
+            '--extractor',
+            choices=[name for name, _ in BACKEND_CHOICES],
+            default=AUTO,
+            help='Extraktor-Backend (Standard: automatische Wahl)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Prozesse für die Extraktion (0 = DOCUMENT_EXTRACTION_PROCESSES)'
+        )
+        parser.add_argument(
+            '--queue',
+            action='store_true',
+            help='Nicht selbst extrahieren, sondern Jobs für process_documents anlegen'
+        )
+
+    def _assignment(self, options):
+        company = tariff = None
+        if options['company']:
+            company = InsuranceCompany.objects.filter(name=options['company']).first()
+            if company is None:
+                raise CommandError(f"Versicherung nicht gefunden: {options['company']}")
+        if options['tariff']:
+            tariffs = Tariff.objects.filter(name=options['tariff'])
+            tariff = (tariffs.filter(company=company) if company else tariffs).first()
+            if tariff is None:
+                raise CommandError(f"Tarif nicht gefunden: {options['tariff']}")
+        return company, tariff
+
+    def handle(self, *args, **options):
+        company, tariff = self._assignment(options)
+
+        started = time.perf_counter()
+        items, documents = ingest(
+            iter_paths(options['paths']), insurance_company=company, tariff=tariff, extractor=options['extractor']
+        )
+        for item in items:
+            marker = {'neu': '📄', 'duplikat': '↪', 'ungültig': '⚠️'}.get(item.status, '•')
+            detail = item.error or (f"Dokument {item.document_id}" if item.document_id else '')
+            self.stdout.write(f"{marker} {item.name}: {item.status} {detail}".rstrip())
+        self.stdout.write(
+            f"📦 {len(items)} Datei(en), {len(documents)} neu angelegt in {time.perf_counter() - started:.1f}s"
+        )
+
+        if options['queue']:
+            self.stdout.write(f"✅ {schedule_extractions(documents)} Job(s) für process_documents angelegt.")
+            return
+
+        workers = options['workers'] or extraction_workers()
+        started = time.perf_counter()
+        done = failed = pages = 0
+        for document, page_count, seconds, error in extract_concurrently(documents, workers):
+            if error:
+                failed += 1
+                self.stdout.write(f"⚠️ {document.title}: {error}")
+                continue
+            done += 1
+            pages += page_count
+            source = 'Cache' if not seconds else f"{seconds:.1f}s"
+            self.stdout.write(f"✅ {document.title}: {page_count} Seiten ({source})")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"📊 {done} extrahiert, {failed} fehlgeschlagen in {elapsed:.1f}s "
+            f"({done / elapsed if elapsed else 0:.2f} Dok./s, {pages / elapsed if elapsed else 0:.1f} Seiten/s, "
+            f"{workers} Prozess(e))"
+        )
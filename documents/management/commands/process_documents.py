@@ -0,0 +1,59 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from documents.services.queue import claim_next_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Arbeitet die Warteschlange der Textextraktion für hochgeladene Dokumente ab"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Beenden, sobald keine fälligen Jobs mehr vorhanden sind'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Nach dieser Anzahl verarbeiteter Jobs beenden (0 = unbegrenzt)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Wartezeit in Sekunden, wenn die Warteschlange leer ist'
+        )
+        parser.add_argument(
+            '--worker-id',
+            default=f"{socket.gethostname()}-{os.getpid()}",
+            help='Kennung dieses Workers (für Sperren und Logs)'
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id']
+        processed = 0
+        self.stdout.write(f"🛠️ Worker {worker_id} gestartet")
+
+        try:
+            while not options['max_jobs'] or processed < options['max_jobs']:
+                requeue_stale_jobs()
+                job = claim_next_job(worker_id)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                ok = run_job(job)
+                processed += 1
+                marker = "✅" if ok else "⚠️"
+                self.stdout.write(f"{marker} Job {job.pk} (Dokument {job.document_id})")
+        except KeyboardInterrupt:
+            self.stdout.write("Worker wird beendet...")
+
+        self.stdout.write(f"Fertig: {processed} Job(s) verarbeitet.")
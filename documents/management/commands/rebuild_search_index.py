@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.services.pages import stored_pages
+from documents.services.search import index_contract, index_document
+from documents.utils import PageText
+from users.models import UserContract
+
+
+class Command(BaseCommand):
+    help = "Baut den Volltext-Suchindex für alle Dokumente und Verträge neu auf"
+
+    def handle(self, *args, **options):
+        documents = contracts = 0
+
+        for document in Document.objects.filter(status=Document.STATUS_DONE).iterator():
+            # Ältere Dokumente ohne Seiten: Gesamttext als eine Seite indexieren
+            pages = stored_pages(document.pk) or [PageText(1, document.extracted_text or '', 0.0)]
+            index_document(document, pages)
+            documents += 1
+
+        for contract in UserContract.objects.exclude(text_content='').iterator():
+            index_contract(contract)
+            contracts += 1
+
+        self.stdout.write(f"✅ {documents} Dokument(e) und {contracts} Vertrag/Verträge indexiert.")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.services.pages import stored_pages
+from documents.services.sections import store_sections
+from documents.utils import PageText
+
+
+class Command(BaseCommand):
+    help = "Zerlegt alle extrahierten Dokumente neu in Abschnitte (ambulant, stationär, Zahn, ...)"
+
+    def handle(self, *args, **options):
+        documents = sections = 0
+
+        for document in Document.objects.filter(status=Document.STATUS_DONE).iterator():
+            # Ältere Dokumente ohne Seiten: Gesamttext als eine Seite zerlegen
+            pages = stored_pages(document.pk) or [PageText(1, document.extracted_text or '', 0.0)]
+            sections += store_sections(document, pages)
+            documents += 1
+
+        self.stdout.write(f"✅ {sections} Abschnitt(e) in {documents} Dokument(en) gespeichert.")
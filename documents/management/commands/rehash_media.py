@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.storage import content_hash_from_name
+from users.models import UserContract
+
+# (Model, Dateifeld) aller inhaltsadressiert gespeicherten Uploads
+FILE_FIELDS = (
+    (Document, 'file'),
+    (UserContract, 'pdf_file'),
+)
+
+
+class Command(BaseCommand):
+    help = "Überführt bestehende Uploads in den inhaltsadressierten Speicher (SHA-256) und entfernt Duplikate"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Nur anzeigen, was verschoben würde'
+        )
+
+    def _is_referenced(self, name):
+        return any(
+            model.objects.filter(**{field: name}).exists()
+            for model, field in FILE_FIELDS
+        )
+
+    def handle(self, *args, **options):
+        moved = reclaimed = 0
+
+        for model, field in FILE_FIELDS:
+            for obj in model.objects.exclude(**{field: ''}).iterator():
+                field_file = getattr(obj, field)
+                old_name = field_file.name
+                if content_hash_from_name(old_name):
+                    continue
+
+                storage = field_file.storage
+                if not storage.exists(old_name):
+                    self.stdout.write(f"⚠️ Datei fehlt: {old_name}")
+                    continue
+
+                if options['dry_run']:
+                    self.stdout.write(f"↪ {old_name}")
+                    continue
+
+                size = storage.size(old_name)
+                with storage.open(old_name) as content:
+                    new_name = storage.save(old_name, content)
+                model.objects.filter(pk=obj.pk).update(
+                    **{field: new_name, 'content_hash': content_hash_from_name(new_name)}
+                )
+                moved += 1
+                self.stdout.write(f"↪ {old_name} → {new_name}")
+
+                # Altes Exemplar nur löschen, wenn keine andere Zeile mehr darauf zeigt
+                if not self._is_referenced(old_name):
+                    storage.delete(old_name)
+                    reclaimed += size
+
+        self.stdout.write(f"✅ {moved} Datei(en) umgezogen, {reclaimed / 1024 / 1024:.1f} MB freigegeben.")
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.20 on 2026-10-17 14:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_existing_documents_done(apps, schema_editor):
+    # Documents uploaded before the queue existed were extracted inline
+    Document = apps.get_model('documents', 'Document')
+    Document.objects.update(status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='extraction_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ausstehend'), ('processing', 'In Bearbeitung'), ('done', 'Fertig'), ('failed', 'Fehlgeschlagen')], db_index=True, default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ExtractionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Wartend'), ('running', 'Läuft'), ('done', 'Erledigt'), ('failed', 'Fehlgeschlagen')], default='queued', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('run_after', models.DateTimeField()),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extraction_jobs', to='documents.document')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='documents_job_queue_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_documents_done, migrations.RunPython.noop),
+    ]
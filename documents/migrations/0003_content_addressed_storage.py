@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-17 14:57
+
+from django.db import migrations, models
+import documents.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_extraction_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=documents.storage.ContentAddressedStorage(), upload_to='documents/'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 4.2.20 on 2026-10-17 14:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE documents_searchentry ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('german', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('german', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX documents_searchentry_vector_gin ON documents_searchentry USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS documents_searchentry_vector_gin",
+    "ALTER TABLE documents_searchentry DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE documents_searchentry_fts USING fts5(
+        title, body, content='documents_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER documents_searchentry_ai AFTER INSERT ON documents_searchentry BEGIN
+        INSERT INTO documents_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER documents_searchentry_ad AFTER DELETE ON documents_searchentry BEGIN
+        INSERT INTO documents_searchentry_fts(documents_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER documents_searchentry_au AFTER UPDATE ON documents_searchentry BEGIN
+        INSERT INTO documents_searchentry_fts(documents_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO documents_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS documents_searchentry_au",
+    "DROP TRIGGER IF EXISTS documents_searchentry_ad",
+    "DROP TRIGGER IF EXISTS documents_searchentry_ai",
+    "DROP TABLE IF EXISTS documents_searchentry_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_BACKWARD)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_usercontract_content_hash'),
+        ('documents', '0004_document_pages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.PositiveIntegerField()),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('contract', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='users.usercontract')),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='documents.document')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['document', 'segment'], name='documents_search_doc_idx'), models.Index(fields=['contract', 'segment'], name='documents_search_contract_idx')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
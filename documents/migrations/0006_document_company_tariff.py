@@ -0,0 +1,25 @@
+# Generated by Django 4.2.20 on 2026-10-17 15:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_usercontract_content_hash'),
+        ('documents', '0005_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='insurance_company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='documents', to='users.insurancecompany'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='tariff',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='documents', to='users.tariff'),
+        ),
+    ]
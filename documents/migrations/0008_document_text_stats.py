@@ -0,0 +1,39 @@
+# Generated by Django 4.2.20 on 2026-10-17 15:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Length
+
+
+def fill_text_stats(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    DocumentPage = apps.get_model('documents', 'DocumentPage')
+    pages = (
+        DocumentPage.objects.filter(document=OuterRef('pk'))
+        .order_by().values('document').annotate(n=Count('pk')).values('n')
+    )
+    Document.objects.update(
+        text_length=Coalesce(Length('extracted_text'), 0),
+        page_count=Coalesce(Subquery(pages), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_extraction_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='page_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='text_length',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_text_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-17 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_document_text_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='extracted_with',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='extractor',
+            field=models.CharField(choices=[('auto', 'Automatisch'), ('pdfium', 'pypdfium2 (schnell)'), ('pdfplumber', 'pdfplumber (Tabellen)'), ('pypdf2', 'PyPDF2'), ('pdfminer', 'pdfminer.six')], default='auto', max_length=20),
+        ),
+    ]
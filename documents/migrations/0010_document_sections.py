@@ -0,0 +1,36 @@
+# Generated by Django 4.2.20 on 2026-10-17 15:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_document_extractor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('kind', models.CharField(choices=[('ambulant', 'Leistungen ambulant'), ('stationaer', 'Leistungen stationär'), ('zahn', 'Leistungen Zahn'), ('selbstbeteiligung', 'Selbstbeteiligung'), ('allgemein', 'Allgemein')], default='allgemein', max_length=20)),
+                ('heading', models.CharField(blank=True, max_length=255)),
+                ('start_page', models.PositiveIntegerField()),
+                ('end_page', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('char_count', models.PositiveIntegerField(default=0)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='documents.document')),
+            ],
+            options={
+                'ordering': ['document', 'position'],
+                'indexes': [models.Index(fields=['document', 'kind'], name='documents_section_kind_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentsection',
+            constraint=models.UniqueConstraint(fields=('document', 'position'), name='documents_section_unique_position'),
+        ),
+    ]
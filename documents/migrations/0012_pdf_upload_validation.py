@@ -0,0 +1,20 @@
+# Generated by Django 4.2.20 on 2026-10-17 15:17
+
+from django.db import migrations, models
+import documents.storage
+import documents.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_upload_session'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=documents.storage.ContentAddressedStorage(), upload_to='documents/', validators=[documents.validators.validate_pdf]),
+        ),
+    ]
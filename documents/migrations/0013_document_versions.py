@@ -0,0 +1,49 @@
+# Generated by Django 4.2.20 on 2026-10-17 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import documents.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0012_pdf_upload_validation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='reused_pages',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='documentpage',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='DocumentVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('file', models.FileField(storage=documents.storage.ContentAddressedStorage(), upload_to='documents/')),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('page_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='documents.document')),
+            ],
+            options={
+                'ordering': ['document', '-version'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentversion',
+            constraint=models.UniqueConstraint(fields=('document', 'version'), name='documents_version_unique_number'),
+        ),
+    ]
@@ -1,13 +1,274 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 
+from .extractors import AUTO, BACKEND_CHOICES
+from .storage import ContentAddressedStorage, commit_content_addressed
+from .validators import validate_pdf
+
 # Create your models here.
 
 
 class Document(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Ausstehend'),
+        (STATUS_PROCESSING, 'In Bearbeitung'),
+        (STATUS_DONE, 'Fertig'),
+        (STATUS_FAILED, 'Fehlgeschlagen'),
+    )
+
     title = models.CharField(max_length=255)
-    file = models.FileField(upload_to='documents/')
+    file = models.FileField(upload_to='documents/', storage=ContentAddressedStorage(), validators=[validate_pdf])
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     extracted_text = models.TextField(blank=True, null=True)
+    text_length = models.PositiveIntegerField(default=0)
+    page_count = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    extractor = models.CharField(max_length=20, choices=BACKEND_CHOICES, default=AUTO)
+    extracted_with = models.CharField(max_length=20, blank=True)
+    insurance_company = models.ForeignKey(
+        'users.InsuranceCompany', null=True, blank=True, related_name='documents', on_delete=models.SET_NULL
+    )
+    tariff = models.ForeignKey(
+        'users.Tariff', null=True, blank=True, related_name='documents', on_delete=models.SET_NULL
+    )
+    extraction_error = models.TextField(blank=True)
+    # Versionsnummer der aktuellen Datei und bei der letzten Extraktion übernommene Seiten
+    version = models.PositiveIntegerField(default=1)
+    reused_pages = models.PositiveIntegerField(default=0)
+
+    def save(self, *args, **kwargs):
+        # Datei zuerst ablegen, damit der Inhalts-Hash vor dem INSERT feststeht
+        self.content_hash = commit_content_addressed(self.file) or self.content_hash
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
+
+
+class ExtractionJob(models.Model):
+    """
+    Database-backed queue entry for the text extraction of a document.
+
+    Jobs are claimed by `manage.py process_documents` workers; the table
+    itself is the queue, so no external broker is required.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Wartend'),
+        (STATUS_RUNNING, 'Läuft'),
+        (STATUS_DONE, 'Erledigt'),
+        (STATUS_FAILED, 'Fehlgeschlagen'),
+    )
+
+    document = models.ForeignKey(Document, related_name='extraction_jobs', on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='documents_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"Extraction job {self.pk} for document {self.document_id} ({self.status})"
+
+
+class DocumentPage(models.Model):
+    """Extracted text of a single page, so clients can fetch page ranges."""
+    document = models.ForeignKey(Document, related_name='pages', on_delete=models.CASCADE)
+    number = models.PositiveIntegerField()
+    text = models.TextField(blank=True)
+    char_count = models.PositiveIntegerField(default=0)
+    # Hash des Seiteninhalts im PDF (Inhaltsstream samt Formularen), Schlüssel für die Übernahme in neue Versionen
+    content_hash = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        ordering = ['document', 'number']
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'number'], name='documents_page_unique_number'),
+        ]
+
+    def __str__(self):
+        return f"{self.document} – Seite {self.number}"
+
+
+class DocumentVersion(models.Model):
+    """
+    A superseded file of a document.
+
+    Insurers republish their tariff documents yearly with few changed
+    pages; a new version replaces the document's file in place and only
+    pages whose content hash changed are extracted again.
+    """
+    document = models.ForeignKey(Document, related_name='versions', on_delete=models.CASCADE)
+    version = models.PositiveIntegerField()
+    file = models.FileField(upload_to='documents/', storage=ContentAddressedStorage())
+    content_hash = models.CharField(max_length=64, blank=True)
+    page_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['document', '-version']
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'version'], name='documents_version_unique_number'),
+        ]
+
+    def __str__(self):
+        return f"{self.document} – Version {self.version}"
+
+
+class DocumentSection(models.Model):
+    """A typed section of a tariff document (heading, text and page span), computed at ingest."""
+    KIND_AMBULANT = 'ambulant'
+    KIND_STATIONAER = 'stationaer'
+    KIND_ZAHN = 'zahn'
+    KIND_SELBSTBETEILIGUNG = 'selbstbeteiligung'
+    KIND_ALLGEMEIN = 'allgemein'
+
+    KIND_CHOICES = [
+        (KIND_AMBULANT, 'Leistungen ambulant'),
+        (KIND_STATIONAER, 'Leistungen stationär'),
+        (KIND_ZAHN, 'Leistungen Zahn'),
+        (KIND_SELBSTBETEILIGUNG, 'Selbstbeteiligung'),
+        (KIND_ALLGEMEIN, 'Allgemein'),
+    ]
+
+    document = models.ForeignKey(Document, related_name='sections', on_delete=models.CASCADE)
+    position = models.PositiveIntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_ALLGEMEIN)
+    heading = models.CharField(max_length=255, blank=True)
+    start_page = models.PositiveIntegerField()
+    end_page = models.PositiveIntegerField()
+    text = models.TextField(blank=True)
+    char_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['document', 'position']
+        indexes = [
+            models.Index(fields=['document', 'kind'], name='documents_section_kind_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'position'], name='documents_section_unique_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.document} – {self.heading or self.get_kind_display()}"
+
+
+class SearchEntry(models.Model):
+    """
+    Full-text search segment: one page of a document or one chunk of a
+    user contract. The database-specific index (Postgres tsvector + GIN,
+    SQLite FTS5) is created in migration 0005 and kept in sync by the DB.
+    """
+    document = models.ForeignKey(
+        Document, null=True, blank=True, related_name='search_entries', on_delete=models.CASCADE
+    )
+    contract = models.ForeignKey(
+        'users.UserContract', null=True, blank=True, related_name='search_entries', on_delete=models.CASCADE
+    )
+    segment = models.PositiveIntegerField()
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['document', 'segment'], name='documents_search_doc_idx'),
+            models.Index(fields=['contract', 'segment'], name='documents_search_contract_idx'),
+        ]
+
+    def __str__(self):
+        source = f"Dokument {self.document_id}" if self.document_id else f"Vertrag {self.contract_id}"
+        return f"{source} – Abschnitt {self.segment}"
+
+
+class ExtractionCacheEntry(models.Model):
+    """
+    Extracted pages of a PDF, keyed by content hash and extractor.
+
+    Entries of an older extractor version are never hit again and can be
+    removed with `manage.py extraction_cache --invalidate-stale`.
+    """
+    content_hash = models.CharField(max_length=64)
+    backend = models.CharField(max_length=30)
+    version = models.CharField(max_length=30)
+    pages = models.JSONField(default=list)
+    size_bytes = models.PositiveBigIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_hash', 'backend', 'version'], name='documents_cache_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.backend} {self.version})"
+
+
+class ExtractionCacheStats(models.Model):
+    """Single-row hit/miss/eviction counters of the extraction cache."""
+    hits = models.PositiveBigIntegerField(default=0)
+    misses = models.PositiveBigIntegerField(default=0)
+    evictions = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.hits} hits / {self.misses} misses"
+
+
+class UploadSession(models.Model):
+    """
+    A chunked, resumable upload of a large PDF.
+
+    Chunks are written straight into a temporary file at their offset;
+    `received` is the number of contiguous bytes on disk, so a client can
+    resume after a dropped connection from there.
+    """
+    TARGET_DOCUMENT = 'document'
+    TARGET_CONTRACT = 'contract'
+    TARGET_CHOICES = (
+        (TARGET_DOCUMENT, 'Dokument'),
+        (TARGET_CONTRACT, 'Vertrag'),
+    )
+
+    STATUS_OPEN = 'open'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = (
+        (STATUS_OPEN, 'Offen'),
+        (STATUS_COMPLETE, 'Abgeschlossen'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='upload_sessions', on_delete=models.CASCADE)
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES, default=TARGET_DOCUMENT)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    received = models.PositiveBigIntegerField(default=0)
+    # Felder für das Zielobjekt (Titel, Tarif, ... bzw. Nutzer des Vertrags)
+    metadata = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size} Bytes)"
@@ -1,8 +1,61 @@
 from rest_framework import serializers
-from .models import Document
+from .models import Document, DocumentPage, DocumentSection, DocumentVersion, UploadSession
 
 
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
-        fields = ('id', 'title', 'file', 'uploaded_at', 'extracted_text')
+        fields = ('id', 'title', 'file', 'uploaded_at', 'extracted_text', 'text_length', 'page_count',
+                  'status', 'extraction_error', 'extractor', 'extracted_with', 'insurance_company', 'tariff',
+                  'version', 'reused_pages')
+        read_only_fields = ('extracted_text', 'text_length', 'page_count', 'status', 'extraction_error',
+                            'extracted_with', 'version', 'reused_pages')
+
+
+class DocumentListSerializer(serializers.ModelSerializer):
+    # Listenansicht ohne extracted_text: nur Länge und Seitenzahl
+    class Meta:
+        model = Document
+        fields = ('id', 'title', 'file', 'uploaded_at', 'text_length', 'page_count',
+                  'status', 'insurance_company', 'tariff', 'version')
+        read_only_fields = fields
+
+
+class DocumentPageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DocumentPage
+        fields = ('number', 'text', 'char_count')
+
+
+class DocumentVersionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DocumentVersion
+        fields = ('version', 'file', 'content_hash', 'page_count', 'created_at')
+
+
+class DocumentSectionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DocumentSection
+        fields = ('position', 'kind', 'heading', 'start_page', 'end_page', 'char_count', 'text')
+
+
+class DocumentSectionSummarySerializer(serializers.ModelSerializer):
+    # Gliederung ohne Text
+    class Meta:
+        model = DocumentSection
+        fields = ('position', 'kind', 'heading', 'start_page', 'end_page', 'char_count')
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'target', 'filename', 'size', 'sha256', 'metadata', 'offset', 'status', 'created_at')
+        read_only_fields = ('id', 'status', 'created_at')
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or any(c not in '0123456789abcdef' for c in value)):
+            raise serializers.ValidationError('SHA-256 als 64 Hex-Zeichen erwartet.')
+        return value
@@ -0,0 +1,133 @@
+"""
+Persistent cache of PDF extraction results.
+
+Entries are keyed by content hash plus extractor backend and version, so
+re-uploads and backfills of an unchanged PDF skip extraction entirely,
+while an upgrade of the extractor library misses automatically. The
+cache is bounded by total text size and evicts least recently used
+entries.
+"""
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ..extractors import BACKENDS, PageText
+from ..models import ExtractionCacheEntry, ExtractionCacheStats
+from ..utils import extractor_version
+
+logger = logging.getLogger(__name__)
+
+
+def _count(**increments) -> None:
+    updated = ExtractionCacheStats.objects.filter(pk=1).update(
+        **{name: F(name) + value for name, value in increments.items()}
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                ExtractionCacheStats.objects.create(pk=1, **increments)
+        except IntegrityError:
+            _count(**increments)
+
+
+def lookup(content_hash: str, backend: str, version: str | None = None,
+           count_miss: bool = True) -> list[PageText] | None:
+    """
+    Return cached pages for this content and extractor, counting hit/miss.
+
+    Callers that fall back to a queued extraction pass `count_miss=False`,
+    so the miss is counted once, by the worker.
+    """
+    if not content_hash:
+        return None
+    version = version or extractor_version(backend)
+    entry = (
+        ExtractionCacheEntry.objects.filter(content_hash=content_hash, backend=backend, version=version)
+        .values_list("pk", "pages")
+        .first()
+    )
+    if entry is None:
+        if count_miss:
+            _count(misses=1)
+        return None
+
+    pk, pages = entry
+    ExtractionCacheEntry.objects.filter(pk=pk).update(hits=F("hits") + 1, last_used_at=timezone.now())
+    _count(hits=1)
+    return [PageText(number, text, 0.0) for number, text in enumerate(pages, start=1)]
+
+
+def store(content_hash: str, pages: list[PageText], backend: str,
+          version: str | None = None) -> None:
+    """Remember the extraction result and enforce the size limit."""
+    if not content_hash:
+        return
+    texts = [p.text for p in pages]
+    try:
+        with transaction.atomic():
+            ExtractionCacheEntry.objects.update_or_create(
+                content_hash=content_hash,
+                backend=backend,
+                version=version or extractor_version(backend),
+                defaults={
+                    "pages": texts,
+                    "size_bytes": sum(len(t.encode("utf-8")) for t in texts),
+                    "last_used_at": timezone.now(),
+                },
+            )
+    except IntegrityError:
+        # Ein anderer Worker hat denselben Eintrag gleichzeitig angelegt
+        pass
+    evict()
+
+
+def evict(max_bytes: int | None = None) -> int:
+    """Delete least recently used entries until the cache fits its size limit."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, "DOCUMENT_EXTRACTION_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+    total = ExtractionCacheEntry.objects.aggregate(total=Sum("size_bytes"))["total"] or 0
+    if total <= max_bytes:
+        return 0
+
+    victims = []
+    for pk, size in ExtractionCacheEntry.objects.order_by("last_used_at").values_list("pk", "size_bytes").iterator():
+        if total <= max_bytes:
+            break
+        victims.append(pk)
+        total -= size
+    deleted, _ = ExtractionCacheEntry.objects.filter(pk__in=victims).delete()
+    if deleted:
+        _count(evictions=deleted)
+        logger.info(f"Extraction cache evicted {deleted} entries")
+    return deleted
+
+
+def invalidate_stale() -> int:
+    """Drop entries that were produced by another version of their backend."""
+    deleted = 0
+    for name, backend in BACKENDS.items():
+        count, _ = (
+            ExtractionCacheEntry.objects.filter(backend=name)
+            .exclude(version=backend.version())
+            .delete()
+        )
+        deleted += count
+    return deleted
+
+
+def stats() -> dict:
+    """Hit/miss counters plus current size of the cache."""
+    counters = ExtractionCacheStats.objects.filter(pk=1).values("hits", "misses", "evictions").first() or {
+        "hits": 0, "misses": 0, "evictions": 0,
+    }
+    totals = ExtractionCacheEntry.objects.aggregate(size=Sum("size_bytes"))
+    lookups = counters["hits"] + counters["misses"]
+    return {
+        **counters,
+        "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+        "entries": ExtractionCacheEntry.objects.count(),
+        "size_bytes": totals["size"] or 0,
+    }
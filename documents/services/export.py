@@ -0,0 +1,64 @@
+"""
+Streaming NDJSON export of extracted texts.
+
+Rows are read with `.iterator(chunk_size=...)` (a server-side cursor on
+Postgres) and written one JSON object per line, optionally gzip-compressed
+on the fly, so memory stays flat no matter how large the corpus is. Used
+by `GET /documents/export/` and `manage.py export_texts`.
+"""
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users.models import UserContract
+
+from ..models import Document
+
+SOURCES = ('documents', 'contracts')
+
+# Zeilen pro Datenbank-Fetch
+ITERATOR_CHUNK_SIZE = 200
+
+# Komprimierte Ausgabe erst ab dieser Größe weitergeben (weniger, größere Chunks)
+GZIP_FLUSH_BYTES = 64 * 1024
+
+
+def iter_documents(chunk_size=ITERATOR_CHUNK_SIZE):
+    fields = ('id', 'title', 'content_hash', 'version', 'page_count', 'status', 'extracted_with',
+              'insurance_company_id', 'tariff_id', 'uploaded_at', 'extracted_text')
+    rows = Document.objects.order_by('pk').values_list(*fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = dict(zip(fields, row))
+        record['text'] = record.pop('extracted_text') or ''
+        yield {'source': 'document', **record}
+
+
+def iter_contracts(chunk_size=ITERATOR_CHUNK_SIZE):
+    fields = ('id', 'user_id', 'pdf_file', 'content_hash', 'text_content')
+    rows = UserContract.objects.order_by('pk').values_list(*fields)
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = dict(zip(fields, row))
+        record['text'] = record.pop('text_content')
+        yield {'source': 'contract', **record}
+
+
+def iter_ndjson(sources=SOURCES, chunk_size=ITERATOR_CHUNK_SIZE):
+    """Yield one encoded NDJSON line per document/contract."""
+    readers = {'documents': iter_documents, 'contracts': iter_contracts}
+    for source in sources:
+        for record in readers[source](chunk_size):
+            yield (json.dumps(record, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n').encode('utf-8')
+
+
+def gzip_stream(chunks, level=6):
+    """Compress a byte stream into a gzip stream, chunk by chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += compressor.compress(chunk)
+        if len(buffer) >= GZIP_FLUSH_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += compressor.flush()
+    yield bytes(buffer)
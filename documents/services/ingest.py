@@ -0,0 +1,172 @@
+"""
+Bulk ingest of tariff documents (many PDFs or zip archives at once).
+
+Files are written through the content-addressed storage, deduplicated
+by content hash against each other and against existing documents, and
+the new rows are inserted with a single `bulk_create`. Extraction then
+runs either through the job queue (API) or directly in a process pool
+(`manage.py ingest_documents`).
+"""
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import connections
+
+from ..extractors import AUTO, choose_backend
+from ..models import Document
+from ..storage import content_hash_from_name
+from ..utils import extract_pdf_pages
+from ..validators import validate_pdf
+from .cache import lookup, store
+from .ocr import ocr_empty_pages
+from .queue import complete_extraction
+
+logger = logging.getLogger(__name__)
+
+STATUS_NEW = 'neu'
+STATUS_DUPLICATE = 'duplikat'
+STATUS_INVALID = 'ungültig'
+
+
+@dataclass
+class IngestItem:
+    name: str
+    status: str
+    document_id: int | None = None
+    content_hash: str = ''
+    error: str = ''
+
+
+def iter_zip(fileobj):
+    """Yield (name, file) for the PDFs inside a zip archive."""
+    max_bytes = getattr(settings, 'UPLOAD_MAX_BYTES', 200 * 1024 * 1024)
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or name.startswith('__MACOSX/') or not name.lower().endswith('.pdf'):
+                continue
+            if info.file_size > max_bytes:
+                logger.warning(f"Skipping {name} in zip: {info.file_size} bytes")
+                continue
+            with archive.open(info) as member:
+                yield os.path.basename(name), member
+
+
+def iter_paths(paths):
+    """Yield (name, file) for PDFs and zip archives in files or directories."""
+    for path in map(Path, paths):
+        files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+        for file_path in files:
+            suffix = file_path.suffix.lower()
+            if suffix == '.zip':
+                with open(file_path, 'rb') as f:
+                    yield from iter_zip(f)
+            elif suffix == '.pdf':
+                with open(file_path, 'rb') as f:
+                    yield file_path.name, f
+
+
+def iter_uploads(uploaded_files):
+    """Yield (name, file) for uploaded PDFs, unpacking zip archives."""
+    for upload in uploaded_files:
+        if upload.name.lower().endswith('.zip'):
+            yield from iter_zip(upload)
+        else:
+            yield upload.name, upload
+
+
+def ingest(files, insurance_company=None, tariff=None, extractor=AUTO) -> tuple[list[IngestItem], list[Document]]:
+    """
+    Store files and create `Document` rows for new content.
+
+    Returns one item per input file plus the newly created documents.
+    """
+    field = Document._meta.get_field('file')
+    items, pending = [], {}
+    for name, fileobj in files:
+        upload = File(fileobj, name)
+        try:
+            # Gleiche Vorprüfung wie beim Einzel-Upload (Format, Seiten, Textebene)
+            validate_pdf(upload)
+        except ValidationError as e:
+            items.append(IngestItem(name, STATUS_INVALID, error=' '.join(e.messages)))
+            continue
+        # Speichert jeden Inhalt nur einmal auf der Platte, auch bei Duplikaten
+        stored = field.storage.save(f"{field.upload_to}{os.path.basename(name)}", upload)
+        content_hash = content_hash_from_name(stored)
+        item = IngestItem(name, STATUS_NEW, content_hash=content_hash)
+        items.append(item)
+        if content_hash in pending:
+            item.status = STATUS_DUPLICATE
+        else:
+            pending[content_hash] = (item, stored)
+
+    existing = dict(
+        Document.objects.filter(content_hash__in=pending).values_list('content_hash', 'pk')
+    )
+    new_documents = []
+    for content_hash, (item, stored) in pending.items():
+        if content_hash in existing:
+            item.status = STATUS_DUPLICATE
+            continue
+        new_documents.append(Document(
+            title=Path(item.name).stem[:255], file=stored, content_hash=content_hash,
+            status=Document.STATUS_PENDING, extractor=extractor,
+            insurance_company=insurance_company, tariff=tariff,
+        ))
+    new_documents = Document.objects.bulk_create(new_documents)
+
+    ids = {**existing, **{d.content_hash: d.pk for d in new_documents}}
+    for item in items:
+        item.document_id = ids.get(item.content_hash)
+    return items, new_documents
+
+
+def _extract(file_path, backend):
+    # Läuft im Worker-Prozess, ohne Datenbankzugriff
+    started = time.perf_counter()
+    return extract_pdf_pages(file_path, workers=1, backend=backend), time.perf_counter() - started
+
+
+def extract_concurrently(documents, workers):
+    """
+    Extract documents in a process pool, completing each one as it finishes.
+
+    Yields (document, page_count, seconds, error) in completion order;
+    cache hits are completed without using the pool.
+    """
+    futures = {}
+    # Keine offenen DB-Verbindungen in die Worker-Prozesse vererben
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for document in documents:
+            backend = choose_backend(document.file.path, document.extractor)
+            pages = lookup(document.content_hash, backend)
+            if pages is not None:
+                complete_extraction(document, pages, backend)
+                yield document, len(pages), 0.0, ''
+                continue
+            futures[pool.submit(_extract, document.file.path, backend)] = (document, backend)
+
+        for future in as_completed(futures):
+            document, backend = futures[future]
+            try:
+                pages, seconds = future.result()
+            except Exception as e:
+                Document.objects.filter(pk=document.pk).update(
+                    status=Document.STATUS_FAILED, extraction_error=str(e)
+                )
+                yield document, 0, 0.0, str(e)
+                continue
+            pages, _ = ocr_empty_pages(document.file.path, pages)
+            store(document.content_hash, pages, backend)
+            complete_extraction(document, pages, backend)
+            yield document, len(pages), seconds, ''
@@ -0,0 +1,166 @@
+"""
+Authenticated serving of uploaded PDFs from MEDIA_ROOT.
+
+Replaces `django.conf.urls.static`: responses carry a strong ETag
+(the content hash), Last-Modified and Cache-Control, answer conditional
+GETs with 304 and single byte ranges with 206. With MEDIA_OFFLOAD set,
+only access checks and conditional GETs run in Django and the bytes
+are sent by the front proxy via X-Accel-Redirect (nginx) or X-Sendfile
+(Apache, lighttpd).
+"""
+import mimetypes
+import os
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import FileSystemStorage
+from django.http import Http404
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from users.models import UserContract
+
+from ..models import Document, DocumentVersion
+from ..storage import content_hash_from_name
+
+# Blockgröße beim Streamen eines Byte-Bereichs
+CHUNK_SIZE = 64 * 1024
+
+# Inhaltsadressierte Dateien ändern sich nie: ein Jahr cachen
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class RangeNotSatisfiable(Exception):
+    """The requested byte range lies outside the file."""
+
+
+@dataclass
+class MediaFile:
+    name: str
+    path: str
+    size: int
+    mtime: float
+    etag: str
+    immutable: bool
+
+    @property
+    def content_type(self) -> str:
+        return mimetypes.guess_type(self.path)[0] or "application/octet-stream"
+
+    @property
+    def last_modified(self) -> str:
+        return http_date(self.mtime)
+
+    @property
+    def cache_control(self) -> str:
+        # Nur für angemeldete Nutzer: nie in geteilten Caches ablegen
+        if self.immutable:
+            return f"private, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        return "private, no-cache"
+
+
+def _owner_hash(name: str, user) -> str:
+    """Check access to a media file and return its known content hash."""
+    document_hash = Document.objects.filter(file=name).values_list("content_hash", flat=True).first()
+    if document_hash is None:
+        document_hash = DocumentVersion.objects.filter(file=name).values_list("content_hash", flat=True).first()
+    if document_hash is not None:
+        # Tarifdokumente (auch archivierte Versionen) sind für alle angemeldeten Nutzer sichtbar
+        return document_hash
+    # Inhaltsadressiert: derselbe Vertrag kann mehreren Nutzern gehören
+    contracts = UserContract.objects.filter(pdf_file=name)
+    if not user.is_staff:
+        contracts = contracts.filter(user=user)
+    contract_hash = contracts.values_list("content_hash", flat=True).first()
+    if contract_hash is not None:
+        return contract_hash
+    if user.is_staff:
+        return ""
+    if UserContract.objects.filter(pdf_file=name).exists():
+        raise PermissionDenied
+    raise Http404
+
+
+def resolve(name: str, user) -> MediaFile:
+    """Look up a file below MEDIA_ROOT that `user` may read."""
+    storage = FileSystemStorage()
+    path = storage.path(name)  # wirft SuspiciousFileOperation bei Pfaden außerhalb
+    content_hash = _owner_hash(name, user)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404
+    hashed = content_hash_from_name(name)
+    content_hash = content_hash or hashed
+    if content_hash:
+        etag = quote_etag(content_hash)
+    else:
+        # Ohne Inhalts-Hash (Altbestand vor rehash_media): schwaches ETag aus Größe und Zeit
+        etag = f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    return MediaFile(
+        name=name, path=path, size=stat.st_size, mtime=stat.st_mtime,
+        etag=etag, immutable=bool(hashed),
+    )
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parse a `Range` header into an inclusive (first, last) byte pair.
+
+    Returns None when the header should be ignored (missing, malformed or
+    several ranges, which are answered with the full file).
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if not first:
+            # Suffix-Bereich: die letzten N Bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable
+            return max(size - length, 0), size - 1
+        first = int(first)
+        last = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable
+    if first > last:
+        return None
+    return first, min(last, size - 1)
+
+
+def if_range_matches(header: str, media: MediaFile) -> bool:
+    """If-Range: serve the range only if the client's copy is current."""
+    if not header:
+        return True
+    if header.startswith('"') or header.startswith("W/"):
+        # Nur starke ETags sind für Teilbereiche zulässig
+        return not media.etag.startswith("W/") and header == media.etag
+    modified = parse_http_date_safe(header)
+    return modified is not None and int(media.mtime) <= modified
+
+
+def iter_range(path: str, first: int, last: int):
+    """Yield the bytes first..last (inclusive) of a file in chunks."""
+    remaining = last - first + 1
+    with open(path, "rb") as f:
+        f.seek(first)
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def offload_headers(media: MediaFile) -> dict:
+    """Header that hands the byte transfer to the front proxy, if configured."""
+    mode = getattr(settings, "MEDIA_OFFLOAD", "")
+    if mode == "x-accel":
+        prefix = getattr(settings, "MEDIA_OFFLOAD_PREFIX", "/protected-media/")
+        return {"X-Accel-Redirect": prefix.rstrip("/") + "/" + media.name.lstrip("/")}
+    if mode == "x-sendfile":
+        return {"X-Sendfile": media.path}
+    return {}
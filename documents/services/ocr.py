@@ -0,0 +1,156 @@
+"""
+OCR fallback for pages without a text layer.
+
+Only pages that came out of the text extractor empty are rendered with
+pypdfium2 at DOCUMENT_OCR_DPI and passed to a local Tesseract process
+(`tesseract stdin stdout`). Pages are recognised in a process pool, and
+the result is cached per page content hash in the extraction cache, so a
+scanned page is never recognised twice, even inside another PDF.
+"""
+import io
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+
+from ..utils import PageText, page_hashes
+from .cache import lookup, store
+
+logger = logging.getLogger(__name__)
+
+# Backend-Name der OCR-Einträge im Extraktions-Cache (Schlüssel: Seiten-Hash)
+OCR_BACKEND = "tesseract"
+
+
+class OcrError(Exception):
+    """Tesseract failed on a page."""
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+@lru_cache(maxsize=1)
+def tesseract_version() -> str:
+    """Installed Tesseract version, '' if the command is not available."""
+    try:
+        result = subprocess.run(
+            [_setting("DOCUMENT_OCR_COMMAND", "tesseract"), "--version"],
+            capture_output=True, timeout=10,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    output = (result.stdout or result.stderr).decode(errors="replace").split()
+    return output[1] if result.returncode == 0 and len(output) > 1 else ""
+
+
+def ocr_available() -> bool:
+    return _setting("DOCUMENT_OCR_ENABLED", True) and bool(tesseract_version())
+
+
+def ocr_version() -> str:
+    # Andere Sprache oder Auflösung ergibt anderen Text: Teil des Cache-Schlüssels
+    language = _setting("DOCUMENT_OCR_LANGUAGE", "deu")
+    return f"{tesseract_version()}-{language}-{_setting('DOCUMENT_OCR_DPI', 300)}"[:30]
+
+
+def _ocr_page(file_path, index, dpi, command, language, timeout):
+    # Läuft im Worker-Prozess: Seite rendern und an Tesseract übergeben
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        page = pdf[index]
+        bitmap = page.render(scale=dpi / 72, grayscale=True)
+        image = bitmap.to_pil()
+        bitmap.close()
+        page.close()
+    finally:
+        pdf.close()
+    # Unkomprimiertes PGM (Pillows "PPM"-Writer schreibt Graustufen als P5): kein PNG-Encoding,
+    # Tesseract liest es direkt von stdin
+    buffer = io.BytesIO()
+    image.save(buffer, format="PPM")
+
+    result = subprocess.run(
+        [command, "stdin", "stdout", "-l", language, "--dpi", str(dpi)],
+        input=buffer.getvalue(), capture_output=True, timeout=timeout,
+        # Eine Seite je Prozess: Tesseracts eigene Threads würden den Pool überbuchen
+        env={**os.environ, "OMP_THREAD_LIMIT": "1"},
+    )
+    if result.returncode != 0:
+        raise OcrError(result.stderr.decode(errors="replace").strip())
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def _ocr_workers(count: int) -> int:
+    workers = _setting("DOCUMENT_OCR_WORKERS", 0) or os.cpu_count() or 1
+    return max(1, min(workers, count))
+
+
+def recognize_pages(file_path, numbers) -> dict[int, str]:
+    """OCR the given (1-based) pages in a process pool; pages that fail are left out."""
+    args = (
+        _setting("DOCUMENT_OCR_DPI", 300),
+        _setting("DOCUMENT_OCR_COMMAND", "tesseract"),
+        _setting("DOCUMENT_OCR_LANGUAGE", "deu"),
+        _setting("DOCUMENT_OCR_TIMEOUT_SECONDS", 120),
+    )
+    texts = {}
+    with ProcessPoolExecutor(max_workers=_ocr_workers(len(numbers))) as pool:
+        futures = {number: pool.submit(_ocr_page, str(file_path), number - 1, *args) for number in numbers}
+        for number, future in futures.items():
+            try:
+                texts[number] = future.result()
+            except Exception as e:
+                logger.warning(f"OCR of {file_path} page {number} failed: {e}")
+    return texts
+
+
+def ocr_empty_pages(file_path, pages, hashes=None) -> tuple[list[PageText], int]:
+    """
+    Fill pages without text by OCR; returns (pages, number of OCR'd pages).
+
+    Cached page results are reused; only the remaining pages are rendered
+    and recognised.
+    """
+    empty = [p.number for p in pages if not p.text.strip()]
+    if not empty or not ocr_available():
+        if empty:
+            logger.info(f"{file_path}: {len(empty)} pages without text, OCR not available")
+        return pages, 0
+
+    started = time.perf_counter()
+    hashes = hashes or page_hashes(file_path)
+    if len(hashes) != len(pages):
+        hashes = []
+    version = ocr_version()
+    texts, missing = {}, []
+    for number in empty:
+        cached = lookup(hashes[number - 1], OCR_BACKEND, version) if hashes else None
+        if cached is not None:
+            texts[number] = cached[0].text
+        else:
+            missing.append(number)
+
+    if missing:
+        recognized = recognize_pages(file_path, missing)
+        for number, text in recognized.items():
+            if hashes:
+                store(hashes[number - 1], [PageText(1, text, 0.0)], OCR_BACKEND, version)
+        texts.update(recognized)
+
+    cached = len(empty) - len(missing)
+    logger.info(
+        f"{file_path}: OCR on {len(texts)} of {len(empty)} empty pages "
+        f"({len(texts) - cached} recognised, {cached} cached) in {time.perf_counter() - started:.1f}s"
+    )
+    seconds = (time.perf_counter() - started) / len(empty)
+    return [
+        PageText(p.number, texts[p.number], p.seconds + seconds) if p.number in texts else p
+        for p in pages
+    ], len(texts)
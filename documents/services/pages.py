@@ -0,0 +1,56 @@
+"""
+Per-page storage of extracted document text.
+
+Extraction results are written as `DocumentPage` rows so the API can
+serve page ranges; the full text stays on `Document.extracted_text`.
+"""
+from typing import Iterable
+
+from django.db import transaction
+
+from ..models import Document, DocumentPage
+from ..utils import PageText
+
+
+# Seiten pro INSERT beim Schreiben
+PAGE_BATCH_SIZE = 200
+
+
+def store_pages(document: Document, pages: Iterable[PageText], hashes=None) -> str:
+    """
+    Replace the stored pages of a document and return the full text.
+
+    `pages` is read once and written in batches of PAGE_BATCH_SIZE rows.
+    The extraction paths pass a list, because sections, search index and
+    extraction cache need the pages again afterwards. `hashes` are the page
+    content hashes in page order, if known.
+    """
+    texts, batch = [], []
+    with transaction.atomic():
+        DocumentPage.objects.filter(document=document).delete()
+        for p in pages:
+            texts.append(p.text)
+            content_hash = hashes[p.number - 1] if hashes and p.number <= len(hashes) else ""
+            batch.append(DocumentPage(
+                document=document, number=p.number, text=p.text, char_count=len(p.text), content_hash=content_hash
+            ))
+            if len(batch) >= PAGE_BATCH_SIZE:
+                DocumentPage.objects.bulk_create(batch)
+                batch = []
+        DocumentPage.objects.bulk_create(batch)
+    return "".join(texts)
+
+
+def stored_pages(document_id: int) -> list[PageText]:
+    """Load the pages of a document in page order."""
+    rows = DocumentPage.objects.filter(document_id=document_id).values_list("number", "text")
+    return [PageText(number, text, 0.0) for number, text in rows.order_by("number")]
+
+
+def page_window(document: Document, start: int, limit: int) -> tuple[list[DocumentPage], int]:
+    """Return up to `limit` pages beginning at page `start` plus the page count."""
+    pages = DocumentPage.objects.filter(document=document)
+    page_count = pages.count()
+    window = list(pages.filter(number__gte=start).order_by("number")[:limit])
+    return window, page_count
+
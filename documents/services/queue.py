@@ -0,0 +1,237 @@
+"""
+Database-backed job queue for document text extraction.
+
+Uploads only enqueue a job; `manage.py process_documents` workers claim
+jobs from the `ExtractionJob` table, run the extraction and retry with
+exponential backoff. Throughput scales by starting more workers.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..extractors import choose_backend
+from ..models import Document, DocumentPage, ExtractionJob
+from ..utils import ExtractionLimitExceeded, page_hashes
+from .cache import lookup
+from .pages import store_pages
+from .sections import store_sections
+from .search import index_document
+from .versions import extract_document
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_extraction(document: Document) -> ExtractionJob:
+    """Mark the document as pending and queue an extraction job for it."""
+    Document.objects.filter(pk=document.pk).update(
+        status=Document.STATUS_PENDING, extraction_error=""
+    )
+    document.status = Document.STATUS_PENDING
+    return ExtractionJob.objects.create(
+        document=document,
+        max_attempts=_setting("DOCUMENT_EXTRACTION_MAX_ATTEMPTS", 3),
+        run_after=timezone.now(),
+    )
+
+
+def schedule_extraction(document: Document) -> ExtractionJob | None:
+    """
+    Complete the document right away on an extraction cache hit,
+    otherwise queue it for a worker.
+    """
+    backend = choose_backend(document.file.path, document.extractor)
+    pages = lookup(document.content_hash, backend, count_miss=False)
+    if pages is None:
+        return enqueue_extraction(document)
+    complete_extraction(document, pages, backend)
+    return None
+
+
+def schedule_extractions(documents) -> int:
+    """Like `schedule_extraction` for many new documents; queues all misses with one INSERT."""
+    jobs = []
+    for document in documents:
+        backend = choose_backend(document.file.path, document.extractor)
+        pages = lookup(document.content_hash, backend, count_miss=False)
+        if pages is not None:
+            complete_extraction(document, pages, backend)
+            continue
+        jobs.append(ExtractionJob(
+            document=document,
+            max_attempts=_setting("DOCUMENT_EXTRACTION_MAX_ATTEMPTS", 3),
+            run_after=timezone.now(),
+        ))
+    ExtractionJob.objects.bulk_create(jobs)
+    return len(jobs)
+
+
+def complete_extraction(document: Document, pages, backend: str, hashes=None, reused: int = 0) -> None:
+    """
+    Persist extracted pages and sections, update the search index and mark the document done.
+
+    Only search segments of pages whose text changed are rewritten, so a
+    new document version with few changed pages is re-indexed cheaply.
+    """
+    if hashes is None:
+        hashes = page_hashes(document.file.path)
+    previous = dict(DocumentPage.objects.filter(document=document).values_list("number", "text"))
+    changed = None
+    if previous:
+        changed = {p.number for p in pages if previous.get(p.number) != p.text}
+        changed |= set(previous) - {p.number for p in pages}
+    with transaction.atomic():
+        text = store_pages(document, pages, hashes)
+        store_sections(document, pages)
+        index_document(document, pages, changed)
+        Document.objects.filter(pk=document.pk).update(
+            extracted_text=text,
+            text_length=len(text),
+            page_count=len(pages),
+            extracted_with=backend,
+            reused_pages=reused,
+            status=Document.STATUS_DONE,
+            extraction_error="",
+        )
+    document.extracted_text = text
+    document.text_length = len(text)
+    document.page_count = len(pages)
+    document.extracted_with = backend
+    document.reused_pages = reused
+    document.status = Document.STATUS_DONE
+    document.extraction_error = ""
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Release jobs whose worker died without finishing (lease expired).
+
+    Released jobs are queued again and their documents go back to
+    pending. Jobs that already used up their attempts are marked failed
+    instead, so a PDF that kills its worker (e.g. OOM) is not retried
+    forever.
+    """
+    lease = timedelta(seconds=_setting("DOCUMENT_EXTRACTION_LEASE_SECONDS", 600))
+    stale = ExtractionJob.objects.filter(
+        status=ExtractionJob.STATUS_RUNNING,
+        locked_at__lt=timezone.now() - lease,
+    )
+    error = "Worker stopped before finishing the job (lease expired)"
+    with transaction.atomic():
+        locked = list(
+            stale.select_for_update(skip_locked=True).values_list("pk", "document_id", "attempts", "max_attempts")
+        )
+        exhausted = [(pk, doc) for pk, doc, attempts, max_attempts in locked if attempts >= max_attempts]
+        retry = [(pk, doc) for pk, doc, attempts, max_attempts in locked if attempts < max_attempts]
+        if exhausted:
+            ExtractionJob.objects.filter(pk__in=[pk for pk, _ in exhausted]).update(
+                status=ExtractionJob.STATUS_FAILED, last_error=error, locked_by="", locked_at=None
+            )
+            Document.objects.filter(pk__in=[doc for _, doc in exhausted]).update(
+                status=Document.STATUS_FAILED, extraction_error=error
+            )
+            logger.warning(f"{len(exhausted)} extraction job(s) failed after their last attempt timed out")
+        if not retry:
+            return 0
+        # Only the rows locked above; the status guard covers backends without row locks (SQLite)
+        requeued = ExtractionJob.objects.filter(
+            pk__in=[pk for pk, _ in retry], status=ExtractionJob.STATUS_RUNNING
+        ).update(status=ExtractionJob.STATUS_QUEUED, locked_by="", locked_at=None)
+        Document.objects.filter(pk__in=[doc for _, doc in retry]).update(status=Document.STATUS_PENDING)
+    return requeued
+
+
+def claim_next_job(worker_id: str) -> ExtractionJob | None:
+    """
+    Atomically claim the oldest due job for this worker.
+
+    `SELECT ... FOR UPDATE SKIP LOCKED` keeps concurrent workers from
+    blocking each other on Postgres; the conditional UPDATE guards
+    backends without row locks (SQLite).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            ExtractionJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ExtractionJob.STATUS_QUEUED, run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = ExtractionJob.objects.filter(
+            pk=job.pk, status=ExtractionJob.STATUS_QUEUED
+        ).update(
+            status=ExtractionJob.STATUS_RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = _setting("DOCUMENT_EXTRACTION_RETRY_BACKOFF_SECONDS", 30)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def _fail(job: ExtractionJob, error: str, retry: bool = True) -> None:
+    """Reschedule the job with backoff or mark it as finally failed."""
+    if retry and job.attempts < job.max_attempts:
+        job.status = ExtractionJob.STATUS_QUEUED
+        job.run_after = timezone.now() + _retry_delay(job.attempts)
+        document_status = Document.STATUS_PENDING
+    else:
+        job.status = ExtractionJob.STATUS_FAILED
+        document_status = Document.STATUS_FAILED
+    job.last_error = error
+    job.locked_by = ""
+    job.locked_at = None
+    job.save(update_fields=["status", "run_after", "last_error", "locked_by", "locked_at", "updated_at"])
+    Document.objects.filter(pk=job.document_id).update(
+        status=document_status, extraction_error=error
+    )
+
+
+def run_job(job: ExtractionJob) -> bool:
+    """Extract the text of the job's document. Returns True on success."""
+    Document.objects.filter(pk=job.document_id).update(status=Document.STATUS_PROCESSING)
+    try:
+        document = Document.objects.get(pk=job.document_id)
+        # Gleicher Inhalt: Ergebnis aus dem Cache; neue Version: nur geänderte Seiten extrahieren
+        pages, backend, hashes, reused = extract_document(document)
+    except ExtractionLimitExceeded as e:
+        # Zu groß für diesen Worker: ein neuer Versuch würde wieder scheitern
+        logger.warning(f"Extraction job {job.pk} exceeds limits: {e}")
+        _fail(job, str(e), retry=False)
+        return False
+    except Exception as e:
+        logger.warning(f"Extraction job {job.pk} failed (attempt {job.attempts}): {e}")
+        _fail(job, str(e))
+        return False
+
+    try:
+        with transaction.atomic():
+            complete_extraction(document, pages, backend, hashes, reused)
+            job.status = ExtractionJob.STATUS_DONE
+            job.last_error = ""
+            job.locked_by = ""
+            job.locked_at = None
+            job.save(update_fields=["status", "last_error", "locked_by", "locked_at", "updated_at"])
+    except Exception as e:
+        # Speichern fehlgeschlagen (z. B. Datenbankfehler): Job nicht als "running" zurücklassen
+        logger.exception(f"Extraction job {job.pk} could not be saved")
+        _fail(job, str(e))
+        return False
+    logger.info(f"Extraction job {job.pk} finished for document {job.document_id}")
+    return True
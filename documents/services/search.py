@@ -0,0 +1,154 @@
+"""
+German full-text search over extracted documents and user contracts.
+
+Text is indexed in `SearchEntry` segments (one per document page, fixed-size
+chunks for contracts). Postgres ranks with a German `tsvector` + GIN index,
+local/test runs use SQLite FTS5; both indexes are maintained by the
+database itself, so re-indexing a source only rewrites its segments.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+
+from ..models import Document, SearchEntry
+
+# Vertragstexte werden in Stücke dieser Länge zerlegt (tsvector-Limit, Snippets)
+CONTRACT_SEGMENT_CHARS = 20000
+
+SNIPPET_START, SNIPPET_STOP = "<b>", "</b>"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class SearchHit:
+    source: str
+    source_id: int
+    segment: int
+    title: str
+    rank: float
+    snippet: str
+
+
+def index_document(document: Document, pages, numbers=None) -> None:
+    """
+    Replace the search segments of a document with its pages.
+
+    With `numbers` only the segments of these page numbers are rewritten
+    (changed pages of a new document version).
+    """
+    entries = [
+        SearchEntry(document=document, segment=p.number, title=document.title, body=p.text)
+        for p in pages if p.text and (numbers is None or p.number in numbers)
+    ]
+    existing = SearchEntry.objects.filter(document=document)
+    if numbers is not None:
+        existing = existing.filter(segment__in=numbers)
+    with transaction.atomic():
+        existing.delete()
+        SearchEntry.objects.bulk_create(entries, batch_size=200)
+
+
+def index_contract(contract) -> None:
+    """Replace the search segments of a user contract with its text chunks."""
+    text = contract.text_content or ""
+    chunks = [text[i:i + CONTRACT_SEGMENT_CHARS] for i in range(0, len(text), CONTRACT_SEGMENT_CHARS)]
+    title = str(contract.pdf_file.name or "")[:255]
+    with transaction.atomic():
+        SearchEntry.objects.filter(contract=contract).delete()
+        SearchEntry.objects.bulk_create(
+            [SearchEntry(contract=contract, segment=n, title=title, body=chunk)
+             for n, chunk in enumerate(chunks, start=1)],
+            batch_size=200,
+        )
+
+
+def _owner_filter(user_id):
+    # Dokumente sind allgemein, Verträge nur für den eigenen Nutzer sichtbar
+    if user_id is None:
+        return "", []
+    return " AND (e.contract_id IS NULL OR c.user_id = %s)", [user_id]
+
+
+def _search_postgres(query, limit, user_id):
+    owner_sql, owner_params = _owner_filter(user_id)
+    sql = f"""
+        SELECT top.id, top.document_id, top.contract_id, top.segment, top.title, top.rank,
+               ts_headline('german', top.body, top.q,
+                           'StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxFragments=2, MaxWords=25, MinWords=8')
+        FROM (
+            SELECT e.id, e.document_id, e.contract_id, e.segment, e.title, e.body, q,
+                   ts_rank_cd(e.search_vector, q) AS rank
+            FROM documents_searchentry e
+            LEFT JOIN users_usercontract c ON c.id = e.contract_id,
+                 websearch_to_tsquery('german', %s) q
+            WHERE e.search_vector @@ q{owner_sql}
+            ORDER BY rank DESC
+            LIMIT %s
+        ) top
+        ORDER BY top.rank DESC
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [query, *owner_params, limit])
+        return cursor.fetchall()
+
+
+def _fts5_query(query):
+    # Nutzereingabe in FTS5-Syntax: jedes Wort als Phrase, Präfixsuche für das letzte
+    tokens = _TOKEN.findall(query)
+    if not tokens:
+        return ""
+    quoted = [f'"{t}"' for t in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _search_sqlite(query, limit, user_id):
+    match = _fts5_query(query)
+    if not match:
+        return []
+    owner_sql, owner_params = _owner_filter(user_id)
+    sql = f"""
+        SELECT e.id, e.document_id, e.contract_id, e.segment, e.title,
+               -bm25(documents_searchentry_fts, 5.0, 1.0) AS rank,
+               snippet(documents_searchentry_fts, 1, '{SNIPPET_START}', '{SNIPPET_STOP}', '…', 25)
+        FROM documents_searchentry_fts
+        JOIN documents_searchentry e ON e.id = documents_searchentry_fts.rowid
+        LEFT JOIN users_usercontract c ON c.id = e.contract_id
+        WHERE documents_searchentry_fts MATCH %s{owner_sql}
+        ORDER BY rank DESC
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *owner_params, limit])
+        return cursor.fetchall()
+
+
+def search(query: str, limit: int = 20, user_id: int | None = None) -> list[SearchHit]:
+    """
+    Ranked full-text search with highlighted snippets.
+
+    `user_id` restricts contract hits to that user's own contract;
+    `None` searches everything (staff / internal use).
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    if connection.vendor == "postgresql":
+        rows = _search_postgres(query, limit, user_id)
+    else:
+        rows = _search_sqlite(query, limit, user_id)
+
+    return [
+        SearchHit(
+            source="document" if document_id else "contract",
+            source_id=document_id or contract_id,
+            segment=segment,
+            title=title,
+            rank=float(rank),
+            snippet=snippet,
+        )
+        for _, document_id, contract_id, segment, title, rank, snippet in rows
+    ]
@@ -0,0 +1,134 @@
+"""
+Section splitting of extracted tariff documents.
+
+Tariff PDFs share a stable structure: AVB paragraphs (`§ 4 Umfang der
+Leistungspflicht`), tariff blocks (`Tarif VARIO KlinikPlus`) and numbered
+benefit headings (`1. Wahlleistungen`). The page texts are cut at these
+headings once at ingest; each section is typed by keywords (ambulant,
+stationär, Zahn, Selbstbeteiligung) and stored with its page span, so
+consumers read a single section instead of scanning the full text.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from ..models import Document, DocumentSection
+
+HEADING_PATTERNS = (
+    # "§ 4 Umfang …", aber kein umbrochener Verweis wie "§ 8 Absatz 4 AVB/VV) wird …"
+    re.compile(r"^§\s*\d+[a-z]?\s+(?!Absatz|Abs\.|Satz|Nr\.)[A-ZÄÖÜ][^)]*$"),
+    re.compile(r"^Tarif\s+[A-ZÄÖÜ]\S*(\s+\S+){0,5}$"),
+    re.compile(r"^\d{1,2}\.\s+[A-ZÄÖÜ][^.:;]{2,70}$"),
+)
+
+# Seitenkopf/-fuß der Vergleichsprotokolle, weder Überschrift noch Inhalt
+NOISE_PATTERNS = (
+    re.compile(r"Seite\s+\d+\s+von\s+\d+"),
+    re.compile(r"^©"),
+)
+
+# Schlagwörter je Abschnittsart, geprüft in Kleinschreibung
+KIND_KEYWORDS = {
+    DocumentSection.KIND_SELBSTBETEILIGUNG: ("selbstbeteiligung", "selbstbehalt", "eigenanteil"),
+    DocumentSection.KIND_ZAHN: ("zahn", "kieferorthop", "prophylaxe", "inlay", "implantat"),
+    DocumentSection.KIND_STATIONAER: ("stationär", "krankenhaus", "klinik", "wahlleistung", "chefarzt", "unterbringung"),
+    DocumentSection.KIND_AMBULANT: (
+        "ambulant", "ärztliche leistungen", "arzneimittel", "heilmittel", "hilfsmittel", "heilpraktiker",
+        "psychotherap", "vorsorge", "sehhilfe", "brille", "refraktive",
+    ),
+}
+
+# Mindestzahl an Schlagworttreffern im Text, wenn die Überschrift nichts hergibt
+BODY_KEYWORD_MIN_HITS = 3
+BODY_SAMPLE_CHARS = 2000
+
+
+@dataclass
+class Section:
+    heading: str
+    start_page: int
+    end_page: int
+    lines: list = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def is_heading(line: str) -> bool:
+    return len(line) <= 120 and any(p.match(line) for p in HEADING_PATTERNS)
+
+
+def _is_noise(line: str) -> bool:
+    return any(p.search(line) for p in NOISE_PATTERNS)
+
+
+def classify(heading: str, text: str = "", context: str = DocumentSection.KIND_ALLGEMEIN) -> str:
+    """Type of a section: heading keywords first, then the enclosing tariff, then the text."""
+    lowered = heading.lower()
+    for kind, keywords in KIND_KEYWORDS.items():
+        if any(k in lowered for k in keywords):
+            return kind
+    if context != DocumentSection.KIND_ALLGEMEIN:
+        return context
+
+    sample = text[:BODY_SAMPLE_CHARS].lower()
+    hits = {kind: sum(sample.count(k) for k in keywords) for kind, keywords in KIND_KEYWORDS.items()}
+    kind, count = max(hits.items(), key=lambda item: item[1])
+    return kind if count >= BODY_KEYWORD_MIN_HITS else DocumentSection.KIND_ALLGEMEIN
+
+
+def split_sections(pages) -> list[Section]:
+    """Cut page texts at headings; text before the first heading forms its own section."""
+    sections, current, pending_heading = [], None, None
+    for page in pages:
+        for raw in page.text.splitlines():
+            line = raw.strip()
+            if not line or _is_noise(line):
+                continue
+            if pending_heading is not None:
+                pending_heading, previous = None, pending_heading
+                # Überschrift über zwei Zeilen ("…Versicherungsfall,\nörtlicher Geltungsbereich"),
+                # außer die Folgezeile ist selbst eine Überschrift ("§ 1 Beginn,\n§ 2 Leistungen")
+                if not is_heading(line):
+                    current.heading = f"{previous} {line}"[:255]
+                    continue
+            if is_heading(line):
+                current = Section(heading=line[:255], start_page=page.number, end_page=page.number)
+                sections.append(current)
+                if line.endswith(","):
+                    pending_heading = line
+                continue
+            if current is None:
+                current = Section(heading="", start_page=page.number, end_page=page.number)
+                sections.append(current)
+            current.lines.append(line)
+            current.end_page = page.number
+    return sections
+
+
+def store_sections(document: Document, pages) -> int:
+    """Replace the stored sections of a document; returns the number of sections."""
+    rows, context = [], DocumentSection.KIND_ALLGEMEIN
+    for position, section in enumerate(split_sections(pages), start=1):
+        text = section.text
+        if section.heading.startswith("Tarif "):
+            # Ein Bausteintarif (KlinikPlus, ZahnPlus) gibt die Art seiner nummerierten
+            # Unterabschnitte vor; ein Volltarif wie GesundheitVARIO nicht
+            context = classify(section.heading)
+            kind = classify(section.heading, text)
+        else:
+            if section.heading.startswith("§"):
+                context = DocumentSection.KIND_ALLGEMEIN
+            kind = classify(section.heading, text, context)
+        rows.append(DocumentSection(
+            document=document, position=position, kind=kind, heading=section.heading,
+            start_page=section.start_page, end_page=section.end_page,
+            text=text, char_count=len(text),
+        ))
+    with transaction.atomic():
+        DocumentSection.objects.filter(document=document).delete()
+        DocumentSection.objects.bulk_create(rows, batch_size=200)
+    return len(rows)
+
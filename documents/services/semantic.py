@@ -0,0 +1,289 @@
+"""
+Local semantic search over extracted tariff documents.
+
+Page texts are split into overlapping chunks and embedded on CPU with
+sentence-transformers. Normalised vectors are appended to a float16 file
+that is memory-mapped for search, so a query is a blocked matrix-vector
+product plus `argpartition`. Chunk positions (document, page, offsets)
+live in a small NumPy array next to it; the chunk text itself is read
+back from `DocumentPage` only for the returned hits.
+
+Builds are incremental: a document is embedded again only when its
+content hash or the model changes; replaced rows are tombstoned and
+compacted away once they make up a large share of the file.
+
+Every build writes a new generation: the rows go to a new `rows.<n>.npy`,
+a compaction or rebuild writes a new `vectors.<n>.f16`, and replacing
+`manifest.json` switches readers to both at once. Searches take no lock;
+they read the files named in the manifest they loaded, and the previous
+generation is kept until the next build.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.files import locks
+
+from ..models import Document, DocumentPage
+from .pages import stored_pages
+
+logger = logging.getLogger(__name__)
+
+ROW_DTYPE = np.dtype([
+    ("document", "i8"), ("page", "i4"), ("start", "i4"), ("end", "i4"), ("alive", "?"),
+])
+
+# Ab diesem Anteil toter Zeilen wird die Vektordatei neu geschrieben
+COMPACT_DEAD_RATIO = 0.3
+
+# Zeilen pro Block beim Skalarprodukt (begrenzt den float32-Zwischenspeicher)
+SEARCH_BLOCK_ROWS = 65536
+
+# Dateinamen von Indizes ohne Generationszähler im Manifest
+LEGACY_FILES = {"rows": "rows.npy", "vectors": "vectors.f16"}
+
+_encoder = None
+
+
+@dataclass
+class SemanticHit:
+    document_id: int
+    page: int
+    score: float
+    text: str
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def index_dir() -> Path:
+    return Path(_setting("SEMANTIC_INDEX_DIR", Path(settings.BASE_DIR) / "semantic_index"))
+
+
+def model_name() -> str:
+    return _setting("SEMANTIC_MODEL_NAME", "paraphrase-multilingual-MiniLM-L12-v2")
+
+
+def get_encoder():
+    """Load the sentence-transformers model once per process (CPU only)."""
+    global _encoder
+    if _encoder is None:
+        from sentence_transformers import SentenceTransformer
+        _encoder = SentenceTransformer(model_name(), device="cpu")
+    return _encoder
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    vectors = get_encoder().encode(
+        texts,
+        batch_size=_setting("SEMANTIC_BATCH_SIZE", 32),
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return np.asarray(vectors, dtype=np.float16)
+
+
+def chunk_page(text: str, size: int, overlap: int) -> list[tuple[int, int]]:
+    """Character spans of overlapping chunks, cut at whitespace where possible."""
+    spans, start, length = [], 0, len(text)
+    while start < length:
+        end = min(start + size, length)
+        if end < length:
+            cut = text.rfind(" ", start + size // 2, end)
+            end = cut if cut > start else end
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return spans
+
+
+class SemanticIndex:
+    """File-backed vector index: vectors.<n>.f16, rows.<n>.npy and manifest.json."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = Path(path or index_dir())
+        self.manifest_path = self.path / "manifest.json"
+
+    # -- Laden ---------------------------------------------------------------
+
+    def manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return {"model": model_name(), "dim": None, "documents": {}}
+        return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def _file(self, manifest: dict, kind: str) -> Path:
+        # Indizes ohne Generation (vor Einführung der Generationsdateien) nutzen die festen Namen
+        return self.path / manifest.get(kind, LEGACY_FILES[kind])
+
+    def rows(self, manifest: dict) -> np.ndarray:
+        path = self._file(manifest, "rows")
+        if "rows" not in manifest and not path.exists():
+            return np.zeros(0, dtype=ROW_DTYPE)
+        return np.load(path)
+
+    def vectors(self, manifest: dict, count: int) -> np.ndarray | None:
+        if not count:
+            return None
+        return np.memmap(self._file(manifest, "vectors"), dtype=np.float16, mode="r", shape=(count, manifest["dim"]))
+
+    # -- Schreiben -----------------------------------------------------------
+
+    def _write_atomic(self, target: Path, write) -> None:
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, target)
+
+    def _save(self, rows: np.ndarray, manifest: dict, previous: dict) -> None:
+        # Zeilen in eine neue Datei, dann das Manifest ersetzen: erst damit sehen Leser die neue Generation
+        self._write_atomic(self._file(manifest, "rows"), lambda f: np.save(f, rows))
+        self._write_atomic(
+            self.manifest_path, lambda f: f.write(json.dumps(manifest).encode("utf-8"))
+        )
+        # Die vorige Generation bleibt für Suchen liegen, die ihr Manifest gerade gelesen haben
+        keep = {self._file(m, kind).name for m in (manifest, previous) for kind in LEGACY_FILES}
+        for path in self.path.iterdir():
+            if path.name.startswith(("vectors.", "rows.")) and path.name not in keep:
+                path.unlink(missing_ok=True)
+
+    def _compact(self, rows: np.ndarray, manifest: dict, target: Path) -> np.ndarray:
+        alive = rows["alive"]
+        vectors = self.vectors(manifest, len(rows))
+        self._write_atomic(target, lambda f: f.write(np.ascontiguousarray(vectors[alive]).tobytes()))
+        return rows[alive]
+
+    def build(self, rebuild: bool = False) -> dict:
+        """Embed new or changed documents; returns build statistics."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / ".lock", "wb") as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                return self._build(rebuild)
+            finally:
+                locks.unlock(lock_file)
+
+    def _build(self, rebuild: bool) -> dict:
+        size = _setting("SEMANTIC_CHUNK_CHARS", 800)
+        overlap = _setting("SEMANTIC_CHUNK_OVERLAP", 120)
+        previous = self.manifest()
+        rows = self.rows(previous)
+        generation = previous.get("generation", 0) + 1
+        manifest = {**previous, "documents": dict(previous["documents"]), "generation": generation,
+                    "rows": f"rows.{generation}.npy", "vectors": self._file(previous, "vectors").name}
+        if not self.manifest_path.exists():
+            manifest["vectors"] = f"vectors.{generation}.f16"
+        if rebuild or manifest.get("model") != model_name():
+            # Neue, leere Vektordatei; die alte bleibt bis zum Manifest-Wechsel lesbar
+            manifest.update(model=model_name(), dim=None, documents={}, vectors=f"vectors.{generation}.f16")
+            rows = np.zeros(0, dtype=ROW_DTYPE)
+            # Rest eines abgebrochenen Rebuilds derselben Generation
+            self._file(manifest, "vectors").unlink(missing_ok=True)
+        vectors_path = self._file(manifest, "vectors")
+
+        known = manifest["documents"]
+        current = {
+            str(pk): f"{content_hash}:{size}:{overlap}"
+            for pk, content_hash in Document.objects.filter(status=Document.STATUS_DONE)
+            .values_list("pk", "content_hash")
+        }
+        stale = {doc for doc, fp in known.items() if current.get(doc) != fp}
+        todo = [doc for doc, fp in current.items() if known.get(doc) != fp]
+
+        # Geänderte und gelöschte Dokumente: alte Zeilen als tot markieren
+        if stale and len(rows):
+            rows["alive"] &= ~np.isin(rows["document"], np.array([int(doc) for doc in stale], dtype="i8"))
+        for doc in stale:
+            known.pop(doc, None)
+
+        # Reste eines abgebrochenen Laufs abschneiden, damit Zeile i == Vektor i bleibt
+        # (Leser der aktuellen Generation lesen nur diese len(rows) Vektoren, Anhängen stört sie nicht)
+        if manifest["dim"] and vectors_path.exists():
+            os.truncate(vectors_path, len(rows) * manifest["dim"] * 2)
+
+        added_rows = []
+        with open(vectors_path, "ab") as out:
+            for doc in todo:
+                doc_rows, texts = [], []
+                for page in stored_pages(int(doc)):
+                    for start, end in chunk_page(page.text, size, overlap):
+                        doc_rows.append((int(doc), page.number, start, end, True))
+                        texts.append(page.text[start:end])
+                if texts:
+                    vectors = _encode(texts)
+                    manifest["dim"] = manifest["dim"] or int(vectors.shape[1])
+                    out.write(np.ascontiguousarray(vectors).tobytes())
+                    added_rows.extend(doc_rows)
+                known[doc] = current[doc]
+        if added_rows:
+            rows = np.concatenate([rows, np.array(added_rows, dtype=ROW_DTYPE)])
+
+        dead = int((~rows["alive"]).sum()) if len(rows) else 0
+        if dead and dead / len(rows) >= COMPACT_DEAD_RATIO:
+            target = f"vectors.{generation}.f16"
+            rows = self._compact(rows, manifest, self.path / target)
+            manifest["vectors"] = target
+
+        self._save(rows, manifest, previous)
+        stats = {"documents": len(todo), "removed": len(stale), "chunks": len(added_rows), "rows": len(rows)}
+        logger.info(f"Semantic index updated: {stats}")
+        return stats
+
+    # -- Suche ---------------------------------------------------------------
+
+    def search(self, query: str, limit: int = 10, document_ids=None) -> list[SemanticHit]:
+        """Cosine top-k over all live chunks, optionally restricted to documents."""
+        manifest = self.manifest()
+        try:
+            rows = self.rows(manifest)
+            vectors = self.vectors(manifest, len(rows))
+        except FileNotFoundError:
+            # Zwei Builds seit dem Lesen des Manifests: die neue Generation laden
+            manifest = self.manifest()
+            rows = self.rows(manifest)
+            vectors = self.vectors(manifest, len(rows))
+        if vectors is None or not query.strip():
+            return []
+
+        mask = rows["alive"].copy()
+        if document_ids is not None:
+            mask &= np.isin(rows["document"], np.fromiter(document_ids, dtype="i8"))
+        if not mask.any():
+            return []
+
+        q = _encode([query])[0].astype(np.float32)
+        scores = np.full(len(rows), -np.inf, dtype=np.float32)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            stop = min(start + SEARCH_BLOCK_ROWS, len(rows))
+            scores[start:stop] = vectors[start:stop].astype(np.float32) @ q
+        scores[~mask] = -np.inf
+
+        k = min(limit, int(mask.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self._hits(rows[top], scores[top])
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray) -> list[SemanticHit]:
+        keys = {(int(r["document"]), int(r["page"])) for r in rows}
+        texts = {
+            (doc, number): text
+            for doc, number, text in DocumentPage.objects.filter(
+                document_id__in={doc for doc, _ in keys}, number__in={page for _, page in keys}
+            ).values_list("document_id", "number", "text")
+        }
+        return [
+            SemanticHit(
+                document_id=int(r["document"]),
+                page=int(r["page"]),
+                score=float(score),
+                text=texts.get((int(r["document"]), int(r["page"])), "")[r["start"]:r["end"]],
+            )
+            for r, score in zip(rows, scores)
+        ]
@@ -0,0 +1,156 @@
+"""
+Chunked, resumable uploads of large PDFs.
+
+Protocol: POST creates an `UploadSession`, each PUT carries one chunk
+with `Content-Range: bytes <first>-<last>/<total>` and is streamed to a
+temporary file at its offset, and `complete` verifies size and SHA-256
+before the assembled file is handed to the normal creation path.
+Chunks are never held in memory as a whole.
+"""
+import hashlib
+import logging
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import UploadSession
+
+logger = logging.getLogger(__name__)
+
+# Lese-/Schreibblock beim Streamen eines Chunks
+COPY_BLOCK_SIZE = 64 * 1024
+
+_CONTENT_RANGE = re.compile(r"^bytes\s+(\d+)-(\d+)/(\d+|\*)$")
+
+
+class UploadError(Exception):
+    """Invalid chunk or completion request; `offset` tells the client where to resume."""
+
+    def __init__(self, message, offset=None, status=400):
+        super().__init__(message)
+        self.offset = offset
+        self.status = status
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def upload_dir() -> Path:
+    return Path(_setting("UPLOAD_SESSION_DIR", Path(settings.BASE_DIR) / "upload_sessions"))
+
+
+def session_path(session: UploadSession) -> Path:
+    return upload_dir() / f"{session.pk}.part"
+
+
+def open_session(user, target, filename, size, sha256="", metadata=None) -> UploadSession:
+    """Create a session and its empty temporary file."""
+    max_bytes = _setting("UPLOAD_MAX_BYTES", 200 * 1024 * 1024)
+    if size > max_bytes:
+        raise UploadError(f"Datei zu groß ({size} Bytes, erlaubt sind {max_bytes}).", status=413)
+    purge_expired()
+    session = UploadSession.objects.create(
+        user=user, target=target, filename=os.path.basename(filename)[:255], size=size,
+        sha256=(sha256 or "").lower(), metadata=metadata or {},
+    )
+    upload_dir().mkdir(parents=True, exist_ok=True)
+    session_path(session).touch()
+    return session
+
+
+def parse_content_range(header: str, session: UploadSession) -> tuple[int, int]:
+    """Return (offset, length) of a chunk from its Content-Range header."""
+    match = _CONTENT_RANGE.match((header or "").strip())
+    if not match:
+        raise UploadError("Content-Range im Format 'bytes <erstes>-<letztes>/<gesamt>' fehlt.", session.received)
+    first, last, total = int(match.group(1)), int(match.group(2)), match.group(3)
+    if last < first or (total != "*" and int(total) != session.size) or last >= session.size:
+        raise UploadError("Content-Range passt nicht zur angekündigten Dateigröße.", session.received)
+    return first, last - first + 1
+
+
+def write_chunk(session: UploadSession, stream, offset: int, length: int) -> int:
+    """
+    Stream one chunk from `stream` into the session file; returns the new offset.
+
+    Bytes before `received` were already stored by an earlier (retried)
+    request and are skipped; a chunk starting beyond `received` would
+    leave a gap and is rejected with the offset to resume from.
+    """
+    if session.status != UploadSession.STATUS_OPEN:
+        raise UploadError("Upload ist bereits abgeschlossen.", session.received, status=409)
+    max_chunk = _setting("UPLOAD_CHUNK_MAX_BYTES", 8 * 1024 * 1024)
+    if length > max_chunk:
+        raise UploadError(f"Chunk zu groß (höchstens {max_chunk} Bytes).", session.received, status=413)
+    if offset > session.received:
+        raise UploadError("Lücke im Upload: bitte ab dem gemeldeten Offset fortsetzen.", session.received, status=409)
+
+    skip = session.received - offset
+    remaining, written = length, 0
+    with open(session_path(session), "r+b") as f:
+        f.seek(session.received)
+        while remaining > 0:
+            block = stream.read(min(COPY_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            if skip:
+                # Bereits gespeicherter Anfang eines wiederholten Chunks
+                dropped = min(skip, len(block))
+                block, skip = block[dropped:], skip - dropped
+            f.write(block)
+            written += len(block)
+    if remaining:
+        # Verbindung abgerissen: nur bestätigen, was vollständig angekommen ist
+        logger.info(f"Upload {session.pk}: chunk truncated after {length - remaining} of {length} bytes")
+
+    new_offset = session.received + written
+    updated = UploadSession.objects.filter(pk=session.pk, received=session.received).update(
+        received=new_offset, updated_at=timezone.now()
+    )
+    if not updated:
+        session.refresh_from_db(fields=["received"])
+        raise UploadError("Paralleler Chunk für diesen Upload.", session.received, status=409)
+    session.received = new_offset
+    return new_offset
+
+
+def verify(session: UploadSession, sha256: str = "") -> Path:
+    """Check that the upload is complete and matches its SHA-256; returns the file path."""
+    if session.received != session.size:
+        raise UploadError(f"Upload unvollständig ({session.received}/{session.size} Bytes).", session.received)
+    expected = (sha256 or session.sha256).lower()
+    if not expected:
+        raise UploadError("SHA-256 der Datei fehlt.", session.received)
+
+    path = session_path(session)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BLOCK_SIZE), b""):
+            digest.update(block)
+    if digest.hexdigest() != expected:
+        raise UploadError("Prüfsumme stimmt nicht, Upload bitte neu beginnen.", session.received, status=422)
+    return path
+
+
+def discard(session: UploadSession) -> None:
+    """Delete the session together with its temporary file."""
+    try:
+        session_path(session).unlink()
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def purge_expired() -> int:
+    """Remove sessions without activity for UPLOAD_SESSION_TTL_HOURS."""
+    cutoff = timezone.now() - timedelta(hours=_setting("UPLOAD_SESSION_TTL_HOURS", 24))
+    expired = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    for session in expired:
+        discard(session)
+    return len(expired)
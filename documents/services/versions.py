@@ -0,0 +1,86 @@
+"""
+Versioned tariff documents with page-level re-extraction.
+
+Insurers republish the same Verbraucherinformation every year with a
+handful of changed pages. A new version replaces the file of the existing
+document; every page is fingerprinted by hashing its content stream (plus
+the form XObjects and images it draws, see `utils.page_hashes`), which
+takes milliseconds with PyPDF2 and needs no text extraction. Pages whose
+hash already exists in the stored pages keep their text, only the
+remaining pages are extracted.
+"""
+import logging
+
+from django.db import transaction
+
+from ..extractors import choose_backend
+from ..models import Document, DocumentPage, DocumentVersion
+from ..storage import sha256_of
+from ..utils import PageText, extract_page_numbers, extract_pdf_pages, page_hashes
+from .cache import lookup, store
+from .ocr import ocr_empty_pages
+
+logger = logging.getLogger(__name__)
+
+
+def add_version(document: Document, upload) -> bool:
+    """
+    Replace the file of `document` with a new version and archive the old one.
+
+    Returns False (and changes nothing) when the upload has the same content.
+    """
+    if sha256_of(upload) == document.content_hash:
+        return False
+    with transaction.atomic():
+        DocumentVersion.objects.create(
+            document=document, version=document.version, file=document.file.name,
+            content_hash=document.content_hash, page_count=document.page_count,
+        )
+        document.file = upload
+        document.version += 1
+        document.status = Document.STATUS_PENDING
+        document.extraction_error = ""
+        document.save()
+    return True
+
+
+def _previous_texts(document: Document, backend: str) -> dict[str, str]:
+    # Texte eines anderen Extraktors würden die Seiten uneinheitlich machen
+    if document.extracted_with != backend:
+        return {}
+    return dict(
+        DocumentPage.objects.filter(document=document).exclude(content_hash="").values_list("content_hash", "text")
+    )
+
+
+def extract_document(document: Document) -> tuple[list[PageText], str, list[str], int]:
+    """
+    Extract a document, reusing the text of pages unchanged since its last extraction.
+
+    Returns (pages, backend, page hashes, number of reused pages). A full
+    extraction cache hit wins; otherwise only pages with an unknown content
+    hash go through the extractor.
+    """
+    file_path = document.file.path
+    backend = choose_backend(file_path, document.extractor)
+    hashes = page_hashes(file_path)
+    pages = lookup(document.content_hash, backend)
+    if pages is not None:
+        return pages, backend, hashes, 0
+
+    previous = _previous_texts(document, backend) if hashes else {}
+    changed = [number for number, page_hash in enumerate(hashes, start=1) if page_hash not in previous]
+    if not previous or len(changed) == len(hashes):
+        pages, reused = extract_pdf_pages(file_path, backend=backend), 0
+    else:
+        extracted = {p.number: p for p in extract_page_numbers(file_path, changed, backend)}
+        pages = [
+            extracted.get(number) or PageText(number, previous[page_hash], 0.0)
+            for number, page_hash in enumerate(hashes, start=1)
+        ]
+        reused = len(hashes) - len(changed)
+        logger.info(f"Document {document.pk} v{document.version}: {len(changed)} pages extracted, {reused} reused")
+    # Seiten ohne Textebene (Scans) per OCR füllen, bevor das Ergebnis in den Cache geht
+    pages, _ = ocr_empty_pages(file_path, pages, hashes)
+    store(document.content_hash, pages, backend)
+    return pages, backend, hashes, reused
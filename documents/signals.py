@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from users.models import UserContract
+
+from .models import Document, SearchEntry
+from .services.search import index_contract
+
+
+@receiver(post_save, sender=Document)
+def sync_search_title(sender, instance, created, **kwargs):
+    # Titeländerungen in die Suchabschnitte übernehmen
+    if not created:
+        SearchEntry.objects.filter(document=instance).exclude(title=instance.title).update(title=instance.title)
+
+
+@receiver(post_save, sender=UserContract)
+def reindex_contract(sender, instance, update_fields=None, **kwargs):
+    # Nur neu indexieren, wenn sich der Vertragstext geändert haben kann
+    if update_fields is not None and 'text_content' not in update_fields:
+        return
+    index_contract(instance)
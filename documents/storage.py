@@ -0,0 +1,78 @@
+"""
+Content-addressed file storage for uploaded PDFs.
+
+Files are stored under `<upload_to>/<sha256[:2]>/<sha256><ext>`, so the
+same PDF uploaded many times is written to disk exactly once. A repeated
+upload touches the existing file instead, so `gc_media --min-age-hours`
+does not remove it before the new row is written.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+_HASH_NAME = re.compile(r"(?:^|/)([0-9a-f]{2})/([0-9a-f]{64})(\.[^/]*)?$")
+
+
+def sha256_of(content) -> str:
+    """Hash a Django File (or uploaded file) chunk by chunk."""
+    digest = hashlib.sha256()
+    if hasattr(content, "seek"):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def content_hash_from_name(name: str) -> str:
+    """Return the SHA-256 encoded in a content-addressed name, or ''."""
+    match = _HASH_NAME.search(name or "")
+    return match.group(2) if match else ""
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by the SHA-256 of their content."""
+
+    def hashed_name(self, name: str, content_hash: str) -> str:
+        directory = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, content_hash[:2], f"{content_hash}{ext}").replace("\\", "/")
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        name = self.hashed_name(name, sha256_of(content))
+        # Identischer Inhalt liegt bereits vor: nicht erneut schreiben, nur mtime auffrischen (gc_media)
+        if self.exists(name):
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                # Gerade von gc_media entfernt: neu schreiben
+                pass
+        saved = super()._save(name, content)
+        if saved != name:
+            # Paralleler Upload desselben Inhalts war schneller: Duplikat verwerfen
+            self.delete(saved)
+        return name
+
+
+def commit_content_addressed(field_file) -> str:
+    """
+    Store a pending FieldFile through its storage and return its hash.
+
+    Called from model `save()` so the content hash is known before the
+    row is written; already committed files are only re-read from the name.
+    """
+    if not field_file:
+        return ""
+    if not field_file._committed:
+        field_file.save(field_file.name, field_file.file, save=False)
+    return content_hash_from_name(field_file.name)
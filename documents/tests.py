@@ -1,7 +1,58 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import importlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.apps import apps
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+import numpy as np
 import pdfplumber
 import PyPDF2
 
+from documents.management.commands.backfill_contract_text import Command as BackfillCommand
+from documents.management.commands.gc_media import Command as GcMediaCommand
+from users.models import UserContract
+
+from .extractors import AUTO, BACKENDS, PageText, choose_backend
+from .models import (
+    Document, DocumentPage, DocumentSection, DocumentVersion, ExtractionCacheEntry, ExtractionJob, UploadSession,
+)
+from .services import cache as extraction_cache, export
+from .services.ocr import OCR_BACKEND, ocr_empty_pages, tesseract_version
+from .services.pages import store_pages
+from .services.queue import claim_next_job, enqueue_extraction, requeue_stale_jobs, run_job
+from .services.search import index_document, search
+from .services.sections import classify, is_heading, split_sections, store_sections
+from .services.semantic import SemanticIndex, chunk_page
+from .services.versions import add_version
+from .storage import ContentAddressedStorage, content_hash_from_name
+from .utils import (
+    ExtractionLimitExceeded, _page_ranges, current_rss, extract_page_numbers, extract_pdf_pages, iter_pdf_pages,
+    page_hashes,
+)
+from .validators import sniff_pdf, validate_pdf
+
 # Create your tests here.
 
 
@@ -35,3 +86,1210 @@ class PdfExtractTestCase(TestCase):
         # Füge eine einfache Überprüfung hinzu, um sicherzustellen, dass Text extrahiert wurde
         # self.assertTrue(len(extracted_text) > 0,
         #                "Kein Text aus der PDF extrahiert.")
+
+
+SAMPLE_PDF = (
+    Path(settings.BASE_DIR) / 'contracts'
+    / 'Protokoll_BBKK-_GesundheitVARIO_VARIO_AmbulantPlus_U_VARIO_KlinikPlus_U_VARIO_ZahnPlus_U.pdf'
+)
+
+
+@skipUnless(current_rss(), "RSS ist auf diesem System nicht messbar")
+class StreamingExtractionTestCase(SimpleTestCase):
+    def test_peak_rss_stays_flat(self):
+        # pdfplumber ohne Freigabe der Seiten wächst hier um über 200 MB
+        start = peak = current_rss()
+        pages = 0
+        for page in iter_pdf_pages(str(SAMPLE_PDF), backend='pdfplumber', max_pages=0, max_rss_mb=0):
+            peak = max(peak, current_rss())
+            pages += 1
+        self.assertEqual(pages, 21)
+        self.assertLess(peak - start, 80 * 1024 * 1024)
+
+    def test_page_ceiling(self):
+        with self.assertRaises(ExtractionLimitExceeded):
+            next(iter_pdf_pages(str(SAMPLE_PDF), backend='pdfium', max_pages=5))
+
+    def test_memory_ceiling(self):
+        with self.assertRaises(ExtractionLimitExceeded):
+            list(iter_pdf_pages(str(SAMPLE_PDF), backend='pdfium', max_pages=0, max_rss_mb=1))
+
+
+def make_pdf(*pages, graphics=''):
+    """Minimal PDF with one line of Helvetica text per page (plus optional drawing operators)."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"{graphics}BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class MediaTestCase(TestCase):
+    """Runs every test with an empty, temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def make_document(self, *pages, title='Tarif'):
+        upload = SimpleUploadedFile(f'{title}.pdf', make_pdf(*pages), content_type='application/pdf')
+        return Document.objects.create(title=title, file=upload)
+
+    def make_user(self, username, **kwargs):
+        return get_user_model().objects.create_user(
+            username=username, email=f'{username}@example.com', password='pw', **kwargs
+        )
+
+    def make_contract(self, user, *pages, text=''):
+        upload = SimpleUploadedFile('vertrag.pdf', make_pdf(*(pages or ('Vertrag',))), content_type='application/pdf')
+        return UserContract.objects.create(user=user, pdf_file=upload, text_content=text)
+
+
+@override_settings(DOCUMENT_EXTRACTION_RETRY_BACKOFF_SECONDS=30, DOCUMENT_EXTRACTION_LEASE_SECONDS=600)
+class ExtractionQueueTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.make_document('Seite eins', 'Seite zwei')
+        self.job = enqueue_extraction(self.document)
+
+    def test_claim(self):
+        job = claim_next_job('w1')
+        self.assertEqual(job.pk, self.job.pk)
+        self.assertEqual((job.status, job.attempts, job.locked_by), (ExtractionJob.STATUS_RUNNING, 1, 'w1'))
+        self.assertIsNone(claim_next_job('w2'))
+
+    def test_run_job(self):
+        self.assertTrue(run_job(claim_next_job('w1')))
+        self.job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual(self.job.status, ExtractionJob.STATUS_DONE)
+        self.assertEqual(self.document.status, Document.STATUS_DONE)
+        self.assertEqual(
+            list(DocumentPage.objects.filter(document=self.document).order_by('number').values_list('text', flat=True)),
+            ['Seite eins', 'Seite zwei'],
+        )
+
+    def test_retry_with_backoff(self):
+        with mock.patch('documents.services.queue.extract_document', side_effect=RuntimeError('kaputt')):
+            self.assertFalse(run_job(claim_next_job('w1')))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ExtractionJob.STATUS_QUEUED)
+        self.assertEqual(self.job.last_error, 'kaputt')
+        self.assertAlmostEqual(
+            (self.job.run_after - timezone.now()).total_seconds(), 30, delta=5
+        )
+        # Erst nach Ablauf der Wartezeit wieder fällig
+        self.assertIsNone(claim_next_job('w1'))
+        ExtractionJob.objects.filter(pk=self.job.pk).update(run_after=timezone.now())
+        with mock.patch('documents.services.queue.extract_document', side_effect=RuntimeError('kaputt')):
+            self.assertFalse(run_job(claim_next_job('w1')))
+        self.job.refresh_from_db()
+        self.assertAlmostEqual(
+            (self.job.run_after - timezone.now()).total_seconds(), 60, delta=5
+        )
+
+    def test_final_failure(self):
+        ExtractionJob.objects.filter(pk=self.job.pk).update(max_attempts=1)
+        with mock.patch('documents.services.queue.extract_document', side_effect=RuntimeError('kaputt')):
+            self.assertFalse(run_job(claim_next_job('w1')))
+        self.job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual(self.job.status, ExtractionJob.STATUS_FAILED)
+        self.assertEqual(self.document.status, Document.STATUS_FAILED)
+
+    def test_save_error_does_not_leave_job_running(self):
+        with mock.patch('documents.services.queue.complete_extraction', side_effect=DatabaseError('gesperrt')):
+            self.assertFalse(run_job(claim_next_job('w1')))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ExtractionJob.STATUS_QUEUED)
+        self.assertEqual(self.job.last_error, 'gesperrt')
+
+    def _expire_lease(self, attempts):
+        ExtractionJob.objects.filter(pk=self.job.pk).update(
+            status=ExtractionJob.STATUS_RUNNING, attempts=attempts, locked_by='tot',
+            locked_at=timezone.now() - timedelta(seconds=601),
+        )
+
+    def test_lease_expiry_requeues(self):
+        self._expire_lease(attempts=1)
+        Document.objects.filter(pk=self.document.pk).update(status=Document.STATUS_PROCESSING)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.locked_by), (ExtractionJob.STATUS_QUEUED, ''))
+        self.assertEqual(self.document.status, Document.STATUS_PENDING)
+        self.assertEqual(claim_next_job('w1').attempts, 2)
+
+    def test_lease_expiry_after_last_attempt_fails(self):
+        self._expire_lease(attempts=3)
+        self.assertEqual(requeue_stale_jobs(), 0)
+        self.job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual(self.job.status, ExtractionJob.STATUS_FAILED)
+        self.assertEqual(self.document.status, Document.STATUS_FAILED)
+        self.assertIsNone(claim_next_job('w1'))
+
+
+class FullTextSearchTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.often = self.make_document('x', title='Zahntarif')
+        self.once = self.make_document('x', title='Kliniktarif')
+        index_document(self.often, [
+            PageText(1, 'Zahnbehandlung, Zahnersatz und Zahnbehandlung beim Zahnarzt: jede Zahnbehandlung zählt.', 0),
+        ])
+        index_document(self.once, [
+            PageText(1, 'Stationäre Leistungen im Krankenhaus.', 0),
+            PageText(2, 'Eine Zahnbehandlung ist nicht versichert, nur Unterbringung und Chefarzt.', 0),
+        ])
+        self.alice, self.bob = self.make_user('alice'), self.make_user('bob')
+        self.alice_contract = self.make_contract(self.alice, 'a', text='Mein Vertrag mit Zahnbehandlung Alice')
+        self.bob_contract = self.make_contract(self.bob, 'b', text='Mein Vertrag mit Zahnbehandlung Bob')
+
+    def test_ranking_and_snippet(self):
+        hits = [hit for hit in search('Zahnbehandlung') if hit.source == 'document']
+        self.assertEqual([(hit.source_id, hit.segment) for hit in hits], [(self.often.pk, 1), (self.once.pk, 2)])
+        self.assertGreater(hits[0].rank, hits[1].rank)
+        self.assertIn('<b>Zahnbehandlung</b>', hits[1].snippet)
+
+    def test_prefix_match_on_last_word(self):
+        self.assertEqual({hit.source_id for hit in search('Stationär')}, {self.once.pk})
+
+    def test_owner_filter(self):
+        contracts = lambda user_id: {
+            hit.source_id for hit in search('Zahnbehandlung', user_id=user_id) if hit.source == 'contract'
+        }
+        self.assertEqual(contracts(self.alice.pk), {self.alice_contract.pk})
+        self.assertEqual(contracts(self.bob.pk), {self.bob_contract.pk})
+        self.assertEqual(contracts(None), {self.alice_contract.pk, self.bob_contract.pk})
+
+    def test_reindex_replaces_changed_pages(self):
+        index_document(self.once, [PageText(2, 'Jetzt mit Brille.', 0)], numbers={2})
+        self.assertEqual({hit.source_id for hit in search('Zahnbehandlung') if hit.source == 'document'}, {self.often.pk})
+        self.assertEqual({hit.source_id for hit in search('Krankenhaus')}, {self.once.pk})
+
+    def test_endpoint_hides_foreign_contracts(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.get(reverse('document-search'), {'q': 'Zahnbehandlung Bob'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+        response = client.get(reverse('document-search'), {'q': 'Zahnbehandlung'})
+        sources = {(hit['source'], hit['id']) for hit in response.json()['results']}
+        self.assertIn(('contract', self.alice_contract.pk), sources)
+        self.assertNotIn(('contract', self.bob_contract.pk), sources)
+
+
+def _stub_encode(texts):
+    # Wort-Hashing statt Modell: gleiche Wörter ergeben ähnliche Vektoren
+    vectors = np.zeros((len(texts), 32), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % 32] += 1
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+    return vectors.astype(np.float16)
+
+
+class ChunkPageTestCase(SimpleTestCase):
+    def test_chunks_overlap_and_cut_at_whitespace(self):
+        text = ' '.join(f'wort{i}' for i in range(40))
+        spans = chunk_page(text, size=50, overlap=10)
+        self.assertEqual(spans[0][0], 0)
+        self.assertEqual(spans[-1][1], len(text))
+        for (_, end), (start, _) in zip(spans, spans[1:]):
+            self.assertLess(start, end)
+            self.assertEqual(text[end], ' ')
+        self.assertTrue(all(end - start <= 50 for start, end in spans))
+
+    def test_short_and_empty_text(self):
+        self.assertEqual(chunk_page('kurz', 50, 10), [(0, 4)])
+        self.assertEqual(chunk_page('   ', 50, 10), [])
+
+
+@override_settings(SEMANTIC_CHUNK_CHARS=200, SEMANTIC_CHUNK_OVERLAP=20)
+class SemanticIndexTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        index_path = tempfile.TemporaryDirectory()
+        self.addCleanup(index_path.cleanup)
+        self.index = SemanticIndex(index_path.name)
+        encode = mock.patch('documents.services.semantic._encode', side_effect=_stub_encode)
+        self.encode = encode.start()
+        self.addCleanup(encode.stop)
+        self.zahn = self.make_extracted('Zahnersatz Implantate Zahnreinigung', 'Brillen und Sehhilfen', title='Zahn')
+        self.klinik = self.make_extracted('Chefarzt Einbettzimmer Krankenhaus', title='Klinik')
+
+    def make_extracted(self, *texts, title):
+        document = self.make_document(*texts, title=title)
+        store_pages(document, [PageText(number, text, 0) for number, text in enumerate(texts, start=1)])
+        Document.objects.filter(pk=document.pk).update(status=Document.STATUS_DONE)
+        return document
+
+    def test_search_ranks_and_filters(self):
+        self.assertEqual(self.index.build()['documents'], 2)
+        hits = self.index.search('Implantate Zahnersatz', limit=2)
+        self.assertEqual((hits[0].document_id, hits[0].page), (self.zahn.pk, 1))
+        self.assertIn('Implantate', hits[0].text)
+        hits = self.index.search('Implantate Zahnersatz', document_ids=[self.klinik.pk])
+        self.assertEqual({hit.document_id for hit in hits}, {self.klinik.pk})
+
+    def test_incremental_build_embeds_only_changed_documents(self):
+        self.index.build()
+        self.encode.reset_mock()
+        self.assertEqual(self.index.build(), {'documents': 0, 'removed': 0, 'chunks': 0, 'rows': 3})
+        self.encode.assert_not_called()
+
+        # Neuer Inhalt: nur dieses Dokument wird neu eingebettet, alte Zeilen fallen weg
+        Document.objects.filter(pk=self.klinik.pk).update(content_hash='neu')
+        store_pages(self.klinik, [PageText(1, 'Krankentagegeld ab Tag 43', 0)])
+        stats = self.index.build()
+        self.assertEqual((stats['documents'], stats['removed'], stats['chunks']), (1, 1, 1))
+        self.assertEqual(self.encode.call_args.args[0], ['Krankentagegeld ab Tag 43'])
+        hits = self.index.search('Krankentagegeld', limit=5)
+        self.assertEqual(hits[0].text, 'Krankentagegeld ab Tag 43')
+        self.assertNotIn('Chefarzt Einbettzimmer Krankenhaus', [hit.text for hit in hits])
+
+        self.zahn.delete()
+        self.assertEqual(self.index.build()['removed'], 1)
+        self.assertEqual({hit.document_id for hit in self.index.search('Zahnersatz')}, {self.klinik.pk})
+
+    def search_during_save(self, **build):
+        """Run a build and search from another instance right before the new generation is published."""
+        seen = []
+        save = SemanticIndex._save
+
+        def searching_save(index, *args):
+            seen.append([(hit.document_id, hit.page) for hit in SemanticIndex(self.index.path).search('Zahnersatz')])
+            save(index, *args)
+
+        with mock.patch.object(SemanticIndex, '_save', searching_save):
+            self.index.build(**build)
+        return seen[0]
+
+    def test_search_while_compacting(self):
+        self.index.build()
+        before = [(hit.document_id, hit.page) for hit in self.index.search('Zahnersatz')]
+        vectors = self.index.manifest()['vectors']
+        # 2 von 3 Zeilen tot: die Vektordatei wird verdichtet
+        self.zahn.delete()
+        self.assertEqual(self.search_during_save(), before)
+        manifest = self.index.manifest()
+        self.assertNotEqual(manifest['vectors'], vectors)
+        self.assertEqual(len(self.index.rows(manifest)), 1)
+        self.assertEqual({hit.document_id for hit in self.index.search('Zahnersatz')}, {self.klinik.pk})
+
+    def test_search_while_rebuilding(self):
+        self.index.build()
+        before = [(hit.document_id, hit.page) for hit in self.index.search('Zahnersatz')]
+        self.assertEqual(self.search_during_save(rebuild=True), before)
+        self.assertEqual([(hit.document_id, hit.page) for hit in self.index.search('Zahnersatz')], before)
+        # Nur aktuelle und vorige Generation bleiben liegen
+        self.index.build(rebuild=True)
+        files = sorted(path.name for path in Path(self.index.path).iterdir() if path.name.startswith(('rows.', 'vectors.')))
+        self.assertEqual(files, ['rows.2.npy', 'rows.3.npy', 'vectors.2.f16', 'vectors.3.f16'])
+
+
+class DocumentVersionTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.make_document('Leistungen', 'Beiträge 2024', 'Kündigung')
+        enqueue_extraction(self.document)
+        self.assertTrue(run_job(claim_next_job('w1')))
+        self.document.refresh_from_db()
+
+    def new_version(self, *pages):
+        upload = SimpleUploadedFile('Tarif.pdf', make_pdf(*pages), content_type='application/pdf')
+        return add_version(self.document, upload)
+
+    def page_texts(self):
+        return list(
+            DocumentPage.objects.filter(document=self.document).order_by('number').values_list('text', flat=True)
+        )
+
+    def test_same_content_is_no_new_version(self):
+        self.assertFalse(self.new_version('Leistungen', 'Beiträge 2024', 'Kündigung'))
+        self.assertEqual(self.document.version, 1)
+        self.assertFalse(DocumentVersion.objects.exists())
+
+    def test_only_changed_pages_are_extracted(self):
+        old_file = self.document.file.name
+        self.assertTrue(self.new_version('Leistungen', 'Beiträge 2025', 'Kündigung'))
+        enqueue_extraction(self.document)
+        with mock.patch(
+            'documents.services.versions.extract_page_numbers', wraps=extract_page_numbers
+        ) as extract:
+            self.assertTrue(run_job(claim_next_job('w1')))
+        self.assertEqual(extract.call_args.args[1], [2])
+
+        self.document.refresh_from_db()
+        self.assertEqual((self.document.version, self.document.reused_pages), (2, 2))
+        self.assertEqual(self.page_texts(), ['Leistungen', 'Beiträge 2025', 'Kündigung'])
+        archived = DocumentVersion.objects.get(document=self.document)
+        self.assertEqual((archived.version, archived.file.name, archived.page_count), (1, old_file, 3))
+
+    def test_all_pages_changed(self):
+        self.new_version('Neu eins', 'Neu zwei')
+        enqueue_extraction(self.document)
+        self.assertTrue(run_job(claim_next_job('w1')))
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.reused_pages, 0)
+        self.assertEqual(self.page_texts(), ['Neu eins', 'Neu zwei'])
+
+
+class MediaFileViewTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol = self.make_user('alice'), self.make_user('bob'), self.make_user('carol')
+        self.staff = self.make_user('staff', is_staff=True)
+        # Gleiche PDF bei zwei Nutzern: inhaltsadressiert dieselbe Datei
+        self.contract = self.make_contract(self.alice, 'Mein Vertrag')
+        self.make_contract(self.bob, 'Mein Vertrag')
+        self.name = self.contract.pdf_file.name
+        self.data = make_pdf('Mein Vertrag')
+
+    def get(self, user, name=None, **headers):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get(reverse('media', kwargs={'path': name or self.name}), headers=headers)
+
+    def test_shared_contract_is_readable_by_every_owner(self):
+        self.assertEqual(UserContract.objects.filter(pdf_file=self.name).count(), 2)
+        for user in (self.alice, self.bob, self.staff):
+            response = self.get(user)
+            self.assertEqual(response.status_code, 200, user.username)
+            self.assertEqual(b''.join(response.streaming_content), self.data)
+        self.assertEqual(self.get(self.carol).status_code, 403)
+
+    def test_documents_and_archived_versions_are_readable(self):
+        document = self.make_document('Version eins')
+        old_name = document.file.name
+        add_version(document, SimpleUploadedFile('neu.pdf', make_pdf('Version zwei')))
+        self.assertEqual(self.get(self.carol, document.file.name).status_code, 200)
+        self.assertEqual(self.get(self.carol, old_name).status_code, 200)
+
+    def test_unknown_file(self):
+        self.assertEqual(self.get(self.carol, 'documents/ab/fehlt.pdf').status_code, 404)
+
+    def test_caching_headers_and_not_modified(self):
+        response = self.get(self.alice)
+        self.assertEqual(response['ETag'], f'"{self.contract.content_hash}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.get(self.alice, If_None_Match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range(self):
+        response = self.get(self.alice, Range='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[:10])
+        response = self.get(self.alice, Range='bytes=-6')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-6:])
+
+    def test_range_not_satisfiable(self):
+        response = self.get(self.alice, Range=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_range(self):
+        etag = f'"{self.contract.content_hash}"'
+        self.assertEqual(self.get(self.alice, Range='bytes=0-9', If_Range=etag).status_code, 206)
+        response = self.get(self.alice, Range='bytes=0-9', If_Range='"veraltet"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_offload_headers(self):
+        with self.settings(MEDIA_OFFLOAD='x-accel', MEDIA_OFFLOAD_PREFIX='/protected-media/'):
+            response = self.get(self.alice)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_OFFLOAD='x-sendfile'):
+            response = self.get(self.alice)
+        self.assertEqual(response['X-Sendfile'], str(Path(self.media_root) / self.name))
+
+
+class BackfillContractTextTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.contracts = [
+            self.make_contract(self.make_user(f'kunde{i}'), f'Vertrag Nummer {i}') for i in range(3)
+        ]
+        self.checkpoint = os.path.join(self.media_root, 'backfill.json')
+
+    def backfill(self, *args):
+        call_command(
+            'backfill_contract_text', '--batch-size', '1', '--workers', '1',
+            '--checkpoint', self.checkpoint, *args, stdout=io.StringIO(),
+        )
+
+    def texts(self):
+        return [UserContract.objects.get(pk=c.pk).text_content for c in self.contracts]
+
+    def test_fills_all_contracts_and_removes_checkpoint(self):
+        self.backfill()
+        self.assertEqual(self.texts(), [f'Vertrag Nummer {i}' for i in range(3)])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_after_interruption(self):
+        write_batch = BackfillCommand._write_batch
+        calls = []
+
+        def interrupt_second_batch(command, contracts, texts):
+            calls.append(contracts[0].pk)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return write_batch(command, contracts, texts)
+
+        with mock.patch.object(BackfillCommand, '_write_batch', interrupt_second_batch):
+            self.backfill()
+        self.assertEqual(self.texts(), ['Vertrag Nummer 0', '', ''])
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f), {'last_id': self.contracts[0].pk})
+
+        # Zweiter Lauf setzt hinter dem Checkpoint fort
+        with mock.patch.object(BackfillCommand, '_write_batch', side_effect=write_batch, autospec=True) as spy:
+            self.backfill()
+        self.assertEqual([call.args[1][0].pk for call in spy.call_args_list], [c.pk for c in self.contracts[1:]])
+        self.assertEqual(self.texts(), [f'Vertrag Nummer {i}' for i in range(3)])
+
+    def test_checkpoint_skips_processed_ids(self):
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'last_id': self.contracts[1].pk}, f)
+        self.backfill()
+        self.assertEqual(self.texts(), ['', '', 'Vertrag Nummer 2'])
+        self.backfill('--restart')
+        self.assertEqual(self.texts(), [f'Vertrag Nummer {i}' for i in range(3)])
+
+
+class ChunkedUploadTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        override = override_settings(UPLOAD_SESSION_DIR=os.path.join(self.media_root, 'upload_sessions'))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.make_user('uploader'))
+        self.data = make_pdf(*(f'Seite {i}' for i in range(20)))
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+
+    def start(self, **metadata):
+        response = self.client.post(reverse('upload-list'), {
+            'filename': 'avb.pdf', 'size': len(self.data), 'sha256': self.sha256, 'metadata': metadata,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def put(self, session_id, first, last):
+        return self.client.put(
+            reverse('upload-detail', args=[session_id]), self.data[first:last + 1],
+            content_type='application/octet-stream',
+            headers={'Content-Range': f'bytes {first}-{last}/{len(self.data)}'},
+        )
+
+    def complete(self, session_id, **data):
+        return self.client.post(reverse('upload-complete', args=[session_id]), data, format='json')
+
+    def test_upload_resume_and_complete(self):
+        session_id = self.start(title='AVB 2025')
+        half = len(self.data) // 2
+        self.assertEqual(self.put(session_id, 0, half - 1).json(), {'offset': half, 'complete': False})
+        self.assertEqual(self.client.get(reverse('upload-detail', args=[session_id])).json()['offset'], half)
+
+        # Lücke: Server nennt den Offset zum Fortsetzen
+        response = self.put(session_id, half + 10, len(self.data) - 1)
+        self.assertEqual((response.status_code, response.json()['offset']), (409, half))
+        # Wiederholter, überlappender Chunk: bereits gespeicherte Bytes werden übersprungen
+        response = self.put(session_id, half - 10, len(self.data) - 1)
+        self.assertEqual(response.json(), {'offset': len(self.data), 'complete': True})
+
+        response = self.complete(session_id)
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get(pk=response.json()['id'])
+        self.assertEqual(document.title, 'AVB 2025')
+        self.assertEqual(document.content_hash, self.sha256)
+        with document.file.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+        # Wiederholter Abschluss legt kein zweites Dokument an
+        self.assertEqual(self.complete(session_id).json(), {'target': 'document', 'id': document.pk})
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_invalid_content_length(self):
+        session_id = self.start(title='AVB')
+        for content_length in ('abc', '50'):
+            response = self.client.put(
+                reverse('upload-detail', args=[session_id]), self.data[:100],
+                content_type='application/octet-stream',
+                headers={'Content-Range': f'bytes 0-99/{len(self.data)}'}, CONTENT_LENGTH=content_length,
+            )
+            self.assertEqual((response.status_code, response.json()['offset']), (400, 0))
+        self.assertEqual(UploadSession.objects.get(pk=session_id).received, 0)
+
+    def test_incomplete_and_checksum_mismatch(self):
+        session_id = self.start(title='AVB')
+        self.put(session_id, 0, 99)
+        self.assertEqual(self.complete(session_id).status_code, 400)
+        self.put(session_id, 100, len(self.data) - 1)
+        self.assertEqual(self.complete(session_id, sha256='0' * 64).status_code, 422)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).status, UploadSession.STATUS_OPEN)
+        self.assertFalse(Document.objects.exists())
+
+    def test_multipart_complete_with_metadata_string(self):
+        session_id = self.start()
+        self.put(session_id, 0, len(self.data) - 1)
+        response = self.client.post(
+            reverse('upload-complete', args=[session_id]), {'metadata': json.dumps({'title': 'Aus Formular'})},
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Document.objects.get(pk=response.json()['id']).title, 'Aus Formular')
+
+    def test_invalid_metadata(self):
+        session_id = self.start(title='AVB')
+        self.put(session_id, 0, len(self.data) - 1)
+        response = self.client.post(reverse('upload-complete', args=[session_id]), {'metadata': '[1, 2'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkIngestTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.existing = self.make_document('Bestand', title='Bestand')
+
+    def zip_of(self, **files):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, data in files.items():
+                archive.writestr(name, data)
+        return buffer.getvalue()
+
+    def test_api_dedups_files_zip_and_existing_documents(self):
+        client = APIClient()
+        client.force_authenticate(self.make_user('admin', is_staff=True))
+        archive = self.zip_of(**{
+            'avb/kopie.pdf': make_pdf('AVB'), 'avb/neu.pdf': make_pdf('Neu im Zip'), 'liesmich.txt': b'ignorieren',
+        })
+        files = [
+            SimpleUploadedFile('avb.pdf', make_pdf('AVB')),
+            SimpleUploadedFile('bestand.pdf', make_pdf('Bestand')),
+            SimpleUploadedFile('foto.pdf', b'\xff\xd8\xff\xe0' + b'0' * 100),
+            SimpleUploadedFile('paket.zip', archive),
+        ]
+        response = client.post(reverse('document-bulk-ingest'), {'files': files}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        statuses = {item['name']: item['status'] for item in body['files']}
+        self.assertEqual(statuses, {
+            'avb.pdf': 'neu', 'bestand.pdf': 'duplikat', 'foto.pdf': 'ungültig', 'kopie.pdf': 'duplikat', 'neu.pdf': 'neu',
+        })
+        self.assertEqual((body['created'], body['queued']), (2, 2))
+        ids = {item['name']: item['document_id'] for item in body['files']}
+        self.assertEqual(ids['kopie.pdf'], ids['avb.pdf'])
+        self.assertEqual(ids['bestand.pdf'], self.existing.pk)
+        self.assertIsNone(ids['foto.pdf'])
+        self.assertEqual(Document.objects.count(), 3)
+        self.assertEqual(ExtractionJob.objects.count(), 2)
+
+    def test_command_extracts_and_skips_known_content(self):
+        source = Path(self.media_root) / 'eingang'
+        source.mkdir()
+        (source / 'eins.pdf').write_bytes(make_pdf('Erste AVB'))
+        (source / 'paket.zip').write_bytes(self.zip_of(**{'zwei.pdf': make_pdf('Zweite AVB')}))
+        (source / 'kaputt.pdf').write_bytes(b'keine PDF')
+
+        out = io.StringIO()
+        call_command('ingest_documents', str(source), '--workers', '1', stdout=out)
+        documents = Document.objects.exclude(pk=self.existing.pk).order_by('title')
+        self.assertEqual(
+            list(documents.values_list('title', 'status', 'extracted_text')),
+            [('eins', 'done', 'Erste AVB'), ('zwei', 'done', 'Zweite AVB')],
+        )
+        self.assertIn('kaputt.pdf: ungültig', out.getvalue())
+
+        out = io.StringIO()
+        call_command('ingest_documents', str(source), '--workers', '1', stdout=out)
+        self.assertIn('0 neu angelegt', out.getvalue())
+        self.assertEqual(Document.objects.count(), 3)
+
+
+def encrypt_pdf(data, user_password=''):
+    writer = PyPDF2.PdfWriter()
+    for page in PyPDF2.PdfReader(io.BytesIO(data)).pages:
+        writer.add_page(page)
+    writer.encrypt(user_password=user_password, owner_password='besitzer')
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+class PdfValidationTestCase(SimpleTestCase):
+    def upload(self, data):
+        return SimpleUploadedFile('upload.pdf', data, content_type='application/pdf')
+
+    def test_text_pdf(self):
+        info = sniff_pdf(self.upload(make_pdf('Eins', 'Zwei')))
+        self.assertEqual((info.page_count, info.encrypted, info.has_text), (2, False, True))
+        validate_pdf(self.upload(make_pdf('Eins')))
+
+    def test_rejects_non_pdf(self):
+        with self.assertRaisesMessage(ValidationError, 'Keine PDF-Datei'):
+            validate_pdf(self.upload(b'\xff\xd8\xff\xe0' + b'0' * 100))
+
+    def test_permission_restricted_pdf_is_accepted(self):
+        data = encrypt_pdf(make_pdf('Geheim', 'Tarif'))
+        self.assertTrue(sniff_pdf(self.upload(data)).encrypted)
+        validate_pdf(self.upload(data))
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(data)
+            f.flush()
+            hashes = page_hashes(f.name)
+        self.assertEqual(len(set(hashes)), 2)
+
+    def test_password_protected_pdf(self):
+        with self.assertRaisesMessage(ValidationError, 'passwortgeschützt'):
+            validate_pdf(self.upload(encrypt_pdf(make_pdf('Geheim'), user_password='geheim')))
+
+    @override_settings(DOCUMENT_EXTRACTION_MAX_PAGES=2)
+    def test_page_limit(self):
+        with self.assertRaisesMessage(ValidationError, 'höchstens 2'):
+            validate_pdf(self.upload(make_pdf('1', '2', '3')))
+
+
+class ExportTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('admin', is_staff=True)
+        self.document = self.make_document('Leistungen')
+        Document.objects.filter(pk=self.document.pk).update(extracted_text='Zahnersatz zu 80 % – Höchstsatz')
+        self.contract = self.make_contract(self.admin, text='Mein Vertrag')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def records(self, data):
+        return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+
+    def test_ndjson_lines(self):
+        records = self.records(b''.join(export.iter_ndjson(chunk_size=1)))
+        self.assertEqual([(r['source'], r['id']) for r in records],
+                         [('document', self.document.pk), ('contract', self.contract.pk)])
+        self.assertEqual(records[0]['text'], 'Zahnersatz zu 80 % – Höchstsatz')
+        self.assertEqual(records[1]['text'], 'Mein Vertrag')
+
+    def test_gzip_round_trip(self):
+        lines = [f'{{"n": {n}, "text": "{os.urandom(64).hex()}"}}\n'.encode() for n in range(5000)]
+        with mock.patch.object(export, 'GZIP_FLUSH_BYTES', 1024):
+            chunks = list(export.gzip_stream(iter(lines)))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), b''.join(lines))
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('document-export-texts'))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(len(self.records(b''.join(response.streaming_content))), 2)
+
+        response = self.client.get(reverse('document-export-texts'), {'source': 'contracts', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('contracts.ndjson.gz', response['Content-Disposition'])
+        records = self.records(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual([r['source'] for r in records], ['contract'])
+
+        self.assertEqual(self.client.get(reverse('document-export-texts'), {'source': 'x'}).status_code, 400)
+        self.client.force_authenticate(self.make_user('kunde'))
+        self.assertEqual(self.client.get(reverse('document-export-texts')).status_code, 403)
+
+    def test_command(self):
+        output = os.path.join(self.media_root, 'texts.ndjson.gz')
+        stdout = io.StringIO()
+        call_command('export_texts', '--output', output, '--gzip', '--source', 'documents', stdout=stdout)
+        self.assertIn('1 Einträge exportiert', stdout.getvalue())
+        with gzip.open(output) as f:
+            self.assertEqual([r['id'] for r in self.records(f.read())], [self.document.pk])
+
+
+class GcMediaTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.make_document('Behalten')
+        self.orphan = self.make_document('Verwaist')
+        self.orphan_name = self.orphan.file.name
+        Document.objects.filter(pk=self.orphan.pk).delete()
+        old = time.time() - 48 * 3600
+        for name in (self.document.file.name, self.orphan_name):
+            os.utime(os.path.join(self.media_root, name), (old, old))
+
+    def gc(self, *args):
+        stdout = io.StringIO()
+        call_command('gc_media', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_dry_run(self):
+        self.assertIn('1 verwaiste Datei(en) würden gelöscht', self.gc('--dry-run'))
+        self.assertTrue(self.exists(self.orphan_name))
+
+    def test_quarantine(self):
+        with tempfile.TemporaryDirectory() as quarantine:
+            self.assertIn('1 verwaiste Datei(en) verschoben', self.gc('--quarantine', quarantine))
+            self.assertTrue(os.path.exists(os.path.join(quarantine, self.orphan_name)))
+        self.assertFalse(self.exists(self.orphan_name))
+        self.assertTrue(self.exists(self.document.file.name))
+
+    def test_recent_files_are_kept(self):
+        self.assertIn('jünger als 72 h übersprungen', self.gc('--min-age-hours', '72'))
+        self.assertTrue(self.exists(self.orphan_name))
+
+    def test_dedup_hit_refreshes_mtime(self):
+        self.make_document('Verwaist', title='Nochmal')
+        self.assertGreater(os.stat(os.path.join(self.media_root, self.orphan_name)).st_mtime, time.time() - 60)
+        self.assertIn('0 verwaiste Datei(en) gelöscht', self.gc())
+        self.assertTrue(self.exists(self.orphan_name))
+
+    def test_rechecks_database_before_removing(self):
+        # Zeile entsteht, nachdem gc_media die Verweise eingelesen hat
+        self.make_document('Verwaist', title='Nochmal')
+        old = time.time() - 48 * 3600
+        os.utime(os.path.join(self.media_root, self.orphan_name), (old, old))
+        with mock.patch.object(GcMediaCommand, '_referenced', return_value=set()):
+            self.assertIn('0 verwaiste Datei(en) gelöscht', self.gc())
+        self.assertTrue(self.exists(self.orphan_name))
+
+
+class ExtractorBackendTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, data):
+        path = self.directory / name
+        path.write_bytes(data)
+        return str(path)
+
+    def test_backends(self):
+        path = self.write('tarif.pdf', make_pdf('Eins', 'Zwei', 'Drei'))
+        for name, backend in BACKENDS.items():
+            with self.subTest(backend=name):
+                self.assertEqual(backend.page_count(path), 3)
+                pages = list(backend.iter_range(path, 1, 3))
+                self.assertEqual([(page.number, page.text.strip()) for page in pages], [(2, 'Zwei'), (3, 'Drei')])
+                self.assertTrue(all(page.seconds >= 0 for page in pages))
+
+    def test_pdfminer_parses_the_file_once(self):
+        from pdfminer import high_level
+
+        path = self.write('tarif.pdf', make_pdf('Eins', 'Zwei', 'Drei'))
+        with mock.patch.object(high_level, 'extract_pages', wraps=high_level.extract_pages) as extract:
+            list(BACKENDS['pdfminer'].iter_range(path, 0, 3))
+        extract.assert_called_once()
+
+    def test_choose_backend(self):
+        # 120 Linien pro Seite wie bei einer Tariftabelle
+        lines = ''.join(f'72 {100 + n * 5} m 540 {100 + n * 5} l S ' for n in range(120))
+        text = self.write('text.pdf', make_pdf('Fließtext', 'Fließtext'))
+        table = self.write('tabelle.pdf', make_pdf('Tabelle', graphics=lines))
+        self.assertEqual(choose_backend(text), 'pdfium')
+        self.assertEqual(choose_backend(table, AUTO), 'pdfplumber')
+        with self.settings(DOCUMENT_EXTRACTOR_TABLE_PATHS_PER_PAGE=200):
+            self.assertEqual(choose_backend(table), 'pdfium')
+        self.assertEqual(choose_backend(table, 'pypdf2'), 'pypdf2')
+        with self.assertRaises(ValueError):
+            choose_backend(text, 'unbekannt')
+        # Für pdfium unlesbar: pdfplumber als toleranterer Fallback
+        self.assertEqual(choose_backend(self.write('kaputt.pdf', b'%PDF-1.4 kaputt')), 'pdfplumber')
+
+
+AVB_PAGES = [
+    PageText(1, (
+        "Allgemeine Versicherungsbedingungen\n"
+        "§ 1 Gegenstand, Umfang, Versicherungsfall,\n"
+        "örtlicher Geltungsbereich\n"
+        "Der Versicherer bietet Versicherungsschutz für Krankheiten.\n"
+        "Seite 1 von 3\n"
+        "§ 4 Umfang der Leistungspflicht\n"
+        "Nach § 8 Absatz 4 AVB/VV) wird geleistet.\n"
+    ), 0),
+    PageText(2, (
+        "Tarif ZahnPlus\n"
+        "1. Zahnbehandlung\n"
+        "Erstattet werden 100 % für Füllungen.\n"
+        "2. Leistungsumfang\n"
+        "Weitere Leistungen nach Tarif.\n"
+    ), 1),
+    PageText(3, (
+        "Tarif GesundheitVARIO\n"
+        "1. Leistungsumfang\n"
+        "Chefarzt, Krankenhaus und Unterbringung im Einbettzimmer; Klinik nach Wahl.\n"
+        "© Versicherer AG\n"
+    ), 2),
+]
+
+
+class SectionTestCase(MediaTestCase):
+    def test_headings(self):
+        self.assertTrue(is_heading("§ 4 Umfang der Leistungspflicht"))
+        self.assertTrue(is_heading("Tarif VARIO KlinikPlus"))
+        self.assertTrue(is_heading("1. Wahlleistungen"))
+        self.assertFalse(is_heading("§ 8 Absatz 4 AVB/VV) wird geleistet."))
+        self.assertFalse(is_heading("1. Januar 2024."))
+
+    def test_split_sections(self):
+        sections = split_sections(AVB_PAGES)
+        self.assertEqual([(s.heading, s.start_page, s.end_page) for s in sections], [
+            ("", 1, 1),
+            ("§ 1 Gegenstand, Umfang, Versicherungsfall, örtlicher Geltungsbereich", 1, 1),
+            ("§ 4 Umfang der Leistungspflicht", 1, 1),
+            ("Tarif ZahnPlus", 2, 2),
+            ("1. Zahnbehandlung", 2, 2),
+            ("2. Leistungsumfang", 2, 2),
+            ("Tarif GesundheitVARIO", 3, 3),
+            ("1. Leistungsumfang", 3, 3),
+        ])
+        # Seitenfuß und Copyright gehören nicht zum Text
+        self.assertEqual(sections[1].text, "Der Versicherer bietet Versicherungsschutz für Krankheiten.")
+        self.assertNotIn("©", sections[-1].text)
+
+    def test_heading_with_comma_before_next_heading(self):
+        sections = split_sections([PageText(1, "§ 1 Beginn,\n§ 2 Leistungen\nText", 0)])
+        self.assertEqual([s.heading for s in sections], ["§ 1 Beginn,", "§ 2 Leistungen"])
+        self.assertEqual(sections[1].text, "Text")
+
+    def test_classify(self):
+        self.assertEqual(classify("Selbstbehalt je Kalenderjahr"), DocumentSection.KIND_SELBSTBETEILIGUNG)
+        self.assertEqual(classify("Tarif ZahnPlus"), DocumentSection.KIND_ZAHN)
+        self.assertEqual(classify("2. Leistungsumfang", context=DocumentSection.KIND_ZAHN), DocumentSection.KIND_ZAHN)
+        self.assertEqual(classify("1. Leistungen", "ambulant, Arzneimittel und Heilmittel"), DocumentSection.KIND_AMBULANT)
+        self.assertEqual(classify("1. Leistungen", "ambulant"), DocumentSection.KIND_ALLGEMEIN)
+
+    def test_store_sections(self):
+        document = self.make_document('AVB')
+        self.assertEqual(store_sections(document, AVB_PAGES), 8)
+        kinds = list(DocumentSection.objects.filter(document=document).order_by('position').values_list('heading', 'kind'))
+        self.assertEqual(kinds[3:], [
+            ("Tarif ZahnPlus", DocumentSection.KIND_ZAHN),
+            # Unterabschnitte eines Bausteintarifs erben dessen Art
+            ("1. Zahnbehandlung", DocumentSection.KIND_ZAHN),
+            ("2. Leistungsumfang", DocumentSection.KIND_ZAHN),
+            # Volltarif: keine Vorgabe, Art aus dem Text
+            ("Tarif GesundheitVARIO", DocumentSection.KIND_ALLGEMEIN),
+            ("1. Leistungsumfang", DocumentSection.KIND_STATIONAER),
+        ])
+        # Erneutes Speichern ersetzt die Abschnitte
+        store_sections(document, AVB_PAGES[:1])
+        self.assertEqual(DocumentSection.objects.filter(document=document).count(), 3)
+
+
+class ExtractionCacheTestCase(TestCase):
+    def pages(self, *texts):
+        return [PageText(number, text, 0.5) for number, text in enumerate(texts, start=1)]
+
+    def test_hit_and_miss_counting(self):
+        self.assertIsNone(extraction_cache.lookup('a' * 64, 'pdfium', '1.0'))
+        self.assertIsNone(extraction_cache.lookup('a' * 64, 'pdfium', '1.0', count_miss=False))
+        extraction_cache.store('a' * 64, self.pages('Eins', 'Zwei'), 'pdfium', '1.0')
+        pages = extraction_cache.lookup('a' * 64, 'pdfium', '1.0')
+        self.assertEqual([(p.number, p.text) for p in pages], [(1, 'Eins'), (2, 'Zwei')])
+        # Anderer Extraktor oder andere Version: kein Treffer
+        self.assertIsNone(extraction_cache.lookup('a' * 64, 'pdfplumber', '1.0'))
+        self.assertIsNone(extraction_cache.lookup('a' * 64, 'pdfium', '2.0'))
+        self.assertEqual(ExtractionCacheEntry.objects.get().hits, 1)
+        self.assertEqual(extraction_cache.stats(), {
+            'hits': 1, 'misses': 3, 'evictions': 0, 'hit_rate': 0.25, 'entries': 1, 'size_bytes': 8,
+        })
+
+    def test_store_replaces_entry(self):
+        extraction_cache.store('a' * 64, self.pages('alt'), 'pdfium', '1.0')
+        extraction_cache.store('a' * 64, self.pages('neu', 'Seite'), 'pdfium', '1.0')
+        entry = ExtractionCacheEntry.objects.get()
+        self.assertEqual((entry.pages, entry.size_bytes), (['neu', 'Seite'], 8))
+
+    def test_evict_least_recently_used(self):
+        for key in 'abc':
+            extraction_cache.store(key * 64, self.pages('x' * 100), 'pdfium', '1.0')
+        # "a" zuletzt gelesen, "b" ist am längsten ungenutzt
+        extraction_cache.lookup('a' * 64, 'pdfium', '1.0')
+        self.assertEqual(extraction_cache.evict(max_bytes=250), 1)
+        self.assertEqual(sorted(ExtractionCacheEntry.objects.values_list('content_hash', flat=True)), ['a' * 64, 'c' * 64])
+        self.assertEqual(extraction_cache.evict(max_bytes=250), 0)
+        with self.settings(DOCUMENT_EXTRACTION_CACHE_MAX_BYTES=100):
+            extraction_cache.store('d' * 64, self.pages('x' * 100), 'pdfium', '1.0')
+        self.assertEqual(list(ExtractionCacheEntry.objects.values_list('content_hash', flat=True)), ['d' * 64])
+        self.assertEqual(extraction_cache.stats()['evictions'], 3)
+
+    def test_invalidate_stale(self):
+        current = BACKENDS['pdfium'].version()
+        extraction_cache.store('a' * 64, self.pages('aktuell'), 'pdfium')
+        extraction_cache.store('b' * 64, self.pages('alt'), 'pdfium', '0.0-alt')
+        self.assertEqual(extraction_cache.invalidate_stale(), 1)
+        self.assertEqual(list(ExtractionCacheEntry.objects.values_list('version', flat=True)), [current])
+        # Nach einem Upgrade des Extraktors ist auch der bisher aktuelle Eintrag veraltet
+        with mock.patch.object(type(BACKENDS['pdfium']), 'version', return_value='99.0'):
+            self.assertIsNone(extraction_cache.lookup('a' * 64, 'pdfium'))
+            self.assertEqual(extraction_cache.invalidate_stale(), 1)
+        self.assertFalse(ExtractionCacheEntry.objects.exists())
+
+
+FAKE_TESSERACT = """\
+import os, sys
+if "--version" in sys.argv:
+    print("tesseract 5.3.0")
+    sys.exit(0)
+image = sys.stdin.buffer.read()
+with open(os.environ["FAKE_TESSERACT_LOG"], "a") as log:
+    log.write(image[:2].decode() + "\\n")
+if os.path.exists(os.environ["FAKE_TESSERACT_LOG"] + ".fail"):
+    sys.stderr.write("kaputt")
+    sys.exit(1)
+print("Erkannter Text")
+"""
+
+
+class OcrTestCase(TestCase):
+    """Runs the OCR path against a stand-in for the tesseract command."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        command = self.directory / 'tesseract'
+        command.write_text(f"#!{sys.executable}\n{FAKE_TESSERACT}")
+        command.chmod(0o755)
+        self.log = self.directory / 'calls.log'
+        ocr_settings = override_settings(
+            DOCUMENT_OCR_COMMAND=str(command), DOCUMENT_OCR_WORKERS=1, DOCUMENT_OCR_ENABLED=True,
+        )
+        ocr_settings.enable()
+        self.addCleanup(ocr_settings.disable)
+        environ = mock.patch.dict(os.environ, {'FAKE_TESSERACT_LOG': str(self.log)})
+        environ.start()
+        self.addCleanup(environ.stop)
+        tesseract_version.cache_clear()
+        self.addCleanup(tesseract_version.cache_clear)
+
+    def scan(self, name, *texts):
+        path = self.directory / name
+        path.write_bytes(make_pdf(*texts))
+        return str(path), [PageText(number, text, 0.0) for number, text in enumerate(texts, start=1)]
+
+    def calls(self):
+        return self.log.read_text().split() if self.log.exists() else []
+
+    def test_only_empty_pages_are_recognised(self):
+        path, pages = self.scan('scan.pdf', 'Text', '', ' ')
+        pages, recognised = ocr_empty_pages(path, pages)
+        self.assertEqual(recognised, 2)
+        self.assertEqual([p.text.strip() for p in pages], ['Text', 'Erkannter Text', 'Erkannter Text'])
+        # Graustufenbild als PGM (P5) über stdin
+        self.assertEqual(self.calls(), ['P5', 'P5'])
+
+    def test_cached_by_page_hash(self):
+        path, pages = self.scan('scan.pdf', 'Text', '')
+        ocr_empty_pages(path, pages)
+        self.assertEqual(ExtractionCacheEntry.objects.filter(backend=OCR_BACKEND).count(), 1)
+        # Dieselbe Seite in einer anderen PDF: aus dem Cache, Tesseract läuft nicht erneut
+        other, pages = self.scan('andere.pdf', 'Anderer Text', '')
+        pages, recognised = ocr_empty_pages(other, pages)
+        self.assertEqual(recognised, 1)
+        self.assertEqual(pages[1].text.strip(), 'Erkannter Text')
+        self.assertEqual(len(self.calls()), 1)
+
+    def test_failure_leaves_pages_empty(self):
+        Path(f'{self.log}.fail').touch()
+        path, pages = self.scan('scan.pdf', 'Text', '')
+        result, recognised = ocr_empty_pages(path, pages)
+        self.assertEqual((result, recognised), (pages, 0))
+        self.assertFalse(ExtractionCacheEntry.objects.exists())
+
+    def test_without_tesseract(self):
+        path, pages = self.scan('scan.pdf', '')
+        with self.settings(DOCUMENT_OCR_COMMAND=str(self.directory / 'fehlt')):
+            tesseract_version.cache_clear()
+            self.assertEqual(ocr_empty_pages(path, pages), (pages, 0))
+        self.assertEqual(self.calls(), [])
+
+
+@override_settings(
+    DOCUMENT_EXTRACTION_PARALLEL_MIN_PAGES=8, DOCUMENT_EXTRACTION_MAX_PAGES=0, DOCUMENT_EXTRACTION_MAX_RSS_MB=0,
+)
+class ParallelExtractionTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.texts = [f'Seite {number}' for number in range(1, 11)]
+        self.path = os.path.join(directory.name, 'lang.pdf')
+        with open(self.path, 'wb') as f:
+            f.write(make_pdf(*self.texts))
+        pool = mock.patch('documents.utils.ProcessPoolExecutor', wraps=ProcessPoolExecutor)
+        self.pool = pool.start()
+        self.addCleanup(pool.stop)
+
+    def test_page_ranges(self):
+        self.assertEqual(_page_ranges(10, 4), [(0, 3), (3, 6), (6, 8), (8, 10)])
+        self.assertEqual(_page_ranges(3, 8), [(0, 1), (1, 2), (2, 3)])
+        self.assertEqual(_page_ranges(5, 1), [(0, 5)])
+
+    def test_pages_in_order(self):
+        pages = extract_pdf_pages(self.path, workers=2, backend='pdfium')
+        self.pool.assert_called_once_with(max_workers=2)
+        self.assertEqual([(p.number, p.text) for p in pages], list(enumerate(self.texts, start=1)))
+
+    def test_small_documents_stay_serial(self):
+        with self.settings(DOCUMENT_EXTRACTION_PARALLEL_MIN_PAGES=11):
+            pages = extract_pdf_pages(self.path, workers=2, backend='pdfium')
+        self.pool.assert_not_called()
+        self.assertEqual(len(pages), 10)
+
+    def test_page_ceiling(self):
+        with self.settings(DOCUMENT_EXTRACTION_MAX_PAGES=9):
+            with self.assertRaises(ExtractionLimitExceeded):
+                extract_pdf_pages(self.path, workers=2, backend='pdfium')
+        self.pool.assert_not_called()
+
+    @skipUnless(current_rss(), "RSS ist auf diesem System nicht messbar")
+    def test_memory_ceiling_in_workers(self):
+        with self.settings(DOCUMENT_EXTRACTION_MAX_RSS_MB=1):
+            with self.assertRaises(ExtractionLimitExceeded):
+                extract_pdf_pages(self.path, workers=2, backend='pdfium')
+        self.pool.assert_called_once()
+
+
+class ExtractedTextTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.document = self.make_document('leer')
+        texts = [f'Seite {number}' for number in range(1, 13)]
+        full_text = store_pages(self.document, [PageText(n, text, 0) for n, text in enumerate(texts, start=1)])
+        Document.objects.filter(pk=self.document.pk).update(extracted_text=full_text, status=Document.STATUS_DONE)
+        self.client = APIClient()
+        self.client.force_authenticate(self.make_user('leser'))
+        self.url = reverse('document-get-extracted-text', args=[self.document.pk])
+
+    def numbers(self, **params):
+        data = self.client.get(self.url, params).json()
+        return [page['number'] for page in data['pages']], data['next_cursor']
+
+    def test_full_text_without_page_parameters(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data, {'status': 'done', 'extracted_text': ''.join(f'Seite {n}' for n in range(1, 13))})
+
+    def test_start_end(self):
+        data = self.client.get(self.url, {'start': 2, 'end': 4}).json()
+        self.assertEqual(data['page_count'], 12)
+        self.assertEqual(data['pages'][0], {'number': 2, 'text': 'Seite 2', 'char_count': 7})
+        self.assertEqual(self.numbers(start=2, end=4), ([2, 3, 4], 5))
+        self.assertEqual(self.numbers(start=10, end=20), ([10, 11, 12], None))
+
+    def test_cursor_and_limit(self):
+        self.assertEqual(self.numbers(limit=5), ([1, 2, 3, 4, 5], 6))
+        self.assertEqual(self.numbers(cursor=6, limit=5), ([6, 7, 8, 9, 10], 11))
+        self.assertEqual(self.numbers(cursor=11, limit=5), ([11, 12], None))
+        # Ohne limit: DEFAULT_PAGE_LIMIT Seiten
+        self.assertEqual(self.numbers(cursor=1), ([1, 2, 3, 4, 5], 6))
+
+    def test_invalid_parameters(self):
+        # Keine Zahl: Standardwert, kleiner 1: auf 1 angehoben
+        self.assertEqual(self.numbers(start='abc', end=2), ([1, 2], 3))
+        self.assertEqual(self.numbers(cursor=-3, limit=0), ([1], 2))
+        self.assertEqual(self.numbers(limit='viele'), ([1, 2, 3, 4, 5], 6))
+        # Ende vor Anfang: leere Seite
+        self.assertEqual(self.numbers(start=5, end=3), ([], None))
+        self.assertEqual(self.numbers(start=99), ([], None))
+
+    @mock.patch('documents.views.MAX_PAGE_LIMIT', 3)
+    def test_limit_is_capped(self):
+        self.assertEqual(self.numbers(limit=100), ([1, 2, 3], 4))
+        self.assertEqual(self.numbers(start=1, end=12), ([1, 2, 3], 4))
+
+
+class DocumentListTestCase(TestCase):
+    def setUp(self):
+        Document.objects.bulk_create(
+            Document(title=f'Tarif {n}', file=f'documents/{n}.pdf', extracted_text='x' * n, status=Document.STATUS_DONE)
+            for n in range(55)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(
+            username='leser', email='leser@example.com', password='pw',
+        ))
+
+    def test_list_omits_text_and_paginates(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse('document-list')).json()
+        self.assertEqual(data['count'], 55)
+        self.assertEqual(len(data['results']), 50)
+        self.assertIsNotNone(data['next'])
+        self.assertNotIn('extracted_text', data['results'][0])
+        self.assertEqual(set(data['results'][0]), {
+            'id', 'title', 'file', 'uploaded_at', 'text_length', 'page_count', 'status', 'insurance_company',
+            'tariff', 'version',
+        })
+        # Volltext wird für die Liste nicht einmal gelesen
+        self.assertFalse(any('"extracted_text"' in query['sql'] for query in queries.captured_queries))
+
+        data = self.client.get(reverse('document-list'), {'page': 2}).json()
+        self.assertEqual((len(data['results']), data['next']), (5, None))
+        data = self.client.get(reverse('document-list'), {'page_size': 500}).json()
+        self.assertEqual(len(data['results']), 55)
+
+    def test_detail_keeps_text(self):
+        document = Document.objects.get(title='Tarif 3')
+        data = self.client.get(reverse('document-detail', args=[document.pk])).json()
+        self.assertEqual(data['extracted_text'], 'xxx')
+
+    def test_backfilled_text_stats(self):
+        document = Document.objects.get(title='Tarif 7')
+        store_pages(document, [PageText(1, 'a', 0), PageText(2, 'b', 0)])
+        migration = importlib.import_module('documents.migrations.0008_document_text_stats')
+        migration.fill_text_stats(apps, None)
+        data = self.client.get(reverse('document-list'), {'page_size': 100}).json()
+        stats = {row['title']: (row['text_length'], row['page_count']) for row in data['results']}
+        self.assertEqual(stats['Tarif 7'], (7, 2))
+        self.assertEqual(stats['Tarif 0'], (0, 0))
+
+
+class ContentAddressedStorageTestCase(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = ContentAddressedStorage(location=directory.name)
+
+    def test_identical_uploads_share_one_file(self):
+        data = make_pdf('Tarif')
+        digest = hashlib.sha256(data).hexdigest()
+        first = self.storage.save('documents/Tarif.PDF', SimpleUploadedFile('Tarif.PDF', data))
+        self.assertEqual(first, f'documents/{digest[:2]}/{digest}.pdf')
+        self.assertEqual(content_hash_from_name(first), digest)
+
+        path = self.storage.path(first)
+        inode = os.stat(path).st_ino
+        with mock.patch.object(ContentAddressedStorage, '_save', wraps=self.storage._save) as write:
+            second = self.storage.save('documents/anders.pdf', SimpleUploadedFile('anders.pdf', data))
+        self.assertEqual(second, first)
+        write.assert_not_called()
+        self.assertEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [f'{digest}.pdf'])
+
+    def test_different_content_gets_its_own_file(self):
+        first = self.storage.save('documents/a.pdf', SimpleUploadedFile('a.pdf', make_pdf('A')))
+        second = self.storage.save('documents/a.pdf', SimpleUploadedFile('a.pdf', make_pdf('B')))
+        self.assertNotEqual(first, second)
+        self.assertTrue(self.storage.exists(first) and self.storage.exists(second))
@@ -1,13 +1,199 @@
-import pdfplumber
-
-
-def extract_pdf_text(file_path):
-    with pdfplumber.open(file_path) as pdf:
-        text = ""
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:  # Überprüfe, ob Text extrahiert wurde
-                text += page_text
-            else:
-                print(f"Kein Text auf Seite {pdf.pages.index(page) + 1}")
-    return text
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .extractors import AUTO, PageText, choose_backend, get_backend  # noqa: F401 (PageText re-export)
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionLimitExceeded(Exception):
+    """The PDF exceeds the configured page or memory ceiling for extraction."""
+
+
+def current_rss():
+    """Resident set size of this process in bytes (0 where it cannot be read)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _limits(max_pages, max_rss_mb):
+    if max_pages is None:
+        max_pages = getattr(settings, 'DOCUMENT_EXTRACTION_MAX_PAGES', 0)
+    if max_rss_mb is None:
+        max_rss_mb = getattr(settings, 'DOCUMENT_EXTRACTION_MAX_RSS_MB', 0)
+    return max_pages, max_rss_mb * 1024 * 1024
+
+
+def _check_page_count(file_path, page_count, max_pages):
+    if max_pages and page_count > max_pages:
+        raise ExtractionLimitExceeded(
+            f"{file_path}: {page_count} Seiten, erlaubt sind höchstens {max_pages}"
+        )
+
+
+def _iter_page_range(file_path, start, stop, backend, max_rss=0):
+    for page in get_backend(backend).iter_range(file_path, start, stop):
+        rss = current_rss()
+        if max_rss and rss > max_rss:
+            raise ExtractionLimitExceeded(
+                f"{file_path}: Speicherlimit überschritten auf Seite {page.number} "
+                f"({rss // (1024 * 1024)} MB > {max_rss // (1024 * 1024)} MB)"
+            )
+        yield page
+
+
+def _extract_page_range(file_path, start, stop, backend, max_rss=0):
+    # Läuft im Worker-Prozess: jeder Prozess öffnet die PDF selbst
+    return list(_iter_page_range(file_path, start, stop, backend, max_rss))
+
+
+def _page_ranges(page_count, parts):
+    """Split 0..page_count into at most `parts` contiguous ranges."""
+    parts = max(1, min(parts, page_count))
+    size, rest = divmod(page_count, parts)
+    ranges, start = [], 0
+    for i in range(parts):
+        stop = start + size + (1 if i < rest else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def extractor_version(backend):
+    return get_backend(backend).version()
+
+
+def extraction_workers():
+    """Configured size of the extraction process pool (1 = serial)."""
+    workers = getattr(settings, 'DOCUMENT_EXTRACTION_PROCESSES', 1)
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def iter_pdf_pages(file_path, backend=AUTO, max_pages=None, max_rss_mb=None):
+    """
+    Yield the text of every page, in page order, one page at a time.
+
+    Each page's parsed layout is released before the next one is read, so
+    only the current page's layout is held in memory. The worker paths
+    (`extract_pdf_pages` and its callers) still collect the page texts in
+    a list; plain text is small compared to the layout objects. Raises
+    `ExtractionLimitExceeded` up front when the PDF has more than
+    `max_pages` pages, and mid-stream as soon as the process RSS exceeds
+    `max_rss_mb` (both default to the settings, 0 = no limit).
+    """
+    backend = choose_backend(file_path, backend)
+    page_count = get_backend(backend).page_count(file_path)
+    yield from _stream_pages(file_path, backend, page_count, *_limits(max_pages, max_rss_mb))
+
+
+def _stream_pages(file_path, backend, page_count, max_pages, max_rss):
+    _check_page_count(file_path, page_count, max_pages)
+    for page in _iter_page_range(file_path, 0, page_count, backend, max_rss):
+        if not page.text:
+            logger.info(f"Kein Text auf Seite {page.number}")
+        yield page
+
+
+def extract_pdf_pages(file_path, workers=None, backend=AUTO):
+    """
+    Extract the text of every page, in page order.
+
+    `backend` names an extractor from `documents.extractors` ('auto' picks
+    one for this file). With more than one worker the page range is split
+    into contiguous chunks that are extracted in a process pool and
+    reassembled in order. Small documents are always extracted serially,
+    page by page. Page and memory ceilings apply in both modes.
+    """
+    backend = choose_backend(file_path, backend)
+    workers = workers or extraction_workers()
+    page_count = get_backend(backend).page_count(file_path)
+
+    max_pages, max_rss = _limits(None, None)
+    min_pages = getattr(settings, 'DOCUMENT_EXTRACTION_PARALLEL_MIN_PAGES', 8)
+    if workers <= 1 or page_count < min_pages:
+        return list(_stream_pages(file_path, backend, page_count, max_pages, max_rss))
+
+    _check_page_count(file_path, page_count, max_pages)
+    # Mehr Teilstücke als Prozesse, damit ungleich teure Seiten sich ausgleichen
+    ranges = _page_ranges(page_count, workers * 2)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = pool.map(_extract_page_range, [file_path] * len(ranges),
+                          [r[0] for r in ranges], [r[1] for r in ranges],
+                          [backend] * len(ranges), [max_rss] * len(ranges))
+        pages = [page for chunk in chunks for page in chunk]
+
+    for page in pages:
+        if not page.text:
+            logger.info(f"Kein Text auf Seite {page.number}")
+    return pages
+
+
+def extract_page_numbers(file_path, numbers, backend):
+    """
+    Extract only the given (1-based) pages, e.g. the changed pages of a new
+    document version. Consecutive pages are read as one range.
+    """
+    max_pages, max_rss = _limits(None, None)
+    _check_page_count(file_path, get_backend(backend).page_count(file_path), max_pages)
+    pages, numbers = [], sorted(numbers)
+    while numbers:
+        start = stop = numbers.pop(0)
+        while numbers and numbers[0] == stop + 1:
+            stop = numbers.pop(0)
+        pages.extend(_iter_page_range(file_path, start - 1, stop, backend, max_rss))
+    return pages
+
+
+def _digest_resources(digest, resources, seen) -> None:
+    xobjects = resources.get("/XObject") if resources else None
+    if not xobjects:
+        return
+    xobjects = xobjects.get_object()
+    for name in sorted(xobjects):
+        ref = xobjects[name]
+        key = getattr(ref, "idnum", None)
+        if key is not None and key in seen:
+            continue
+        seen.add(key)
+        xobject = ref.get_object()
+        if xobject.get("/Subtype") == "/Form":
+            # Formulare enthalten oft den eigentlichen Seitentext
+            digest.update(xobject.get_data())
+            _digest_resources(digest, xobject.get("/Resources"), seen)
+        else:
+            # Bilder: Rohdaten ohne Dekodierung, reicht zum Vergleich
+            digest.update(getattr(xobject, "_data", b"") or b"")
+
+
+def _page_hash(page) -> str:
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    # Nicht `if contents`: ein dekodierter Stream ohne Schlüssel ist ein leeres Dict und damit falsy
+    digest.update(contents.get_data() if contents is not None else b"")
+    resources = page.get("/Resources")
+    _digest_resources(digest, resources.get_object() if resources else None, set())
+    return digest.hexdigest()
+
+
+def page_hashes(file_path) -> list[str]:
+    """Content hash of every page, in page order ([] if the PDF cannot be parsed)."""
+    from PyPDF2 import PdfReader
+
+    try:
+        with open(file_path, "rb") as f:
+            return [_page_hash(page) for page in PdfReader(f).pages]
+    except Exception as e:
+        logger.warning(f"Seiten-Hashes für {file_path} fehlgeschlagen: {e}")
+        return []
+
+
+def extract_pdf_text(file_path, workers=None, backend=AUTO):
+    pages = extract_pdf_pages(file_path, workers=workers, backend=backend)
+    return "".join(page.text for page in pages)
@@ -0,0 +1,108 @@
+"""
+Cheap pre-validation of uploaded PDFs.
+
+Runs before anything is stored or queued: magic bytes, size, a pypdfium2
+open (catches corrupt files and files that need a password to open), page
+count and a text-layer probe on the first pages to spot image-only scans.
+All checks together take milliseconds, a failed pdfplumber extraction
+takes seconds. PDFs that are only permission-restricted (owner password,
+common for insurer documents) open with an empty password and are
+accepted.
+"""
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Innerhalb dieser ersten Bytes muss laut PDF-Spezifikation "%PDF-" stehen
+MAGIC_WINDOW = 1024
+
+
+@dataclass
+class PdfInfo:
+    page_count: int
+    encrypted: bool
+    has_text: bool
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _open_pdf(file):
+    import pypdfium2
+
+    if hasattr(file, 'temporary_file_path'):
+        # Große Uploads liegen bereits als Datei vor
+        return pypdfium2.PdfDocument(file.temporary_file_path())
+    # pdfium liest über seek/readinto nur die benötigten Teile, ohne die Datei zu kopieren
+    file.seek(0)
+    return pypdfium2.PdfDocument(getattr(file, 'file', None) or file)
+
+
+def sniff_pdf(file) -> PdfInfo:
+    """Inspect an uploaded file; raises ValidationError if it is not a usable PDF."""
+    import pypdfium2
+    import pypdfium2.raw as pdfium_c
+
+    max_bytes = _setting('UPLOAD_MAX_BYTES', 200 * 1024 * 1024)
+    if file.size is not None and file.size > max_bytes:
+        raise ValidationError(f"Datei zu groß ({file.size // (1024 * 1024)} MB, erlaubt sind {max_bytes // (1024 * 1024)} MB).")
+
+    file.seek(0)
+    head = file.read(MAGIC_WINDOW)
+    file.seek(0)
+    if b'%PDF-' not in head:
+        raise ValidationError("Keine PDF-Datei.")
+
+    try:
+        pdf = _open_pdf(file)
+    except pypdfium2.PdfiumError as e:
+        if 'password' in str(e).lower():
+            raise ValidationError("PDF ist passwortgeschützt.")
+        raise ValidationError("PDF ist beschädigt oder unlesbar.")
+    finally:
+        file.seek(0)
+
+    try:
+        page_count = len(pdf)
+        max_pages = _setting('DOCUMENT_EXTRACTION_MAX_PAGES', 0)
+        if max_pages and page_count > max_pages:
+            raise ValidationError(f"PDF hat {page_count} Seiten, erlaubt sind höchstens {max_pages}.")
+        if not page_count:
+            raise ValidationError("PDF enthält keine Seiten.")
+
+        encrypted = pdfium_c.FPDF_GetSecurityHandlerRevision(pdf.raw) != -1
+        has_text = False
+        for index in range(min(_setting('DOCUMENT_EXTRACTOR_SAMPLE_PAGES', 5), page_count)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            has_text = textpage.count_chars() > 0
+            textpage.close()
+            page.close()
+            if has_text:
+                break
+    finally:
+        pdf.close()
+    return PdfInfo(page_count=page_count, encrypted=encrypted, has_text=has_text)
+
+
+def validate_pdf(file):
+    """Model field validator for uploaded PDFs (Document.file, UserContract.pdf_file)."""
+    if getattr(file, '_committed', False):
+        # Bereits gespeicherte Datei (z. B. unverändert im Admin): wurde beim Upload geprüft
+        return
+    info = sniff_pdf(file)
+    if info.encrypted:
+        # Nur Rechteschutz (Dateien mit Benutzerpasswort scheitern schon beim Öffnen): alle Extraktoren lesen sie
+        logger.info(f"PDF mit Rechteschutz angenommen: {getattr(file, 'name', '')}")
+    if not info.has_text and _setting('DOCUMENT_REJECT_IMAGE_ONLY', True):
+        from .services.ocr import ocr_available
+
+        # Mit Tesseract werden Scans per OCR gelesen
+        if ocr_available():
+            return
+        raise ValidationError("PDF enthält keinen Text (reiner Scan); bitte eine Text-PDF hochladen.")
@@ -1,27 +1,409 @@
-from rest_framework import viewsets
+import json
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework import mixins, viewsets
 from rest_framework.decorators import action
-from .utils import extract_pdf_text
-from .models import Document
-from .serializers import DocumentSerializer
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from users.models import UserContract
+from users.serializers import UserContractSerializer
+from .models import Document, DocumentSection, UploadSession
+from .serializers import (
+    DocumentListSerializer, DocumentPageSerializer, DocumentSectionSerializer, DocumentSectionSummarySerializer,
+    DocumentSerializer, DocumentVersionSerializer, UploadSessionSerializer,
+)
+from .services import export, media, uploads
+from .services.pages import page_window
+from .services.ingest import ingest, iter_uploads
+from .services.queue import schedule_extraction, schedule_extractions
+from .services.search import search as fulltext_search
+from .services.semantic import SemanticIndex
+from .services.versions import add_version
+from .validators import validate_pdf
 # Create your views here.
 
+# Standard- und Höchstzahl an Seiten pro Antwort von get_extracted_text
+DEFAULT_PAGE_LIMIT = 5
+MAX_PAGE_LIMIT = 50
+
+# Höchstzahl an Treffern der Volltextsuche
+MAX_SEARCH_RESULTS = 50
+
+
+def _int_param(request, name, default, minimum=1, maximum=None):
+    try:
+        value = int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    value = max(minimum, value)
+    return min(value, maximum) if maximum else value
+
+
+class DocumentPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
 
 class DocumentViewSet(viewsets.ModelViewSet):
     queryset = Document.objects.all()
     serializer_class = DocumentSerializer
+    pagination_class = DocumentPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Volltext nicht aus der Datenbank laden, die Liste zeigt nur Metadaten
+            return queryset.defer('extracted_text').order_by('-uploaded_at', '-id')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return DocumentListSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
-        # Extrahiere den Text aus der PDF, wenn ein neues Dokument erstellt wird
-        file = serializer.validated_data.get('file')
-        # Extrahiere den Text der PDF-Datei
-        extracted_text = extract_pdf_text(file.path)
+        # Dokument sofort speichern; bei einem Cache-Treffer ist der Text sofort
+        # da, sonst übernimmt ein Hintergrund-Worker (manage.py process_documents)
+        document = serializer.save(status=Document.STATUS_PENDING)
+        schedule_extraction(document)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_ingest(self, request):
+        # Viele PDFs (oder ZIP-Archive) auf einmal: Duplikate überspringen, Rest in die Warteschlange
+        files = request.FILES.getlist('files')
+        if not files:
+            return Response({'error': 'Keine Dateien im Feld files.'}, status=400)
+
+        serializer = DocumentSerializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        options = {
+            name: serializer.validated_data[name]
+            for name in ('insurance_company', 'tariff', 'extractor') if name in serializer.validated_data
+        }
+
+        started = time.perf_counter()
+        items, documents = ingest(iter_uploads(files), **options)
+        queued = schedule_extractions(documents)
+        elapsed = time.perf_counter() - started
+        return Response({
+            'files': [vars(item) for item in items],
+            'created': len(documents),
+            'queued': queued,
+            'seconds': round(elapsed, 3),
+            'files_per_second': round(len(items) / elapsed, 1) if elapsed else None,
+        }, status=201)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser], url_path='export')
+    def export_texts(self, request):
+        # NDJSON-Export aller Texte, zeilenweise gestreamt: ?source=documents|contracts&gzip=1
+        source = request.query_params.get('source')
+        if source and source not in export.SOURCES:
+            return Response({'error': f"Unbekannte Quelle: {source}"}, status=400)
+        stream = export.iter_ndjson([source] if source else export.SOURCES)
+        filename = f"{source or 'texts'}.ndjson"
+        if request.query_params.get('gzip') in ('1', 'true'):
+            response = StreamingHttpResponse(export.gzip_stream(stream), content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(stream, content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
-        # Speichere das Dokument mit dem extrahierten Text
-        serializer.save(extracted_text=extracted_text)
+    @action(detail=True, methods=['get', 'post'])
+    def versions(self, request, pk=None):
+        # GET: frühere Versionen; POST mit file: neue Version, nur geänderte Seiten werden neu extrahiert
+        document = self.get_object()
+        if request.method == 'GET':
+            return Response({
+                'version': document.version,
+                'versions': DocumentVersionSerializer(document.versions.all(), many=True).data,
+            })
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Keine Datei im Feld file.'}, status=400)
+        try:
+            validate_pdf(upload)
+        except ValidationError as e:
+            return Response({'file': e.messages}, status=400)
+        if not add_version(document, upload):
+            return Response(DocumentSerializer(document).data)
+        schedule_extraction(document)
+        return Response(DocumentSerializer(document).data, status=201)
 
     @action(detail=True, methods=['get'])
     def get_extracted_text(self, request, pk=None):
         # Holen des Dokuments anhand der ID (primary key)
         document = self.get_object()
-        # Gebe den extrahierten Text des Dokuments zurück
-        return Response({'extracted_text': document.extracted_text})
+
+        # Ohne Seitenparameter: vollständiger Text wie bisher
+        params = request.query_params
+        if not any(name in params for name in ('start', 'end', 'cursor', 'limit')):
+            return Response({'status': document.status, 'extracted_text': document.extracted_text})
+
+        # Seitenbereich: ?start=1&end=3 oder fortlaufend ?cursor=<next_cursor>&limit=5
+        start = _int_param(request, 'cursor', _int_param(request, 'start', 1))
+        if 'end' in params:
+            limit = max(0, min(_int_param(request, 'end', start) - start + 1, MAX_PAGE_LIMIT))
+        else:
+            limit = _int_param(request, 'limit', DEFAULT_PAGE_LIMIT, maximum=MAX_PAGE_LIMIT)
+
+        pages, page_count = page_window(document, start, limit)
+        next_cursor = pages[-1].number + 1 if pages and pages[-1].number < page_count else None
+        return Response({
+            'status': document.status,
+            'page_count': page_count,
+            'pages': DocumentPageSerializer(pages, many=True).data,
+            'next_cursor': next_cursor,
+        })
+
+    @action(detail=True, methods=['get'])
+    def sections(self, request, pk=None):
+        # Ohne ?kind= nur die Gliederung, mit ?kind=zahn die Abschnitte samt Text
+        document = self.get_object()
+        sections = DocumentSection.objects.filter(document=document)
+        kind = request.query_params.get('kind')
+        if not kind:
+            sections = sections.defer('text')
+            return Response({
+                'status': document.status,
+                'sections': DocumentSectionSummarySerializer(sections, many=True).data,
+            })
+
+        if kind not in dict(DocumentSection.KIND_CHOICES):
+            return Response({'error': f"Unbekannte Abschnittsart: {kind}"}, status=400)
+        return Response({
+            'status': document.status,
+            'sections': DocumentSectionSerializer(sections.filter(kind=kind), many=True).data,
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def search(self, request):
+        # Volltextsuche (deutsch) über Dokumentseiten und eigene Verträge
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Parameter q fehlt.'}, status=400)
+
+        limit = _int_param(request, 'limit', 20, maximum=MAX_SEARCH_RESULTS)
+        user_id = None if request.user.is_staff else request.user.id
+
+        started = time.perf_counter()
+        hits = fulltext_search(query, limit=limit, user_id=user_id)
+        return Response({
+            'query': query,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+            'results': [
+                {
+                    'source': hit.source,
+                    'id': hit.source_id,
+                    'page': hit.segment if hit.source == 'document' else None,
+                    'title': hit.title,
+                    'rank': hit.rank,
+                    'snippet': hit.snippet,
+                }
+                for hit in hits
+            ],
+        })
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def semantic_search(self, request):
+        # Semantische Suche über Tarifdokumente, optional je Versicherer/Tarif
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Parameter q fehlt.'}, status=400)
+
+        limit = _int_param(request, 'limit', 10, maximum=MAX_SEARCH_RESULTS)
+        document_ids = None
+        company = request.query_params.get('company')
+        tariff = request.query_params.get('tariff')
+        if company or tariff:
+            documents = Document.objects.all()
+            if company:
+                documents = documents.filter(insurance_company_id=company)
+            if tariff:
+                documents = documents.filter(tariff_id=tariff)
+            document_ids = list(documents.values_list('pk', flat=True))
+
+        started = time.perf_counter()
+        hits = SemanticIndex().search(query, limit=limit, document_ids=document_ids)
+        return Response({
+            'query': query,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+            'results': [
+                {'id': hit.document_id, 'page': hit.page, 'score': hit.score, 'text': hit.text}
+                for hit in hits
+            ],
+        })
+
+
+class MediaFileView(APIView):
+    """Serve uploaded PDFs with Range, ETag and conditional GET support."""
+    permission_classes = [IsAuthenticated]
+
+    def _with_headers(self, response, media_file):
+        response['ETag'] = media_file.etag
+        response['Last-Modified'] = media_file.last_modified
+        response['Cache-Control'] = media_file.cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    def get(self, request, path):
+        media_file = media.resolve(path, request.user)
+
+        # If-None-Match / If-Modified-Since: 304 ohne Dateizugriff
+        conditional = get_conditional_response(
+            request, etag=media_file.etag, last_modified=int(media_file.mtime)
+        )
+        if conditional is not None:
+            return self._with_headers(conditional, media_file)
+
+        # Byte-Transfer (inkl. Range) übernimmt der vorgeschaltete Proxy
+        offload = media.offload_headers(media_file)
+        if offload:
+            response = HttpResponse(content_type=media_file.content_type, headers=offload)
+            return self._with_headers(response, media_file)
+
+        byte_range = None
+        if media.if_range_matches(request.headers.get('If-Range', ''), media_file):
+            try:
+                byte_range = media.parse_range(request.headers.get('Range', ''), media_file.size)
+            except media.RangeNotSatisfiable:
+                response = HttpResponse(status=416, headers={'Content-Range': f"bytes */{media_file.size}"})
+                return self._with_headers(response, media_file)
+
+        if byte_range is None:
+            response = FileResponse(open(media_file.path, 'rb'), content_type=media_file.content_type)
+            return self._with_headers(response, media_file)
+
+        first, last = byte_range
+        response = StreamingHttpResponse(
+            media.iter_range(media_file.path, first, last),
+            status=206,
+            content_type=media_file.content_type,
+            headers={
+                'Content-Range': f"bytes {first}-{last}/{media_file.size}",
+                'Content-Length': str(last - first + 1),
+            },
+        )
+        return self._with_headers(response, media_file)
+
+
+class UploadSessionViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Chunked, resumable upload of large PDFs.
+
+    POST uploads/ starts a session, PUT uploads/{id}/ sends one chunk
+    (Content-Range header, raw bytes as body), GET uploads/{id}/ reports
+    the offset to resume from, POST uploads/{id}/complete/ verifies the
+    SHA-256 and creates the document or user contract.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def _error(self, error):
+        return Response({'error': str(error), 'offset': error.offset}, status=error.status)
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # Verträge hochladen dürfen wie beim UserContractUploadView nur Admins
+        if data.get('target') == UploadSession.TARGET_CONTRACT and not request.user.is_staff:
+            return Response({'error': 'Nur Administratoren dürfen Verträge hochladen.'}, status=403)
+        try:
+            session = uploads.open_session(
+                request.user, data.get('target', UploadSession.TARGET_DOCUMENT), data['filename'],
+                data['size'], data.get('sha256', ''), data.get('metadata'),
+            )
+        except uploads.UploadError as e:
+            return self._error(e)
+        return Response(self.get_serializer(session).data, status=201)
+
+    def update(self, request, pk=None):
+        session = self.get_object()
+        try:
+            offset, length = uploads.parse_content_range(request.headers.get('Content-Range'), session)
+            try:
+                content_length = int(request.headers.get('Content-Length') or 0)
+            except ValueError:
+                raise uploads.UploadError('Ungültiger Content-Length-Header.', session.received)
+            if content_length != length:
+                raise uploads.UploadError('Content-Length passt nicht zur Content-Range.', session.received)
+            # Body direkt aus dem Request-Stream lesen, ohne ihn vollständig zu puffern
+            new_offset = uploads.write_chunk(session, request.stream, offset, length)
+        except uploads.UploadError as e:
+            return self._error(e)
+        return Response({'offset': new_offset, 'complete': new_offset == session.size})
+
+    def destroy(self, request, pk=None):
+        uploads.discard(self.get_object())
+        return Response(status=204)
+
+    def _request_metadata(self, request):
+        # Multipart-Formulare senden metadata als JSON-String
+        metadata = request.data.get('metadata') or {}
+        if isinstance(metadata, str):
+            try:
+                metadata = json.loads(metadata)
+            except ValueError:
+                return None
+        return metadata if isinstance(metadata, dict) else None
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        metadata = self._request_metadata(request)
+        if metadata is None:
+            return Response({'error': 'metadata muss ein JSON-Objekt sein.'}, status=400)
+
+        with transaction.atomic():
+            # Parallele Abschlüsse warten auf die Sperre und sehen danach "complete"
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if session.status == UploadSession.STATUS_COMPLETE:
+                # Wiederholter Abschluss (Antwort ging verloren): gleiches Ergebnis melden
+                return Response({'target': session.target, 'id': session.metadata.get('result_id')})
+            try:
+                path = uploads.verify(session, request.data.get('sha256', ''))
+            except uploads.UploadError as e:
+                return self._error(e)
+
+            data = {**session.metadata, **metadata}
+            with open(path, 'rb') as f:
+                upload = File(f, name=session.filename)
+                if session.target == UploadSession.TARGET_DOCUMENT:
+                    result = self._create_document({**data, 'file': upload})
+                else:
+                    result = self._create_contract({**data, 'pdf_file': upload})
+
+            session.status = UploadSession.STATUS_COMPLETE
+            session.metadata = {**session.metadata, 'result_id': result['id']}
+            session.save(update_fields=['status', 'metadata', 'updated_at'])
+        path.unlink()
+        return Response({'target': session.target, **result}, status=201)
+
+    def _create_document(self, data):
+        # Gleicher Weg wie DocumentViewSet.perform_create
+        serializer = DocumentSerializer(data=data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        document = serializer.save(status=Document.STATUS_PENDING)
+        schedule_extraction(document)
+        return {'id': document.pk, 'status': document.status}
+
+    def _create_contract(self, data):
+        contract = UserContract.objects.filter(user_id=data.get('user')).first()
+        serializer = UserContractSerializer(contract, data=data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        # Neues PDF: alter Text ist ungültig, backfill_contract_text füllt ihn neu
+        contract = serializer.save(text_content='')
+        return {'id': contract.pk}
@@ -60,6 +60,19 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/contracts/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'contracts')
 
+# Chunked uploads (documents/services/uploads.py): temporary files, limits
+# and how long an inactive upload session is kept
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR", os.path.join(BASE_DIR, 'upload_sessions'))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_CHUNK_MAX_BYTES = int(os.getenv("UPLOAD_CHUNK_MAX_BYTES", str(8 * 1024 * 1024)))
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+
+# Let the front proxy send media bytes after Django checked access:
+# '' (Django streams the file), 'x-accel' (nginx) or 'x-sendfile' (Apache)
+MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "")
+# Internal nginx location that maps to MEDIA_ROOT (X-Accel-Redirect mode)
+MEDIA_OFFLOAD_PREFIX = os.getenv("MEDIA_OFFLOAD_PREFIX", "/protected-media/")
+
 
 # ------------------------------------------------------------------------------
 # Custom user model
@@ -148,7 +161,8 @@ tmpPostgres = urlparse(os.getenv("DATABASE_URL"))
 DATABASES = {
     'default': dj_database_url.config(
         default=os.environ.get("DATABASE_URL"),
-        conn_max_age=600,
+        # Persistent connections; 0 under ASGI (sync_to_async threads would keep them open)
+        conn_max_age=int(os.getenv("CONN_MAX_AGE", "600")),
         ssl_require='require'  # Required for Neon / managed Postgres
     )
 }
@@ -212,6 +226,69 @@ FRONTEND_DOMAIN = os.getenv("FRONTEND_DOMAIN", "")
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 
+# ------------------------------------------------------------------------------
+# Document extraction queue (processed by `manage.py process_documents`)
+# ------------------------------------------------------------------------------
+
+# Attempts per job before the document is marked as failed
+DOCUMENT_EXTRACTION_MAX_ATTEMPTS = int(os.getenv("DOCUMENT_EXTRACTION_MAX_ATTEMPTS", "3"))
+
+# Base delay for exponential retry backoff (30s, 60s, 120s, ...)
+DOCUMENT_EXTRACTION_RETRY_BACKOFF_SECONDS = int(os.getenv("DOCUMENT_EXTRACTION_RETRY_BACKOFF_SECONDS", "30"))
+
+# Jobs locked longer than this are considered abandoned and requeued
+DOCUMENT_EXTRACTION_LEASE_SECONDS = int(os.getenv("DOCUMENT_EXTRACTION_LEASE_SECONDS", "600"))
+
+# Process pool size for page-parallel extraction (1 = serial, 0 = all CPU cores)
+DOCUMENT_EXTRACTION_PROCESSES = int(os.getenv("DOCUMENT_EXTRACTION_PROCESSES", "1"))
+
+# Documents with fewer pages are always extracted serially
+DOCUMENT_EXTRACTION_PARALLEL_MIN_PAGES = int(os.getenv("DOCUMENT_EXTRACTION_PARALLEL_MIN_PAGES", "8"))
+
+# Ceilings for a single extraction (0 = unlimited): PDFs with more pages are
+# rejected up front, and extraction aborts once the process RSS exceeds the limit
+DOCUMENT_EXTRACTION_MAX_PAGES = int(os.getenv("DOCUMENT_EXTRACTION_MAX_PAGES", "2000"))
+DOCUMENT_EXTRACTION_MAX_RSS_MB = int(os.getenv("DOCUMENT_EXTRACTION_MAX_RSS_MB", "0"))
+
+# Upper bound for cached extraction results (LRU eviction beyond this size)
+DOCUMENT_EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_EXTRACTION_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Reject uploads whose first pages have no text layer (image-only scans);
+# only applies while OCR is not available
+DOCUMENT_REJECT_IMAGE_ONLY = os.getenv("DOCUMENT_REJECT_IMAGE_ONLY", "True") == "True"
+
+# Extractor auto-selection: pages sampled per PDF, and the average number of
+# vector paths per page above which a PDF counts as table-heavy (pdfplumber)
+DOCUMENT_EXTRACTOR_SAMPLE_PAGES = int(os.getenv("DOCUMENT_EXTRACTOR_SAMPLE_PAGES", "5"))
+DOCUMENT_EXTRACTOR_TABLE_PATHS_PER_PAGE = int(os.getenv("DOCUMENT_EXTRACTOR_TABLE_PATHS_PER_PAGE", "100"))
+
+# OCR fallback for pages without text: local Tesseract, pages rendered at
+# DOCUMENT_OCR_DPI and recognised in a pool of DOCUMENT_OCR_WORKERS
+# processes (0 = one per CPU)
+DOCUMENT_OCR_ENABLED = os.getenv("DOCUMENT_OCR_ENABLED", "True") == "True"
+DOCUMENT_OCR_COMMAND = os.getenv("DOCUMENT_OCR_COMMAND", "tesseract")
+DOCUMENT_OCR_LANGUAGE = os.getenv("DOCUMENT_OCR_LANGUAGE", "deu")
+DOCUMENT_OCR_DPI = int(os.getenv("DOCUMENT_OCR_DPI", "300"))
+DOCUMENT_OCR_WORKERS = int(os.getenv("DOCUMENT_OCR_WORKERS", "0"))
+DOCUMENT_OCR_TIMEOUT_SECONDS = int(os.getenv("DOCUMENT_OCR_TIMEOUT_SECONDS", "120"))
+
+
+# ------------------------------------------------------------------------------
+# Semantic search (built by `manage.py build_semantic_index`)
+# ------------------------------------------------------------------------------
+
+# Directory holding the float16 vector file, chunk rows and manifest
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", os.path.join(BASE_DIR, 'semantic_index'))
+
+# Multilingual sentence-transformers model (runs on CPU)
+SEMANTIC_MODEL_NAME = os.getenv("SEMANTIC_MODEL_NAME", "paraphrase-multilingual-MiniLM-L12-v2")
+
+# Embedding batch size and chunk size / overlap in characters
+SEMANTIC_BATCH_SIZE = int(os.getenv("SEMANTIC_BATCH_SIZE", "32"))
+SEMANTIC_CHUNK_CHARS = int(os.getenv("SEMANTIC_CHUNK_CHARS", "800"))
+SEMANTIC_CHUNK_OVERLAP = int(os.getenv("SEMANTIC_CHUNK_OVERLAP", "120"))
+
+
 # ------------------------------------------------------------------------------
 # CSRF & CORS configuration
 # ------------------------------------------------------------------------------
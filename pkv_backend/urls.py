@@ -17,11 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from documents.views import MediaFileView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api', include('documents.urls')),
     path('voiceflow/', include('voiceflow.urls')),
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Uploaded PDFs: authenticated, with Range/ETag support (replaces static())
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", MediaFileView.as_view(), name='media'),
+]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-17 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_pdf_upload_validation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='voiceflow_variables_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='voiceflow_variables_pushed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from documents.storage import ContentAddressedStorage, commit_content_addressed
+from documents.validators import validate_pdf
+
 class InsuranceCompany(models.Model):
     name = models.CharField(max_length=100)
 
@@ -61,6 +64,10 @@ class CustomUser(AbstractUser):
 
     profile_completed = models.BooleanField(default=False)
 
+    # Fingerprint of the variables last pushed to Voiceflow (see voiceflow.services.variable_fingerprint)
+    voiceflow_variables_hash = models.CharField(max_length=64, blank=True)
+    voiceflow_variables_pushed_at = models.DateTimeField(null=True, blank=True)
+
     REQUIRED_FIELDS = ['email', 'first_name', 'last_name',
                        'phone', 'street', 'postal_code', 'city']
 
@@ -70,9 +77,15 @@ class UserContract(models.Model):
         on_delete=models.CASCADE,
         related_name='contract'
     )
-    pdf_file = models.FileField(upload_to='')
+    pdf_file = models.FileField(upload_to='', storage=ContentAddressedStorage(), validators=[validate_pdf])
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     text_content = models.TextField(blank=True)
 
+    def save(self, *args, **kwargs):
+        # Store the PDF by content hash before the row is written
+        self.content_hash = commit_content_addressed(self.pdf_file) or self.content_hash
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Contract for {self.user.username}" 
     
@@ -20,6 +20,7 @@ from django.apps import apps
 import pdfplumber
 import logging
 from users.services.mail import send_contact_mail
+from voiceflow.services.variable_fingerprint import forget_variables
 from django.shortcuts import render
 
 # Module-level logger for error tracking and operational visibility
@@ -253,6 +254,11 @@ class CompleteProfileView(generics.UpdateAPIView):
     def get_object(self):
         return self.request.user
 
+    def perform_update(self, serializer):
+        serializer.save()
+        # Profile changed: push the chatbot variables on the next launch
+        forget_variables(self.request.user.id)
+
 
 class InsuranceSelectionView(APIView):
     """
@@ -292,6 +298,8 @@ class InsuranceSelectionView(APIView):
         user.additional_tariffs.set(additional_tariffs)
         user.profile_completed = True
         user.save()
+        # Profile changed: push the chatbot variables on the next launch
+        forget_variables(user.id)
 
         return Response({
             "message": "Insurance selection saved",
@@ -326,6 +334,8 @@ class MyTariffView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        # Profile changed: push the chatbot variables on the next launch
+        forget_variables(user.id)
         return Response(serializer.data)
 
 
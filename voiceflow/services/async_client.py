@@ -0,0 +1,93 @@
+"""
+Async Voiceflow API client for the ASGI chatbot endpoint.
+
+Same calls as `voiceflow_client`, on a shared `httpx.AsyncClient`: an
+in-flight turn only holds a socket, not a thread, so one ASGI worker can
+wait on hundreds of slow LLM answers at once. Calls run under the shared
+circuit breaker and the async bulkhead of `resilience`.
+"""
+import asyncio
+import logging
+import weakref
+
+import httpx
+from decouple import config
+
+from .resilience import UpstreamUnavailable, async_guard
+from .voiceflow_client import (
+    BASE_URL, CONNECT_TIMEOUT, MAX_RETRIES, READ_TIMEOUT, RETRY_BACKOFF, _headers,
+)
+
+logger = logging.getLogger(__name__)
+
+# Concurrent upstream connections per worker process, and how many stay open idle
+ASYNC_MAX_CONNECTIONS = config("VOICEFLOW_ASYNC_MAX_CONNECTIONS", default=200, cast=int)
+ASYNC_KEEPALIVE_CONNECTIONS = config("VOICEFLOW_ASYNC_KEEPALIVE_CONNECTIONS", default=20, cast=int)
+
+RETRY_STATUS = (429, 502, 503, 504)
+
+# One client per event loop: httpx connections belong to the loop that opened them
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            # Connection errors happen before anything is sent: safe to retry for every method
+            transport=httpx.AsyncHTTPTransport(
+                retries=MAX_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=ASYNC_MAX_CONNECTIONS,
+                    max_keepalive_connections=ASYNC_KEEPALIVE_CONNECTIONS,
+                ),
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def _request(method: str, url: str, headers: dict, payload: dict = None) -> httpx.Response:
+    """Send a request; DELETE/PATCH are retried with backoff on 429/5xx and read errors."""
+    retries = MAX_RETRIES if method in ("DELETE", "PATCH") else 0
+    with async_guard.call() as call:
+        for attempt in range(retries + 1):
+            try:
+                response = await get_client().request(method, url, json=payload, headers=headers)
+            except (httpx.ReadError, httpx.ReadTimeout, httpx.RemoteProtocolError):
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt == retries:
+                    call.finish(response.status_code)
+                    return response
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+
+async def avf_reset(api_key: str, user_id: str) -> bool:
+    """Reset user conversation state. Returns True on success."""
+    try:
+        await _request("DELETE", f"{BASE_URL}/state/user/{user_id}", _headers(api_key))
+        return True
+    except (httpx.HTTPError, UpstreamUnavailable) as e:
+        logger.warning(f"Reset failed for user {user_id}: {e}")
+        return False
+
+
+async def avf_interact(api_key: str, version_id: str, user_id: str, payload: dict) -> list:
+    """Send interaction to Voiceflow Agent and return trace list."""
+    url = f"{BASE_URL}/state/user/{user_id}/interact"
+    response = await _request("POST", url, _headers(api_key, version_id), payload)
+    response.raise_for_status()
+    return response.json()
+
+
+async def avf_set_variables(api_key: str, version_id: str, user_id: str, variables: dict) -> dict:
+    """Set session variables for the user."""
+    url = f"{BASE_URL}/state/user/{user_id}/variables"
+    response = await _request("PATCH", url, _headers(api_key, version_id), variables)
+    response.raise_for_status()
+    return response.json()
@@ -0,0 +1,216 @@
+"""
+Circuit breaker and bulkhead around the Voiceflow upstream.
+
+The breaker watches the last calls of this process. It opens when too
+many of them failed (error, 429/5xx) or were slow; while it is open,
+calls are rejected at once instead of waiting for the timeout. After
+VOICEFLOW_BREAKER_OPEN_SECONDS it lets a few probe calls through
+(half-open): a successful probe closes it, a failed one opens it again.
+
+The bulkhead caps the concurrent Voiceflow calls per process, so a slow
+upstream can hold at most that many worker threads and the rest keep
+serving the other endpoints. Sync and async clients have separate
+bulkheads but share the breaker.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Failure rate (errors + slow calls) over the last WINDOW calls that opens the breaker
+BREAKER_WINDOW = config("VOICEFLOW_BREAKER_WINDOW", default=20, cast=int)
+BREAKER_MIN_CALLS = config("VOICEFLOW_BREAKER_MIN_CALLS", default=5, cast=int)
+BREAKER_FAILURE_RATE = config("VOICEFLOW_BREAKER_FAILURE_RATE", default=0.5, cast=float)
+# Calls slower than this count as failures (time to the response headers)
+BREAKER_SLOW_CALL_SECONDS = config("VOICEFLOW_BREAKER_SLOW_CALL_SECONDS", default=20, cast=float)
+BREAKER_OPEN_SECONDS = config("VOICEFLOW_BREAKER_OPEN_SECONDS", default=30, cast=float)
+BREAKER_HALF_OPEN_PROBES = config("VOICEFLOW_BREAKER_HALF_OPEN_PROBES", default=1, cast=int)
+
+# Below gunicorn --threads, so one thread per worker stays free for other endpoints
+MAX_CONCURRENT = config("VOICEFLOW_MAX_CONCURRENT", default=3, cast=int)
+# Below VOICEFLOW_ASYNC_MAX_CONNECTIONS
+ASYNC_MAX_CONCURRENT = config("VOICEFLOW_ASYNC_MAX_CONCURRENT", default=150, cast=int)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Call rejected without contacting Voiceflow."""
+
+    def __init__(self, message: str, retry_after: float = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_failure(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+class CircuitBreaker:
+    """Failure-rate and latency based circuit breaker (per process)."""
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS, failure_rate=BREAKER_FAILURE_RATE,
+                 slow_call_seconds=BREAKER_SLOW_CALL_SECONDS, open_seconds=BREAKER_OPEN_SECONDS,
+                 half_open_probes=BREAKER_HALF_OPEN_PROBES):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._calls = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.trips = 0
+        self.rejected = 0
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state, self._probes = HALF_OPEN, 0
+            logger.info("Voiceflow circuit half-open, probing upstream")
+        return self._state
+
+    def _retry_after(self) -> float:
+        return max(self.open_seconds - (time.monotonic() - self._opened_at), 0)
+
+    def _open(self) -> None:
+        self._state, self._opened_at = OPEN, time.monotonic()
+        self._calls.clear()
+        self.trips += 1
+
+    def before_call(self) -> None:
+        """Raise UpstreamUnavailable if the call must not go through."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+            self.rejected += 1
+            retry_after = self._retry_after() if state == OPEN else self.open_seconds
+        raise UpstreamUnavailable("Voiceflow circuit is open", retry_after)
+
+    def record(self, ok: bool, seconds: float) -> None:
+        failed = not ok or seconds >= self.slow_call_seconds
+        with self._lock:
+            state = self._current_state()
+            if state == HALF_OPEN:
+                if failed:
+                    self._open()
+                    logger.warning("Voiceflow probe failed, circuit open again")
+                else:
+                    self._state = CLOSED
+                    self._calls.clear()
+                    logger.info("Voiceflow circuit closed")
+                return
+            if state == OPEN:
+                # Call started before the breaker opened
+                return
+            self._calls.append(failed)
+            if len(self._calls) >= self.min_calls:
+                rate = sum(self._calls) / len(self._calls)
+                if rate >= self.failure_rate:
+                    self._open()
+                    logger.warning(f"Voiceflow circuit open: {rate:.0%} of the last calls failed or were slow")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._calls)
+            return {
+                "state": state,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "failure_rate": round(sum(self._calls) / calls, 3) if calls else 0.0,
+                "window_calls": calls,
+                "retry_after": round(self._retry_after(), 1) if state == OPEN else 0,
+            }
+
+
+class Bulkhead:
+    """Concurrency cap that rejects instead of queueing (usable from threads and coroutines)."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def snapshot(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "rejected": self.rejected}
+
+
+class _Call:
+    """Outcome of one guarded call; `finish` may be called early (streams)."""
+
+    def __init__(self, breaker: CircuitBreaker):
+        self._breaker = breaker
+        self._started = time.perf_counter()
+        self._finished = False
+
+    def finish(self, status_code: int = None, ok: bool = None) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        if ok is None:
+            ok = status_code is None or not is_failure(status_code)
+        self._breaker.record(ok, time.perf_counter() - self._started)
+
+
+class Guard:
+    """Breaker plus bulkhead for one kind of caller."""
+
+    def __init__(self, breaker: CircuitBreaker, bulkhead: Bulkhead):
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+
+    @contextmanager
+    def call(self):
+        if not self.bulkhead.acquire():
+            raise UpstreamUnavailable("Too many concurrent Voiceflow requests", 1)
+        try:
+            self.breaker.before_call()
+            call = _Call(self.breaker)
+            try:
+                yield call
+            except Exception:
+                call.finish(ok=False)
+                raise
+            finally:
+                # No status reported (e.g. stream closed early): count as success
+                call.finish()
+        finally:
+            self.bulkhead.release()
+
+
+breaker = CircuitBreaker()
+sync_guard = Guard(breaker, Bulkhead(MAX_CONCURRENT))
+async_guard = Guard(breaker, Bulkhead(ASYNC_MAX_CONCURRENT))
+
+
+def snapshot() -> dict:
+    """Breaker state and bulkhead usage of this process."""
+    return {
+        "breaker": sync_guard.breaker.snapshot(),
+        "bulkhead": sync_guard.bulkhead.snapshot(),
+        "async_bulkhead": async_guard.bulkhead.snapshot(),
+    }
@@ -1,4 +1,6 @@
 # services/trace_parser.py
+from collections.abc import Iterable, Iterator
+
 def _slate_text(payload: dict) -> str | None:
     slate = payload.get("slate") or {}
     content = slate.get("content") or []
@@ -19,13 +21,32 @@ def extract_buttons(item: dict) -> list:
 def extract_voice(payload: dict) -> str | None:
     return payload.get("voice")
 
-def parse_traces(traces: list) -> tuple[list[str], list, str | None]:
-    msgs, choices, audio = [], [], None
+def iter_parsed_traces(traces: Iterable[dict]) -> Iterator[tuple[str, object]]:
+    """Yield ("message" | "delta" | "choices" | "audio", value) as traces arrive."""
     for item in traces:
         payload = item.get("payload") or {}
+        if item.get("type") == "completion":
+            # Streamed LLM answer (completion_events): start, content..., end
+            if payload.get("state") == "content" and payload.get("content"):
+                yield "delta", payload["content"]
+            continue
         text = extract_text(payload)
         if text:
-            msgs.append(text)
-        choices.extend(extract_buttons(item))
-        audio = audio or extract_voice(payload)
+            yield "message", text
+        buttons = extract_buttons(item)
+        if buttons:
+            yield "choices", buttons
+        voice = extract_voice(payload)
+        if voice:
+            yield "audio", voice
+
+def parse_traces(traces: list) -> tuple[list[str], list, str | None]:
+    msgs, choices, audio = [], [], None
+    for kind, value in iter_parsed_traces(traces):
+        if kind == "message":
+            msgs.append(value)
+        elif kind == "choices":
+            choices.extend(value)
+        elif kind == "audio":
+            audio = audio or value
     return msgs, choices, audio
@@ -0,0 +1,69 @@
+"""
+Fingerprints of the session variables last pushed to Voiceflow.
+
+A chat launch only PATCHes the variables when their fingerprint differs
+from the one stored on the user row. Profile views drop the fingerprint
+when the insurance selection changes; a reset drops it because it wipes
+the Voiceflow state. The fingerprint lives in the database, so every
+worker process sees the same value: a launch served by one process after
+a profile change handled by another still pushes the new variables.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from decouple import config
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+# Voiceflow state can expire upstream: push again at least this often
+FINGERPRINT_TTL = config("VOICEFLOW_VARIABLES_TTL", default=24 * 3600, cast=int)
+
+
+def _user(user_id):
+    return get_user_model().objects.filter(pk=user_id)
+
+
+def _is_current(stored, variables: dict) -> bool:
+    if stored is None:
+        return False
+    stored_hash, pushed_at = stored
+    if not stored_hash or pushed_at is None:
+        return False
+    return stored_hash == fingerprint(variables) and timezone.now() - pushed_at < timedelta(seconds=FINGERPRINT_TTL)
+
+
+def fingerprint(variables: dict) -> str:
+    """Stable hash of a variables dict (key order does not matter)."""
+    data = json.dumps(variables, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def variables_changed(user_id, variables: dict) -> bool:
+    stored = _user(user_id).values_list("voiceflow_variables_hash", "voiceflow_variables_pushed_at").first()
+    return not _is_current(stored, variables)
+
+
+def remember_variables(user_id, variables: dict) -> None:
+    # update() instead of save(): only these columns, no stale profile fields written back
+    _user(user_id).update(voiceflow_variables_hash=fingerprint(variables), voiceflow_variables_pushed_at=timezone.now())
+
+
+def forget_variables(user_id) -> None:
+    """Force the next launch to push the variables again."""
+    _user(user_id).update(voiceflow_variables_hash="", voiceflow_variables_pushed_at=None)
+
+
+async def avariables_changed(user_id, variables: dict) -> bool:
+    stored = await _user(user_id).values_list("voiceflow_variables_hash", "voiceflow_variables_pushed_at").afirst()
+    return not _is_current(stored, variables)
+
+
+async def aremember_variables(user_id, variables: dict) -> None:
+    await _user(user_id).aupdate(
+        voiceflow_variables_hash=fingerprint(variables), voiceflow_variables_pushed_at=timezone.now()
+    )
+
+
+async def aforget_variables(user_id) -> None:
+    await _user(user_id).aupdate(voiceflow_variables_hash="", voiceflow_variables_pushed_at=None)
@@ -1,14 +1,149 @@
 """
 Voiceflow API client.
 All requests go through the Agent flow.
+
+Requests share one process-wide keep-alive session, so a chatbot turn
+reuses an open TLS connection instead of paying a new handshake.
+`vf_interact_stream` uses the streaming endpoint and yields each trace
+as soon as Voiceflow sends it. Every call runs under the circuit breaker
+and bulkhead of `resilience`.
 """
+import json
 import logging
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
 import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .resilience import UpstreamUnavailable, sync_guard
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://general-runtime.voiceflow.com"
-TIMEOUT = 45
+BASE_URL = config("VOICEFLOW_BASE_URL", default="https://general-runtime.voiceflow.com")
+# Required by the streaming endpoint only
+PROJECT_ID = config("VOICEFLOW_PROJECT_ID", default="")
+# Stream LLM answers token by token instead of one text trace per step
+COMPLETION_EVENTS = config("VOICEFLOW_COMPLETION_EVENTS", default=True, cast=bool)
+
+# (connect, read): fail fast on an unreachable host, wait long for LLM answers
+CONNECT_TIMEOUT = config("VOICEFLOW_CONNECT_TIMEOUT", default=3.05, cast=float)
+READ_TIMEOUT = config("VOICEFLOW_READ_TIMEOUT", default=45, cast=float)
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Kept-alive connections per process; matches gunicorn --threads (one request per thread)
+POOL_SIZE = config("VOICEFLOW_POOL_SIZE", default=4, cast=int)
+MAX_RETRIES = config("VOICEFLOW_MAX_RETRIES", default=3, cast=int)
+RETRY_BACKOFF = config("VOICEFLOW_RETRY_BACKOFF", default=0.5, cast=float)
+
+# Log connection statistics every N requests
+STATS_LOG_INTERVAL = 100
+
+
+@dataclass
+class ClientStats:
+    """Request and connection counters of this process."""
+    requests: int = 0
+    connections: int = 0
+    handshake_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+            if self.requests % STATS_LOG_INTERVAL == 0:
+                logger.info(f"Voiceflow client: {self.snapshot()}")
+
+    def count_connection(self, seconds: float) -> None:
+        with self._lock:
+            self.connections += 1
+            self.handshake_seconds += seconds
+
+    def snapshot(self) -> dict:
+        reused = max(self.requests - self.connections, 0)
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "reuse_rate": round(reused / self.requests, 3) if self.requests else 0.0,
+            "avg_handshake_ms": round(self.handshake_seconds / self.connections * 1000, 1) if self.connections else 0.0,
+        }
+
+
+stats = ClientStats()
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        stats.count_connection(time.perf_counter() - started)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        stats.count_connection(time.perf_counter() - started)
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections report their TCP + TLS setup time."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+def _retry() -> Retry:
+    # Connection errors are retried for every method (nothing was sent yet);
+    # read errors and 5xx only for DELETE/PATCH, a repeated POST would run the turn twice
+    return Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"DELETE", "PATCH"}),
+        raise_on_status=False,
+    )
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide pooled session; recreated after a fork (gunicorn --preload)."""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = _PooledAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=_retry())
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session, _session_pid = session, os.getpid()
+    return _session
 
 
 def _headers(api_key: str, version_id: str = None) -> dict:
@@ -17,9 +152,20 @@ def _headers(api_key: str, version_id: str = None) -> dict:
     return {**h, "versionID": version_id} if version_id else h
 
 
+def _request(method: str, url: str, headers: dict, payload: dict = None) -> requests.Response:
+    """Send a request through the pooled session."""
+    started = time.perf_counter()
+    with sync_guard.call() as call:
+        response = get_session().request(method, url, json=payload, headers=headers, timeout=TIMEOUT)
+        call.finish(response.status_code)
+    stats.count_request()
+    logger.debug(f"Voiceflow {method} {url} -> {response.status_code} in {time.perf_counter() - started:.2f}s")
+    return response
+
+
 def _post(url: str, payload: dict, headers: dict) -> list:
     """Execute POST request and return JSON response."""
-    response = requests.post(url, json=payload, headers=headers, timeout=TIMEOUT)
+    response = _request("POST", url, headers, payload)
     response.raise_for_status()
     return response.json()
 
@@ -27,9 +173,9 @@ def _post(url: str, payload: dict, headers: dict) -> list:
 def vf_reset(api_key: str, user_id: str) -> bool:
     """Reset user conversation state. Returns True on success."""
     try:
-        requests.delete(f"{BASE_URL}/state/user/{user_id}", headers=_headers(api_key), timeout=TIMEOUT)
+        _request("DELETE", f"{BASE_URL}/state/user/{user_id}", _headers(api_key))
         return True
-    except requests.RequestException as e:
+    except (requests.RequestException, UpstreamUnavailable) as e:
         logger.warning(f"Reset failed for user {user_id}: {e}")
         return False
 
@@ -43,6 +189,48 @@ def vf_interact(api_key: str, version_id: str, user_id: str, payload: dict) -> l
 def vf_set_variables(api_key: str, version_id: str, user_id: str, variables: dict) -> dict:
     """Set session variables for the user."""
     url = f"{BASE_URL}/state/user/{user_id}/variables"
-    response = requests.patch(url, json=variables, headers=_headers(api_key, version_id), timeout=TIMEOUT)
+    response = _request("PATCH", url, _headers(api_key, version_id), variables)
     response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    return response.json()
+
+
+def iter_sse(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """Parse Server-Sent Events from decoded lines into (event, data) pairs."""
+    event, data = "message", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+            continue
+        if line.startswith(":"):
+            continue
+        name, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if name == "event":
+            event = value
+        elif name == "data":
+            data.append(value)
+    if data:
+        yield event, "\n".join(data)
+
+
+def vf_interact_stream(api_key: str, version_id: str, user_id: str, payload: dict) -> Iterator[dict]:
+    """Send interaction to Voiceflow Agent and yield traces while they are streamed."""
+    url = f"{BASE_URL}/v2/project/{PROJECT_ID}/user/{user_id}/interact/stream"
+    params = {"environment": version_id, "completion_events": str(COMPLETION_EVENTS).lower()}
+    headers = {**_headers(api_key), "Accept": "text/event-stream"}
+    # The connection goes back to the pool when the stream is closed (also on client disconnect);
+    # the bulkhead slot is held until then, the breaker only judges the time to the headers
+    with sync_guard.call() as call, get_session().post(
+        url, json=payload, headers=headers, params=params, timeout=TIMEOUT, stream=True,
+    ) as response:
+        call.finish(response.status_code)
+        stats.count_request()
+        response.raise_for_status()
+        lines = (line.decode("utf-8") for line in response.iter_lines())
+        for event, data in iter_sse(lines):
+            if event == "trace":
+                yield json.loads(data)
+            elif event == "end":
+                return
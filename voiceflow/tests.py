@@ -1,3 +1,511 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import InsuranceCompany
+
+from .services import async_client, resilience, variable_fingerprint, voiceflow_client
+from .services.resilience import Bulkhead, CircuitBreaker, Guard, UpstreamUnavailable
+from .services.trace_parser import iter_parsed_traces, parse_traces
+from .services.voiceflow_client import ClientStats, iter_sse
+from .views import UNAVAILABLE_MESSAGE
+
+# Pause of the fake server between the first token and the rest of the answer
+STREAM_DELAY = 1.0
+
+TEXT_TRACE = {"type": "text", "payload": {"message": "Hallo!"}}
+CHOICE_TRACE = {"type": "choice", "payload": {"buttons": [{"name": "Tarif"}]}}
+
+
+def _completion(state, content=None):
+    payload = {"state": state}
+    if content is not None:
+        payload["content"] = content
+    return {"type": "completion", "payload": payload}
+
+
+class FakeVoiceflowHandler(BaseHTTPRequestHandler):
+    """Minimal Voiceflow runtime: state, variables, interact and interact/stream."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_event(self, event, data):
+        self._send_chunk(f"event: {event}\nid: 1\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    def _fail_request(self):
+        """Answer 503 or drop the connection while `fail_requests` has entries left."""
+        if not self.server.fail_requests:
+            return False
+        if self.server.fail_requests.pop(0) == "drop":
+            self.close_connection = True
+        else:
+            self._send_json({"error": "upstream"}, status=503)
+        return True
+
+    def do_DELETE(self):
+        self.server.writes.append(("DELETE", self.path))
+        if not self._fail_request():
+            self._send_json({})
+
+    def do_PATCH(self):
+        body = self._read_json()
+        self.server.writes.append(("PATCH", self.path))
+        if self._fail_request():
+            return
+        self.server.variables = body
+        self._send_json({})
+
+    def do_POST(self):
+        self.server.requests.append((self.path, self._read_json()))
+        if self._fail_request():
+            return
+        if self.path.endswith("/interact"):
+            if self.server.fail_stream:
+                self._send_json({"error": "upstream"}, status=503)
+                return
+            self._send_json([TEXT_TRACE, CHOICE_TRACE])
+            return
+        if self.server.fail_stream:
+            self._send_json({"error": "upstream"}, status=500)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._send_chunk(b": keep-alive\n\n")
+        self._send_event("trace", _completion("start"))
+        self._send_event("trace", _completion("content", "Ihr Tarif "))
+        time.sleep(STREAM_DELAY)
+        self._send_event("trace", _completion("content", "deckt das ab."))
+        self._send_event("trace", _completion("end"))
+        self._send_event("trace", CHOICE_TRACE)
+        self._send_event("end", {})
+        self._send_chunk(b"")
+
+
+class TraceParserTestCase(SimpleTestCase):
+    def test_parse_traces(self):
+        traces = [TEXT_TRACE, {"type": "speak", "payload": {"voice": "a.mp3"}}, CHOICE_TRACE]
+        self.assertEqual(parse_traces(traces), (["Hallo!"], [{"name": "Tarif"}], "a.mp3"))
+
+    def test_iter_parsed_traces_yields_deltas(self):
+        traces = [_completion("start"), _completion("content", "Ja"), _completion("end"), TEXT_TRACE]
+        self.assertEqual(list(iter_parsed_traces(traces)), [("delta", "Ja"), ("message", "Hallo!")])
+
+    def test_iter_sse(self):
+        lines = [": comment", "event: trace", "data: {\"a\": 1}", "", "data: x", "data: y", "", "event: end", "data: {}"]
+        self.assertEqual(list(iter_sse(lines)), [("trace", '{"a": 1}'), ("message", "x\ny"), ("end", "{}")])
+
+
+class FakeVoiceflowTestCase(TestCase):
+    """Runs the views against FakeVoiceflowHandler on a free local port."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeVoiceflowHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.patches = [
+            mock.patch.object(voiceflow_client, "BASE_URL", base_url),
+            mock.patch.object(async_client, "BASE_URL", base_url),
+            mock.patch.object(async_client, "RETRY_BACKOFF", 0),
+            mock.patch.object(voiceflow_client, "PROJECT_ID", "project"),
+            mock.patch("voiceflow.views.PROJECT_ID", "project"),
+        ]
+        for patch in cls.patches:
+            patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        for patch in cls.patches:
+            patch.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.writes = []
+        self.server.fail_requests = []
+        self.server.fail_stream = False
+        # Fresh breaker per test, failures of other tests must not trip it
+        breaker = CircuitBreaker()
+        for guard in (resilience.sync_guard, resilience.async_guard):
+            patch = mock.patch.object(guard, "breaker", breaker)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.user = get_user_model().objects.create_user(username="stream", email="stream@example.com", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _patches(self):
+        return sum(method == "PATCH" for method, _ in self.server.writes)
+
+    def _events(self, response):
+        events = []
+        for event, data in iter_sse(b"".join(response.streaming_content).decode("utf-8").split("\n")):
+            events.append((event, json.loads(data)))
+        return events
+
+
+class VoiceflowStreamViewTestCase(FakeVoiceflowTestCase):
+    url = "/voiceflow/voiceflow_chat_bot_stream/"
+
+    def test_first_text_arrives_before_answer_is_complete(self):
+        started = time.perf_counter()
+        response = self.client.post(self.url, {"type": "text", "message": "Was zahlt mein Tarif?"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        chunks = iter(response.streaming_content)
+        first = next(chunks)
+        self.assertLess(time.perf_counter() - started, STREAM_DELAY / 2)
+        self.assertEqual(first, b'event: delta\ndata: {"text": "Ihr Tarif "}\n\n')
+
+        rest = b"".join(chunks).decode("utf-8")
+        self.assertGreaterEqual(time.perf_counter() - started, STREAM_DELAY)
+        events = [(event, json.loads(data)) for event, data in iter_sse(rest.split("\n"))]
+        self.assertEqual(events[-1], ("done", {
+            "messages": ["Ihr Tarif deckt das ab."],
+            "choices": [{"name": "Tarif"}],
+            "audio": None,
+        }))
+
+        path, payload = self.server.requests[0]
+        self.assertTrue(path.startswith(f"/v2/project/project/user/{self.user.id}/interact/stream?"))
+        self.assertEqual(payload, {"request": {"type": "text", "payload": "Was zahlt mein Tarif?"}})
+
+    def test_launch_sets_variables(self):
+        response = self.client.post(self.url, {"type": "launch"}, format="json")
+        self._events(response)
+        self.assertEqual(set(self.server.variables), {"insurance_company", "main_tariff", "additional_tariffs"})
+
+    def test_upstream_error_returns_502(self):
+        self.server.fail_stream = True
+        response = self.client.post(self.url, {"type": "text", "message": "Hallo"}, format="json")
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("error", response.json())
+
+    def test_open_circuit_returns_503(self):
+        self.server.fail_stream = True
+        for _ in range(resilience.BREAKER_MIN_CALLS):
+            self.client.post(self.url, {"type": "text", "message": "Hallo"}, format="json")
+        sent = len(self.server.requests)
+
+        response = self.client.post(self.url, {"type": "text", "message": "Hallo"}, format="json")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["messages"], [UNAVAILABLE_MESSAGE])
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(len(self.server.requests), sent)
+
+    def test_without_project_id_falls_back_to_interact(self):
+        with mock.patch("voiceflow.views.PROJECT_ID", ""):
+            response = self.client.post(self.url, {"type": "text", "message": "Hallo"}, format="json")
+            events = self._events(response)
+        self.assertEqual(self.server.requests[0][0], f"/state/user/{self.user.id}/interact")
+        self.assertEqual(events, [
+            ("message", {"text": "Hallo!"}),
+            ("choices", {"choices": [{"name": "Tarif"}]}),
+            ("done", {"messages": ["Hallo!"], "choices": [{"name": "Tarif"}], "audio": None}),
+        ])
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    def _breaker(self, **kwargs):
+        return CircuitBreaker(**{"window": 4, "min_calls": 4, "failure_rate": 0.5, "slow_call_seconds": 1,
+                                 "open_seconds": 60, "half_open_probes": 1, **kwargs})
+
+    def test_opens_on_failure_rate(self):
+        breaker = self._breaker()
+        for ok in (True, False, True):
+            breaker.record(ok, 0.1)
+        breaker.before_call()
+        breaker.record(False, 0.1)
+        with self.assertRaises(UpstreamUnavailable) as ctx:
+            breaker.before_call()
+        self.assertGreater(ctx.exception.retry_after, 0)
+        self.assertEqual(breaker.snapshot()["state"], "open")
+        self.assertEqual(breaker.snapshot()["trips"], 1)
+        self.assertEqual(breaker.snapshot()["rejected"], 1)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = self._breaker()
+        for _ in range(4):
+            breaker.record(True, 2)
+        self.assertEqual(breaker.snapshot()["state"], "open")
+
+    def test_half_open_probe(self):
+        breaker = self._breaker(open_seconds=0)
+        for _ in range(4):
+            breaker.record(False, 0.1)
+        self.assertEqual(breaker.snapshot()["state"], "half_open")
+        breaker.before_call()
+        # Only one probe at a time
+        with self.assertRaises(UpstreamUnavailable):
+            breaker.before_call()
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.trips, 2)
+        breaker.before_call()
+        breaker.record(True, 0.1)
+        self.assertEqual(breaker.snapshot()["state"], "closed")
+
+    def test_bulkhead_rejects_when_full(self):
+        guard = Guard(self._breaker(), Bulkhead(1))
+        with guard.call():
+            with self.assertRaises(UpstreamUnavailable):
+                with guard.call():
+                    pass
+        self.assertEqual(guard.bulkhead.snapshot(), {"limit": 1, "active": 0, "rejected": 1})
+
+
+class VoiceflowCircuitTestCase(FakeVoiceflowTestCase):
+    url = "/voiceflow/voiceflow_chat_bot/"
+
+    def test_fails_fast_once_the_circuit_is_open(self):
+        self.server.fail_stream = True
+        for _ in range(resilience.BREAKER_MIN_CALLS):
+            response = self.client.post(self.url, {"type": "text", "message": "Hallo"}, format="json")
+            self.assertEqual(response.status_code, 502)
+        sent = len(self.server.requests)
+
+        response = self.client.post(self.url, {"type": "text", "message": "Hallo"}, format="json")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["messages"], [UNAVAILABLE_MESSAGE])
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(len(self.server.requests), sent)
+
+        self.user.is_staff = True
+        self.user.save()
+        status = self.client.get("/voiceflow/status/").json()
+        self.assertEqual(status["breaker"]["state"], "open")
+        self.assertEqual(status["breaker"]["trips"], 1)
+
+
+
+class VariableFingerprintTestCase(FakeVoiceflowTestCase):
+    url = "/voiceflow/voiceflow_chat_bot/"
+
+    def _launch(self, **data):
+        response = self.client.post(self.url, {"type": "launch", **data}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_variables_are_pushed_once(self):
+        self._launch()
+        self._launch()
+        self.assertEqual(self._patches(), 1)
+        # Stored on the user row, so every worker process sees it
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.voiceflow_variables_hash, variable_fingerprint.fingerprint(self.server.variables))
+
+    def test_profile_change_pushes_again(self):
+        self._launch()
+        self.user.insurance_company = InsuranceCompany.objects.create(name="Allianz")
+        self.user.save()
+        self._launch()
+        self.assertEqual(self._patches(), 2)
+
+    def test_forget_pushes_again(self):
+        self._launch()
+        variable_fingerprint.forget_variables(self.user.id)
+        self._launch()
+        self.assertEqual(self._patches(), 2)
+
+    def test_reset_pushes_again(self):
+        self._launch()
+        self._launch(reset=True)
+        self.assertEqual(self._patches(), 2)
+
+    def test_expired_fingerprint_pushes_again(self):
+        self._launch()
+        with mock.patch.object(variable_fingerprint, "FINGERPRINT_TTL", 0):
+            self._launch()
+        self.assertEqual(self._patches(), 2)
+
+    def test_async_helpers(self):
+        variables = {"insurance_company": "allianz", "main_tariff": "", "additional_tariffs": ""}
+        self.assertTrue(async_to_sync(variable_fingerprint.avariables_changed)(self.user.id, variables))
+        async_to_sync(variable_fingerprint.aremember_variables)(self.user.id, variables)
+        self.assertFalse(variable_fingerprint.variables_changed(self.user.id, variables))
+        async_to_sync(variable_fingerprint.aforget_variables)(self.user.id)
+        self.assertTrue(async_to_sync(variable_fingerprint.avariables_changed)(self.user.id, variables))
+
+
+class AsyncVoiceflowViewTestCase(FakeVoiceflowTestCase):
+    url = "/voiceflow/voiceflow_chat_bot_async/"
+
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        self.async_client = AsyncClient()
+
+    def _post(self, data, token=None):
+        body = data if isinstance(data, str) else json.dumps(data)
+        headers = {"Authorization": f"Token {token or self.token.key}"}
+        return async_to_sync(self.async_client.post)(self.url, body, content_type="application/json", headers=headers)
+
+    def test_requires_authentication(self):
+        response = async_to_sync(self.async_client.post)(self.url, "{}", content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self._post({}, token="falsch").status_code, 401)
+        self.assertEqual(self.server.requests, [])
+
+    def test_invalid_json(self):
+        response = self._post("{kein json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Invalid JSON"})
+
+    def test_text(self):
+        response = self._post({"type": "text", "message": "Hallo"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"messages": ["Hallo!"], "choices": [{"name": "Tarif"}], "audio": None})
+        self.assertEqual(self.server.requests[0], (
+            f"/state/user/{self.user.id}/interact", {"request": {"type": "text", "payload": "Hallo"}},
+        ))
+        self.assertEqual(self.server.writes, [])
+
+    def test_launch_and_reset(self):
+        self._post({"type": "launch"})
+        self._post({"type": "launch"})
+        self.assertEqual(self.server.writes, [("PATCH", f"/state/user/{self.user.id}/variables")])
+        self._post({"type": "launch", "reset": True})
+        self.assertEqual(self.server.writes[1:], [
+            ("DELETE", f"/state/user/{self.user.id}"), ("PATCH", f"/state/user/{self.user.id}/variables"),
+        ])
+
+    def test_upstream_error_returns_502(self):
+        self.server.fail_stream = True
+        response = self._post({"type": "text", "message": "Hallo"})
+        self.assertEqual(response.status_code, 502)
+        # POST wird nicht wiederholt
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_open_circuit_returns_503(self):
+        self.server.fail_stream = True
+        for _ in range(resilience.BREAKER_MIN_CALLS):
+            self._post({"type": "text", "message": "Hallo"})
+        sent = len(self.server.requests)
+        response = self._post({"type": "text", "message": "Hallo"})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["messages"], [UNAVAILABLE_MESSAGE])
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(len(self.server.requests), sent)
+
+
+class AsyncClientRetryTestCase(FakeVoiceflowTestCase):
+    def _set_variables(self):
+        return async_to_sync(async_client.avf_set_variables)("key", "production", "1", {"main_tariff": "comfort"})
+
+    def test_write_retried_on_status_and_read_errors(self):
+        self.server.fail_requests = ["503", "drop"]
+        self._set_variables()
+        self.assertEqual(self._patches(), 3)
+        self.assertEqual(self.server.variables, {"main_tariff": "comfort"})
+
+    def test_write_gives_up_after_max_retries(self):
+        self.server.fail_requests = ["503"] * (voiceflow_client.MAX_RETRIES + 1)
+        with self.assertRaises(httpx.HTTPStatusError):
+            self._set_variables()
+        self.assertEqual(self._patches(), voiceflow_client.MAX_RETRIES + 1)
+
+    def test_reset_reports_failure(self):
+        self.server.fail_requests = ["drop"] * (voiceflow_client.MAX_RETRIES + 1)
+        self.assertFalse(async_to_sync(async_client.avf_reset)("key", "1"))
+        self.assertTrue(async_to_sync(async_client.avf_reset)("key", "1"))
+
+
+class VoiceflowSessionTestCase(FakeVoiceflowTestCase):
+    def setUp(self):
+        super().setUp()
+        # Fresh session (with the patched backoff) and counters per test
+        for name, value in (("_session", None), ("_session_pid", None), ("RETRY_BACKOFF", 0),
+                            ("stats", ClientStats())):
+            patch = mock.patch.object(voiceflow_client, name, value)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def _set_variables(self):
+        return voiceflow_client.vf_set_variables("key", "production", "1", {"main_tariff": "comfort"})
+
+    def test_session_is_reused_per_process(self):
+        session = voiceflow_client.get_session()
+        self.assertIs(voiceflow_client.get_session(), session)
+        # Nach einem Fork (andere PID) eine eigene Session
+        with mock.patch("voiceflow.services.voiceflow_client.os.getpid", return_value=-1):
+            self.assertIsNot(voiceflow_client.get_session(), session)
+
+    def test_retry_policy(self):
+        retry = voiceflow_client._retry()
+        self.assertTrue(retry.is_retry("PATCH", 503))
+        self.assertTrue(retry.is_retry("DELETE", 429))
+        self.assertFalse(retry.is_retry("POST", 503))
+        self.assertFalse(retry.is_retry("PATCH", 500))
+
+    def test_writes_are_retried(self):
+        self.server.fail_requests = ["503", "drop"]
+        self._set_variables()
+        self.assertEqual(self._patches(), 3)
+        self.assertEqual(self.server.variables, {"main_tariff": "comfort"})
+
+    def test_post_is_not_retried(self):
+        for failure in ("503", "drop"):
+            self.server.requests = []
+            self.server.fail_requests = [failure]
+            with self.assertRaises(requests.RequestException):
+                voiceflow_client.vf_interact("key", "production", "1", {"request": {"type": "launch"}})
+            self.assertEqual(len(self.server.requests), 1)
+
+    def test_connection_reuse_counters(self):
+        for _ in range(3):
+            self._set_variables()
+        snapshot = voiceflow_client.stats.snapshot()
+        self.assertEqual((snapshot["requests"], snapshot["connections"]), (3, 1))
+        self.assertEqual(snapshot["reuse_rate"], 0.667)
+        self.assertGreater(voiceflow_client.stats.handshake_seconds, 0)
+
+        # Abgebrochene Verbindung: neuer Handshake beim Wiederholen
+        self.server.fail_requests = ["drop"]
+        self._set_variables()
+        self.assertEqual(voiceflow_client.stats.snapshot()["connections"], 2)
+
+    def test_client_stats(self):
+        client_stats = ClientStats()
+        self.assertEqual(client_stats.snapshot(), {
+            "requests": 0, "connections": 0, "reuse_rate": 0.0, "avg_handshake_ms": 0.0,
+        })
+        client_stats.count_connection(0.02)
+        client_stats.count_connection(0.04)
+        for _ in range(4):
+            client_stats.count_request()
+        self.assertEqual(client_stats.snapshot(), {
+            "requests": 4, "connections": 2, "reuse_rate": 0.5, "avg_handshake_ms": 30.0,
+        })
@@ -1,6 +1,12 @@
 from django.urls import path
-from .views import VoiceflowAPIView
+from .views import AsyncVoiceflowView, VoiceflowAPIView, VoiceflowStatusView, VoiceflowStreamView
 
 urlpatterns = [
     path('voiceflow_chat_bot/', VoiceflowAPIView.as_view(), name='voiceflow-api'),
-]
\ No newline at end of file
+    # Server-Sent Events variant: text is forwarded while it is generated
+    path('voiceflow_chat_bot_stream/', VoiceflowStreamView.as_view(), name='voiceflow-api-stream'),
+    # Async variant for the ASGI worker (uvicorn, see docker-compose.prod.yml)
+    path('voiceflow_chat_bot_async/', AsyncVoiceflowView.as_view(), name='voiceflow-api-async'),
+    # Breaker/bulkhead state for monitoring (admins only, per worker process)
+    path('status/', VoiceflowStatusView.as_view(), name='voiceflow-status'),
+]
@@ -2,29 +2,105 @@
 Voiceflow API endpoint.
 All requests go through the Agent flow with user-specific variables.
 """
+import json
 import logging
+from itertools import chain
+from asgiref.sync import sync_to_async
 from decouple import config
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework import status
 
-from .services.voiceflow_client import vf_interact, vf_reset, vf_set_variables
+from .services import resilience
+from .services.resilience import UpstreamUnavailable
+from .services.voiceflow_client import PROJECT_ID, stats, vf_interact, vf_interact_stream, vf_reset, vf_set_variables
+from .services.async_client import avf_interact, avf_reset, avf_set_variables
+from .services.variable_fingerprint import (
+    aforget_variables, aremember_variables, avariables_changed,
+    forget_variables, remember_variables, variables_changed,
+)
 from .services.kb_filters import build_variables
-from .services.trace_parser import parse_traces
+from .services.trace_parser import iter_parsed_traces, parse_traces
 from .services.payloads import interact_payload
 
 logger = logging.getLogger(__name__)
 VF_API_KEY = config("VOICEFLOW_API_KEY")
 VF_VERSION = config("VOICEFLOW_VERSION_ID", default="production")
+FALLBACK_MESSAGE = "Entschuldige, ich konnte keine Antwort erhalten."
+UNAVAILABLE_MESSAGE = config(
+    "VOICEFLOW_UNAVAILABLE_MESSAGE",
+    default="Der Assistent ist gerade nicht erreichbar. Bitte versuche es in einer Minute erneut.",
+)
+# Answer while the circuit is open or the bulkhead is full, built once
+UNAVAILABLE_BODY = {"messages": [UNAVAILABLE_MESSAGE], "choices": [], "audio": None}
 
 
-def _flow_response(traces: list) -> Response:
-    """Build API response from flow interaction traces."""
+def _flow_body(traces: list) -> dict:
+    """Build response body from flow interaction traces."""
     msgs, choices, audio = parse_traces(traces)
     if not msgs:
-        msgs = ["Entschuldige, ich konnte keine Antwort erhalten."]
-    return Response({"messages": msgs, "choices": choices, "audio": audio})
+        msgs = [FALLBACK_MESSAGE]
+    return {"messages": msgs, "choices": choices, "audio": audio}
+
+
+def _unavailable_headers(e: UpstreamUnavailable) -> dict:
+    return {"Retry-After": str(max(round(e.retry_after), 1))}
+
+
+def _sse(event: str, data: dict) -> bytes:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _flow_events(traces):
+    """
+    Yield SSE events while traces arrive.
+
+    Events: message / delta (LLM tokens) / choices / audio, then `done`
+    with the same body as the JSON endpoint, or `error` if the stream
+    breaks off after it has started.
+    """
+    msgs, choices, audio, deltas = [], [], None, []
+    try:
+        for kind, value in iter_parsed_traces(traces):
+            if kind != "delta" and deltas:
+                msgs.append("".join(deltas))
+                deltas = []
+            if kind == "message":
+                msgs.append(value)
+                yield _sse("message", {"text": value})
+            elif kind == "delta":
+                deltas.append(value)
+                yield _sse("delta", {"text": value})
+            elif kind == "choices":
+                choices.extend(value)
+                yield _sse("choices", {"choices": value})
+            elif kind == "audio" and not audio:
+                audio = value
+                yield _sse("audio", {"audio": value})
+    except Exception as e:
+        logger.exception("Streaming interaction failed")
+        yield _sse("error", {"error": str(e)})
+        return
+    if deltas:
+        msgs.append("".join(deltas))
+    if not msgs:
+        msgs = [FALLBACK_MESSAGE]
+        yield _sse("message", {"text": FALLBACK_MESSAGE})
+    yield _sse("done", {"messages": msgs, "choices": choices, "audio": audio})
+
+
+def _flow_response(traces: list) -> Response:
+    """Build API response from flow interaction traces."""
+    return Response(_flow_body(traces))
 
 
 class VoiceflowAPIView(APIView):
@@ -43,6 +119,8 @@ class VoiceflowAPIView(APIView):
         
         if data.get("reset"):
             vf_reset(VF_API_KEY, user_id)
+            # Reset wipes the Voiceflow state including the variables
+            forget_variables(user_id)
         
         # Set user variables on launch or reset
         if data.get("type") == "launch" or data.get("reset"):
@@ -54,7 +132,11 @@ class VoiceflowAPIView(APIView):
         """Set user profile variables in Voiceflow session."""
         try:
             variables = build_variables(user)
+            if not variables_changed(user_id, variables):
+                logger.debug(f"Variables unchanged for user {user_id}, skipping update")
+                return
             vf_set_variables(VF_API_KEY, VF_VERSION, user_id, variables)
+            remember_variables(user_id, variables)
             logger.info(f"Set variables for user {user_id}: {variables}")
         except Exception as e:
             logger.warning(f"Failed to set variables: {e}")
@@ -65,6 +147,125 @@ class VoiceflowAPIView(APIView):
             payload = interact_payload(data)
             traces = vf_interact(VF_API_KEY, VF_VERSION, user_id, payload)
             return _flow_response(traces)
+        except UpstreamUnavailable as e:
+            logger.warning(f"Voiceflow unavailable for user {user_id}: {e}")
+            return Response(UNAVAILABLE_BODY, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=_unavailable_headers(e))
+        except Exception as e:
+            logger.exception("Interaction failed")
+            return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+
+
+class VoiceflowStreamView(VoiceflowAPIView):
+    """
+    Streaming variant of VoiceflowAPIView.
+
+    Same request format; the answer is sent as Server-Sent Events while
+    Voiceflow generates it, so the first text shows up before the LLM
+    has finished. Without VOICEFLOW_PROJECT_ID the non-streaming call is
+    used and all events are sent at once.
+
+    The upstream stream is opened before the response is returned, so an
+    open circuit still answers 503 with Retry-After and an upstream error
+    502, like the JSON endpoint.
+    """
+
+    def _handle_interaction(self, user_id: str, data: dict):
+        """Process interaction through Voiceflow Agent as an event stream."""
+        try:
+            payload = interact_payload(data)
+            if PROJECT_ID:
+                stream = vf_interact_stream(VF_API_KEY, VF_VERSION, user_id, payload)
+                # Runs the guard and the request up to the first trace; errors land in the excepts below
+                first = next(stream, None)
+                traces = chain([first], stream) if first is not None else []
+            else:
+                traces = vf_interact(VF_API_KEY, VF_VERSION, user_id, payload)
+        except UpstreamUnavailable as e:
+            logger.warning(f"Voiceflow unavailable for user {user_id}: {e}")
+            return Response(UNAVAILABLE_BODY, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=_unavailable_headers(e))
+        except Exception as e:
+            logger.exception("Interaction failed")
+            return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+        response = StreamingHttpResponse(_flow_events(traces), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Keep reverse proxies (nginx) from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class VoiceflowStatusView(APIView):
+    """Circuit breaker, bulkhead and connection stats of this worker process."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({**resilience.snapshot(), "client": stats.snapshot()})
+
+
+def _authenticate(request):
+    """Run the DRF authenticators (token/session) on a plain Django request."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    return drf_request.user
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncVoiceflowView(View):
+    """
+    Async variant of VoiceflowAPIView for ASGI workers.
+
+    Same request and response format; while waiting for Voiceflow the
+    request holds no thread, so slow LLM answers don't block other requests.
+    Only the short database steps (authentication, profile variables)
+    run in the thread pool.
+    """
+
+    async def post(self, request):
+        """Handle all Voiceflow interactions."""
+        try:
+            user = await sync_to_async(_authenticate)(request)
+        except APIException as e:
+            return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+        if not user or not user.is_authenticated:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+        user_id = str(user.id)
+        if data.get("reset"):
+            await avf_reset(VF_API_KEY, user_id)
+            # Reset wipes the Voiceflow state including the variables
+            await aforget_variables(user_id)
+
+        # Set user variables on launch or reset
+        if data.get("type") == "launch" or data.get("reset"):
+            await self._set_user_variables(user_id, user)
+
+        return await self._handle_interaction(user_id, data)
+
+    async def _set_user_variables(self, user_id: str, user) -> None:
+        """Set user profile variables in Voiceflow session."""
+        try:
+            variables = await sync_to_async(build_variables)(user)
+            if not await avariables_changed(user_id, variables):
+                logger.debug(f"Variables unchanged for user {user_id}, skipping update")
+                return
+            await avf_set_variables(VF_API_KEY, VF_VERSION, user_id, variables)
+            await aremember_variables(user_id, variables)
+            logger.info(f"Set variables for user {user_id}: {variables}")
+        except Exception as e:
+            logger.warning(f"Failed to set variables: {e}")
+
+    async def _handle_interaction(self, user_id: str, data: dict) -> JsonResponse:
+        """Process interaction through Voiceflow Agent."""
+        try:
+            payload = interact_payload(data)
+            traces = await avf_interact(VF_API_KEY, VF_VERSION, user_id, payload)
+            return JsonResponse(_flow_body(traces))
+        except UpstreamUnavailable as e:
+            logger.warning(f"Voiceflow unavailable for user {user_id}: {e}")
+            return JsonResponse(UNAVAILABLE_BODY, status=503, headers=_unavailable_headers(e))
         except Exception as e:
             logger.exception("Interaction failed")
-            return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
\ No newline at end of file
+            return JsonResponse({"error": str(e)}, status=502)